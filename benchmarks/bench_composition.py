@@ -0,0 +1,111 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Benchmark of solve_batch() against scipy nnls() row by row.
+
+Spectra are made of random reference spectra of the gases, a random mix of
+them in every scan, and noise, so that many rows need the non-negative
+constraint with different sets of gases removed. Every case checks that the
+results match nnls() and fails with --check if they do not, or if solve_batch()
+is slower.
+
+    python benchmarks/bench_composition.py --check
+    python benchmarks/bench_composition.py --gases 8 14 20 --scans 20000
+"""
+
+import sys
+import json
+import time
+import argparse
+import platform
+
+import numpy as np
+from scipy.optimize import nnls
+
+from srsinst.uga import __version__
+from srsinst.uga.analysis.composition import solve_batch
+
+
+def make_case(n_scans, n_masses, n_gases, noise, seed):
+    """Return (matrix, intensities) of a random mixture of n_gases"""
+    rng = np.random.default_rng(seed)
+    matrix = np.abs(rng.normal(size=(n_masses, n_gases))) \
+        * (rng.random((n_masses, n_gases)) < 0.3)
+    matrix[np.arange(n_gases) % n_masses, np.arange(n_gases)] += 0.5  # a main peak for each gas
+    pressures = np.abs(rng.normal(size=(n_scans, n_gases))) \
+        * (rng.random((n_scans, n_gases)) < 0.6)
+    intensities = pressures @ matrix.T + rng.normal(scale=noise, size=(n_scans, n_masses))
+    return matrix, intensities
+
+
+def solve_rows(matrix, intensities):
+    results = [nnls(matrix, row) for row in intensities]
+    return np.array([r[0] for r in results]), np.array([r[1] for r in results])
+
+
+def run_case(n_scans, n_masses, n_gases, noise, seed):
+    matrix, intensities = make_case(n_scans, n_masses, n_gases, noise, seed)
+
+    start = time.perf_counter()
+    pressures, residuals = solve_batch(matrix, intensities)
+    batch_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected_pressures, expected_residuals = solve_rows(matrix, intensities)
+    nnls_time = time.perf_counter() - start
+
+    scale = max(1.0, np.abs(expected_pressures).max())
+    return {
+        'gases': n_gases,
+        'batch': batch_time,
+        'nnls': nnls_time,
+        'pressure_error': float(np.abs(pressures - expected_pressures).max() / scale),
+        'residual_error': float(np.abs(residuals - expected_residuals).max() / scale),
+        'constrained_rows': int((expected_pressures == 0.0).any(axis=1).sum()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark solve_batch() against nnls()')
+    parser.add_argument('--gases', type=int, nargs='+', default=[4, 8, 10, 14, 20])
+    parser.add_argument('--scans', type=int, default=20000)
+    parser.add_argument('--masses', type=int, default=65)
+    parser.add_argument('--noise', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tolerance', type=float, default=1e-9,
+                        help='largest difference from nnls() relative to the pressures')
+    parser.add_argument('--check', action='store_true',
+                        help='exit with 1 if a result differs from nnls() or is slower')
+    parser.add_argument('--json', help='write the results to a JSON file')
+    args = parser.parse_args(argv)
+
+    results = [run_case(args.scans, args.masses, n_gases, args.noise, args.seed)
+               for n_gases in args.gases]
+
+    print('srsinst.uga {} solve_batch() on Python {}, {} scans x {} masses'.format(
+        __version__, platform.python_version(), args.scans, args.masses))
+    header = '{:>6s} {:>10s} {:>10s} {:>8s} {:>12s} {:>12s}'.format(
+        'gases', 'batch s', 'nnls s', 'speedup', 'constrained', 'max error')
+    print(header)
+    print('-' * len(header))
+    failed = False
+    for r in results:
+        error = max(r['pressure_error'], r['residual_error'])
+        print('{:6d} {:10.3f} {:10.3f} {:7.2f}x {:12d} {:12.1e}'.format(
+            r['gases'], r['batch'], r['nnls'], r['nnls'] / r['batch'],
+            r['constrained_rows'], error))
+        failed |= error > args.tolerance or r['batch'] > r['nnls']
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'version': __version__, 'python': platform.python_version(),
+                       'scans': args.scans, 'masses': args.masses, 'results': results},
+                      f, indent=2)
+    return 1 if args.check and failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
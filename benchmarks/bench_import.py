@@ -0,0 +1,141 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Import time benchmark and guard for srsinst.uga.
+
+Every target is imported in a fresh Python process, repeated to get the median.
+Each target also lists modules it must not load, such as plots and tasks for the
+driver, and the run fails with --check if any of them is loaded.
+
+    python benchmarks/bench_import.py --check
+    python benchmarks/bench_import.py --json imports.json
+    python benchmarks/bench_import.py --compare imports.json
+"""
+
+import sys
+import json
+import argparse
+import platform
+import statistics
+import subprocess
+
+from srsinst.uga import __version__
+from srsinst.uga.gui import GuiModules
+
+AppModules = ('srsinst.uga.tasks', 'srsinst.uga.plots', 'srsinst.uga.analysis')
+
+# {name: (statement to time, modules it must not load)}.
+# A module is matched with its submodules.
+Targets = {
+    'import srsinst.uga': (
+        'import srsinst.uga',
+        ('srsgui', 'srsinst.rga', 'numpy') + AppModules),
+    'Keys': (
+        'from srsinst.uga import Keys',
+        ('srsgui', 'srsinst.rga', 'numpy') + AppModules),
+    'GasLibrary': (
+        'from srsinst.uga.analysis.gaslibrary import GasLibrary',
+        ('srsgui', 'srsinst.rga', 'scipy') + GuiModules),
+    'UGA100': (
+        'from srsinst.uga import UGA100',
+        AppModules + ('srsinst.uga.data',)),
+    'UGA100 without GUI modules': (
+        'from srsinst.uga.gui import block_gui_modules; block_gui_modules(); '
+        'from srsinst.uga import UGA100',
+        AppModules + ('srsinst.uga.data', 'scipy')),
+    'uga-monitor': (
+        'import srsinst.uga.monitor as m; m.block_gui_modules(); '
+        'from srsinst.uga.instruments.uga100.uga import UGA100; '
+        'from srsinst.uga.data.acquisition import AcquisitionWorker; '
+        'from srsinst.uga.data.datalog import DataLogger',
+        AppModules + ('scipy', 'srsinst.uga.data.profiler', 'srsinst.uga.data.leaktest')),
+}
+
+# Run in a fresh process: time the statement, then report the loaded modules
+# that are forbidden (blocked GUI modules are None in sys.modules).
+ProbeCode = '''
+import sys, time, json
+forbidden = {forbidden!r}
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+loaded = [m for m, module in sys.modules.items() if module is not None and
+          any(m == f or m.startswith(f + '.') for f in forbidden)]
+print(json.dumps({{'time': elapsed, 'loaded': sorted(loaded), 'count': len(sys.modules)}}))
+'''
+
+
+def probe(statement, forbidden):
+    code = ProbeCode.format(statement=statement, forbidden=tuple(forbidden))
+    output = subprocess.run([sys.executable, '-c', code], check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(args):
+    results = {}
+    for name, (statement, forbidden) in Targets.items():
+        if args.filter and args.filter not in name:
+            continue
+        samples = [probe(statement, forbidden) for _ in range(args.repeat)]
+        times = sorted(s['time'] for s in samples)
+        results[name] = {
+            'median': statistics.median(times),
+            'min': times[0],
+            'modules': samples[-1]['count'],
+            'forbidden_loaded': samples[-1]['loaded'],
+        }
+    return {
+        'version': __version__,
+        'python': platform.python_version(),
+        'results': results,
+    }
+
+
+def print_report(report, baseline=None):
+    print('srsinst.uga {} import times on Python {}'.format(report['version'], report['python']))
+    header = '{:28s} {:>10s} {:>10s} {:>8s} {:>10s}  {}'.format(
+        'target', 'median ms', 'min ms', 'modules', 'vs base', 'forbidden modules loaded')
+    print(header)
+    print('-' * len(header))
+    base_results = baseline['results'] if baseline else {}
+    for name, r in report['results'].items():
+        ratio = ''
+        if name in base_results and r['median'] > 0:
+            ratio = '{:.2f}x'.format(base_results[name]['median'] / r['median'])
+        print('{:28s} {:10.1f} {:10.1f} {:8d} {:>10s}  {}'.format(
+            name, r['median'] * 1e3, r['min'] * 1e3, r['modules'], ratio,
+            ', '.join(r['forbidden_loaded'])))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark import time of srsinst.uga')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='fresh processes per target')
+    parser.add_argument('-k', '--filter', default='',
+                        help='run only targets containing this string')
+    parser.add_argument('--check', action='store_true',
+                        help='exit with 1 if a target loads a module it must not load')
+    parser.add_argument('--json', help='write the results to a JSON file')
+    parser.add_argument('--compare', help='JSON file of a previous run to compare with')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report = run(args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    print_report(report, baseline)
+    if args.check and any(r['forbidden_loaded'] for r in report['results'].values()):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
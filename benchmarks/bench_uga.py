@@ -0,0 +1,211 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Latency and throughput benchmarks for the UGA command layer.
+
+The benchmarks run UGA100 against a SimulatedUGA, over the in-process loopback
+interface by default or over TCP/IP with --tcpip. Link and command latency of
+the simulator are set from the command line to model serial or network links.
+
+    python benchmarks/bench_uga.py --link-latency 0.002 --json results.json
+    python benchmarks/bench_uga.py --compare results.json
+
+The JSON output holds the per-benchmark statistics in seconds, so that
+results can be compared between releases.
+"""
+
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+
+from srsinst.uga import UGA100, __version__
+from srsinst.uga.instruments.uga100.simulator import SimulatedUGA, SimulatedUGAServer, \
+                                                    create_simulated_uga
+
+QueryCommands = ['ZQAD? 3', 'ZQTA?', 'ZMOD?', 'ZBST?', 'ZQID?']
+
+Benchmarks = {}
+
+
+def benchmark(name):
+    """Register a function that takes a Context and returns a callable to time"""
+    def decorator(func):
+        Benchmarks[name] = func
+        return func
+    return decorator
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(func, iterations, simulator):
+    """
+    Call func iterations times and return timing statistics in seconds,
+    along with the commands and writes the simulator received per call.
+    """
+    func()  # warm up
+    samples = []
+    commands = simulator.command_count
+    writes = simulator.write_count
+    for _ in range(iterations):
+        t = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t)
+    commands = simulator.command_count - commands
+    writes = simulator.write_count - writes
+    samples.sort()
+    total = sum(samples)
+    return {
+        'iterations': iterations,
+        'mean': total / iterations,
+        'stdev': statistics.pstdev(samples),
+        'min': samples[0],
+        'p50': percentile(samples, 0.50),
+        'p90': percentile(samples, 0.90),
+        'p99': percentile(samples, 0.99),
+        'max': samples[-1],
+        'commands_per_call': commands / iterations,
+        'writes_per_call': writes / iterations,
+        'commands_per_second': commands / total if total else 0.0,
+    }
+
+
+class Context:
+    """Simulator and connected UGA100 shared by the benchmarks"""
+    def __init__(self, args):
+        self.args = args
+        self.simulator = SimulatedUGA(link_latency=args.link_latency,
+                                      command_latency=args.command_latency,
+                                      transition_time=0.0)
+        self.server = None
+        if args.tcpip:
+            self.server = SimulatedUGAServer(self.simulator, port=0).start()
+        self.uga = self.connect()
+
+    def connect(self):
+        if self.server:
+            return UGA100('tcpip', '127.0.0.1', self.server.user_id,
+                          self.server.password, self.server.port)
+        return create_simulated_uga(self.simulator)
+
+    def close(self):
+        self.uga.disconnect()
+        if self.server:
+            self.server.stop()
+
+
+def make_query(command):
+    def setup(ctx):
+        return lambda: ctx.uga.query_text(command)
+    return setup
+
+
+for _command in QueryCommands:
+    benchmark('query {}'.format(_command))(make_query(_command))
+
+
+@benchmark('Status.get_status_text')
+def bench_status_text(ctx):
+    return ctx.uga.status.get_status_text
+
+
+@benchmark('UGA100.check_id')
+def bench_check_id(ctx):
+    return lambda: ctx.uga.check_id(force=True)
+
+
+@benchmark('UGA100.__init__')
+def bench_init(ctx):
+    if ctx.server:
+        return None  # TCP/IP login takes seconds by design
+    return lambda: create_simulated_uga(ctx.simulator)
+
+
+@benchmark('monitor loop iteration')
+def bench_monitor_loop(ctx):
+    def loop():
+        ctx.uga.get_status()
+        ctx.uga.read_snapshot()
+    return loop
+
+
+def run(args):
+    ctx = Context(args)
+    results = {}
+    try:
+        for name, setup in Benchmarks.items():
+            if args.filter and args.filter not in name:
+                continue
+            func = setup(ctx)
+            if func is None:
+                continue
+            results[name] = measure(func, args.iterations, ctx.simulator)
+    finally:
+        ctx.close()
+    return {
+        'version': __version__,
+        'python': platform.python_version(),
+        'interface': 'tcpip' if args.tcpip else 'loopback',
+        'link_latency': args.link_latency,
+        'command_latency': args.command_latency,
+        'results': results,
+    }
+
+
+def print_report(report, baseline=None):
+    print('srsinst.uga {} on Python {}, {} interface, link latency {} s, command latency {} s'
+          .format(report['version'], report['python'], report['interface'],
+                  report['link_latency'], report['command_latency']))
+    header = '{:32s} {:>10s} {:>10s} {:>8s} {:>8s} {:>10s} {:>10s}'.format(
+        'benchmark', 'p50 ms', 'p99 ms', 'cmds', 'writes', 'cmd/s', 'vs base')
+    print(header)
+    print('-' * len(header))
+    base_results = baseline['results'] if baseline else {}
+    for name, r in report['results'].items():
+        ratio = ''
+        if name in base_results and r['p50'] > 0:
+            ratio = '{:.2f}x'.format(base_results[name]['p50'] / r['p50'])
+        print('{:32s} {:10.3f} {:10.3f} {:8.1f} {:8.1f} {:10.1f} {:>10s}'.format(
+            name, r['p50'] * 1e3, r['p99'] * 1e3, r['commands_per_call'],
+            r['writes_per_call'], r['commands_per_second'], ratio))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the UGA command layer')
+    parser.add_argument('-n', '--iterations', type=int, default=200)
+    parser.add_argument('--link-latency', type=float, default=0.001,
+                        help='simulated delay for every write in seconds')
+    parser.add_argument('--command-latency', type=float, default=0.0,
+                        help='simulated delay for every command in seconds')
+    parser.add_argument('--tcpip', action='store_true',
+                        help='use a local TCP/IP server instead of the loopback interface')
+    parser.add_argument('-k', '--filter', default='',
+                        help='run only benchmarks containing this string')
+    parser.add_argument('--json', help='write the results to a JSON file')
+    parser.add_argument('--compare', help='JSON file of a previous run to compare with')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,16 @@
 
-from srsinst.uga.instruments.uga100.uga import UGA100
-from srsinst.uga.instruments.get_instruments import get_rga, get_uga
-from srsinst.uga.instruments.uga100.keys import Keys
+from .lazy import make_lazy_getattr
 
-__version__ = "0.1.0"  # Global version number
\ No newline at end of file
+__all__ = ['UGA100', 'AsyncUGA100', 'get_rga', 'get_uga', 'Keys']
+
+# Names exported from submodules are imported on first use, so that importing
+# the package for Keys does not load the instrument driver, srsgui and its plots.
+__getattr__, __dir__ = make_lazy_getattr(__name__, globals(), {
+    'UGA100': '.instruments.uga100.uga',
+    'AsyncUGA100': '.instruments.uga100.asyncuga',
+    'get_rga': '.instruments.get_instruments',
+    'get_uga': '.instruments.get_instruments',
+    'Keys': '.instruments.uga100.keys',
+})
+
+__version__ = "0.1.0"  # Global version number
@@ -0,0 +1,10 @@
+from srsinst.uga.lazy import make_lazy_getattr
+
+__getattr__, __dir__ = make_lazy_getattr(__name__, globals(), {
+    'ScanData': '.composition',
+    'CompositionModel': '.composition',
+    'CompositionResult': '.composition',
+    'solve_batch': '.composition',
+    'GasLibrary': '.gaslibrary',
+    'CompositionAnalyzer': '.pool',
+})
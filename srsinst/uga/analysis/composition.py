@@ -0,0 +1,318 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import numpy as np
+from typing import NamedTuple, Tuple
+from scipy.optimize import nnls
+
+from .gaslibrary import GasLibrary
+
+AnalogScan = 'analog_scan'
+HistogramScan = 'histogram_scan'
+
+
+class ScanData(NamedTuple):
+    """
+    A spectrum with its mass axis, to be analyzed away from the instrument
+
+    spectrum is in the unit of the RGA, and multiplied by conversion_factor
+    to get partial pressures in Torr.
+    """
+    source: str  # name of the instrument
+    timestamp: float
+    scan_type: str  # AnalogScan or HistogramScan, the same as Scans.scan_type
+    mass_axis: np.ndarray
+    spectrum: np.ndarray
+    conversion_factor: float
+
+    @classmethod
+    def from_scan(cls, source, scan, conversion_factor, timestamp, mass_axis=None):
+        """
+        Capture the last spectrum of a Scans component.
+
+        If mass_axis is None, it is made from the scan parameters queried from the RGA.
+        """
+        if mass_axis is None:
+            mass_axis = scan.get_mass_axis(scan.scan_type == AnalogScan)
+        return cls(source, timestamp, scan.scan_type, np.asarray(mass_axis, dtype=np.float64),
+                   np.array(scan.spectrum, dtype=np.float64), conversion_factor)
+
+
+class CompositionResult(NamedTuple):
+    source: str
+    timestamp: float
+    gas_names: Tuple[str, ...]
+    partial_pressures: np.ndarray  # in Torr, in the order of gas_names
+    residual: float
+
+
+class CompositionModel:
+    """
+    Coefficient matrix of reference gas spectra for a mass range
+
+        model = CompositionModel(['water', 'nitrogen', 'oxygen', 'argon'], 1, 50)
+        result = model.analyze(scan_data)
+    """
+
+    def __init__(self, gas_names, start_mass, stop_mass, library_file=None):
+        self.gas_names = tuple(gas.strip().lower() for gas in gas_names)
+        self.start_mass = start_mass
+        self.stop_mass = stop_mass
+        self.masses = np.arange(start_mass, stop_mass + 1)
+        self.matrix = GasLibrary.load(library_file).select(self.gas_names, start_mass, stop_mass)
+        self._gram = None
+
+    @property
+    def gram(self):
+        """Gram matrix of the matrix, AᵀA, computed once for solve_batch()"""
+        if self._gram is None:
+            self._gram = self.matrix.T @ self.matrix
+        return self._gram
+
+    def get_peak_intensities(self, scan: ScanData):
+        """Intensities in Torr at the integer masses of the model"""
+        y = scan.spectrum * scan.conversion_factor
+        x = scan.mass_axis
+        if scan.scan_type == AnalogScan:
+            y = subtract_baseline(y)
+            return get_analog_peaks(x, y, self.masses)
+        return get_histogram_peaks(x, y, self.masses)
+
+    def solve(self, intensities):
+        """Non-negative least square fit of intensities, returns (partial pressures, residual)"""
+        return nnls(self.matrix, intensities)
+
+    def solve_batch(self, intensities):
+        """
+        Non-negative least square fit of many sets of intensities at once
+
+        Parameters
+        -----------
+            intensities: Numpy array
+                (number of scans, number of masses) intensities in Torr
+
+        Returns
+        --------
+            tuple(Numpy array, Numpy array)
+                (number of scans, number of gases) partial pressures and
+                (number of scans,) residuals
+        """
+        return solve_batch(self.matrix, intensities, self.gram)
+
+    def analyze(self, scan: ScanData) -> CompositionResult:
+        partial_pressures, residual = self.solve(self.get_peak_intensities(scan))
+        return CompositionResult(scan.source, scan.timestamp, self.gas_names,
+                                 partial_pressures, float(residual))
+
+    def analyze_batch(self, scan_type, mass_axis, spectra, conversion_factor=1.0):
+        """
+        Fit a stack of scans with the same mass axis, such as recorded histogram scans
+
+        Parameters
+        -----------
+            scan_type: str
+                AnalogScan or HistogramScan
+            mass_axis: Numpy array
+                masses of the M points in a scan
+            spectra: Numpy array
+                (N, M) spectra in the unit of the RGA
+            conversion_factor: float
+                multiplied to spectra to get partial pressures in Torr
+
+        Returns
+        --------
+            tuple(Numpy array, Numpy array)
+                (N, number of gases) partial pressures and (N,) residuals
+        """
+        x = np.asarray(mass_axis, dtype=np.float64)
+        y = np.atleast_2d(np.asarray(spectra, dtype=np.float64)) * conversion_factor
+        if scan_type == AnalogScan:
+            y = np.array([subtract_baseline(row) for row in y])
+            return self.solve_batch(get_analog_peaks(x, y, self.masses))
+        return self.solve_batch(get_histogram_peaks(x, y, self.masses))
+
+
+def subtract_baseline(y):
+    """
+    Spectrum minus its baseline from calculate_baseline() of srsinst.rga.
+    It is imported on first use, because importing srsinst.rga loads
+    its plot classes with matplotlib, which histogram scans do not need.
+    """
+    from srsinst.rga.plots.analysis import calculate_baseline
+    return y - calculate_baseline(y, 1e-5, 1e6)
+
+
+def _solve_passive(gram, aty, passive, group_size=8):
+    """
+    Least square solutions restricted to the passive gases of each row,
+    from the normal equations. Gases not passive are 0.
+
+    Rows sharing the same passive gases with at least group_size rows are solved
+    together with one factorization. The other rows are solved in one call of
+    np.linalg.solve() with the Gram matrix masked to the passive gases of each row
+    and 1 on the diagonal of the others.
+    """
+    solution = np.zeros_like(aty)
+    if passive.shape[1] < 63:
+        # Sorting integer keys is much faster than np.unique(passive, axis=0)
+        keys = passive @ (1 << np.arange(passive.shape[1], dtype=np.int64))
+        _, first, group, counts = np.unique(keys, return_index=True, return_inverse=True,
+                                            return_counts=True)
+        patterns = passive[first]
+    else:
+        patterns, group, counts = np.unique(passive, axis=0, return_inverse=True,
+                                            return_counts=True)
+    group = group.reshape(-1)
+    for i in np.flatnonzero(counts >= group_size):
+        rows = np.flatnonzero(group == i)
+        kept = patterns[i]
+        solution[np.ix_(rows, kept)] = np.linalg.solve(gram[np.ix_(kept, kept)],
+                                                       aty[np.ix_(rows, kept)].T).T
+
+    rows = np.flatnonzero(counts[group] < group_size)
+    if len(rows):
+        p = passive[rows]
+        masked = np.where(p[:, :, np.newaxis] & p[:, np.newaxis, :], gram, 0.0)
+        diagonal = np.arange(gram.shape[0])
+        masked[:, diagonal, diagonal] += ~p
+        rhs = np.where(p, aty[rows], 0.0)
+        solution[rows] = np.linalg.solve(masked, rhs[:, :, np.newaxis])[:, :, 0]
+    return solution
+
+
+def solve_batch(matrix, intensities, gram=None):
+    """
+    Non-negative least square fit of each row of intensities with matrix.
+
+    It runs the active set algorithm of nnls() (Lawson and Hanson, as in
+    the fast NNLS of Bro and de Jong) on all rows at once, with the Gram matrix
+    AᵀA shared by the rows and Aᵀy of each row. Every step solves the rows with
+    the same passive gases together, and the rest with one batched
+    np.linalg.solve(), so the number of calls does not grow with the number of
+    different sets of gases removed. The rows start from
+    the unconstrained solution with negative gases removed until it is feasible.
+    Rows that do not converge in 3 x number of gases steps are solved with
+    nnls() one by one.
+
+    Parameters
+    -----------
+        matrix: Numpy array
+            (number of masses, number of gases) spectra of the gases
+        intensities: Numpy array
+            (number of rows, number of masses) or (number of masses,)
+        gram: Numpy array, optional
+            matrix.T @ matrix, computed if None
+
+    Returns
+    --------
+        tuple(Numpy array, Numpy array)
+            (number of rows, number of gases) partial pressures and (number of rows,) residuals
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    y = np.atleast_2d(np.asarray(intensities, dtype=np.float64))
+    if gram is None:
+        gram = matrix.T @ matrix
+    n_gases = matrix.shape[1]
+    aty = y @ matrix
+    partial_pressures = np.zeros((len(y), n_gases))
+    # Gradient tolerance of the optimality check
+    tolerance = 1e3 * np.finfo(np.float64).eps * np.linalg.norm(matrix) \
+        * np.linalg.norm(y, axis=1)
+
+    try:
+        # Feasible start: drop gases with negative pressure until none is left
+        passive = np.ones_like(partial_pressures, dtype=bool)
+        rows = np.arange(len(y))
+        for _ in range(n_gases):
+            solution = _solve_passive(gram, aty[rows], passive[rows])
+            negative = (solution < 0.0).any(axis=1)
+            partial_pressures[rows[~negative]] = solution[~negative]
+            passive[rows[negative]] &= solution[negative] > 0.0
+            rows = rows[negative]
+            if len(rows) == 0:
+                break
+        passive[rows] = False  # start from 0 if it is still infeasible
+
+        rows = np.arange(len(y))
+        adding = np.ones(len(y), dtype=bool)  # False while removing gases after a step
+        for _ in range(3 * n_gases):
+            # Add the gas with the largest gradient to rows that are not optimal yet
+            x, p = partial_pressures[rows], passive[rows]
+            gradient = aty[rows] - x @ gram
+            gradient[p] = -np.inf
+            best = np.argmax(gradient, axis=1)
+            optimal = adding & (gradient[np.arange(len(rows)), best] <= tolerance[rows])
+            add = adding & ~optimal
+            passive[rows[add], best[add]] = True
+            keep = ~optimal
+            rows, adding = rows[keep], adding[keep]
+            if len(rows) == 0:
+                break
+
+            # Move towards the solution of the passive gases as far as it is feasible
+            x, p = partial_pressures[rows], passive[rows]
+            solution = _solve_passive(gram, aty[rows], p)
+            feasible = ~((solution <= 0.0) & p).any(axis=1)
+            partial_pressures[rows[feasible]] = solution[feasible]
+            adding = feasible.copy()
+            infeasible = np.flatnonzero(~feasible)
+            if len(infeasible):
+                xi, si = x[infeasible], solution[infeasible]
+                blocking = (si <= 0.0) & p[infeasible]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    ratio = np.where(blocking, xi / (xi - si), np.inf)
+                ratio[np.isnan(ratio)] = 0.0  # a gas at 0 that would go negative
+                alpha = ratio.min(axis=1)[:, np.newaxis]
+                xi = xi + alpha * (si - xi)
+                removed = (xi <= 0.0) | (blocking & (ratio == alpha))
+                xi[removed] = 0.0
+                partial_pressures[rows[infeasible]] = xi
+                passive[rows[infeasible]] &= ~removed
+        unsettled = rows
+    except np.linalg.LinAlgError:
+        unsettled = np.arange(len(y))  # gases with linearly dependent spectra
+
+    for row in unsettled:
+        partial_pressures[row], _ = nnls(matrix, y[row])
+    residuals = np.linalg.norm(y - partial_pressures @ matrix.T, axis=1)
+    return partial_pressures, residuals
+
+
+def get_analog_peaks(x, y, masses, min_points=5):
+    """
+    Maximum intensity within 0.5 AMU of each mass, as get_peak_from_analog_scan() does,
+    for all masses at once. 0 if fewer than min_points points are around a mass.
+    x is in increasing order. y is a spectrum, or (number of scans, len(x)) spectra.
+    """
+    masses = np.asarray(masses)
+    y = np.asarray(y)
+    nearest = np.rint(x)
+    index = nearest.astype(int) - masses[0]
+    valid = (np.abs(x - nearest) < 0.5) & (index >= 0) & (index < len(masses))
+    index = index[valid]
+    peaks = np.zeros(y.shape[:-1] + (len(masses),))
+    if len(index) == 0:
+        return peaks
+
+    bins, starts, counts = np.unique(index, return_index=True, return_counts=True)
+    maxima = np.maximum.reduceat(y[..., valid], starts, axis=-1)
+    enough = counts >= min_points
+    peaks[..., bins[enough]] = maxima[..., enough]
+    return peaks
+
+
+def get_histogram_peaks(x, y, masses):
+    """
+    Intensity at each mass in a histogram scan, 0 if out of the scan range.
+    y is a spectrum, or (number of scans, len(x)) spectra.
+    """
+    masses = np.asarray(masses)
+    y = np.asarray(y)
+    peaks = np.zeros(y.shape[:-1] + (len(masses),))
+    index = np.searchsorted(x, masses)
+    found = (index < len(x))
+    found[found] = x[index[found]] == masses[found]
+    peaks[..., found] = y[..., index[found]]
+    return peaks
@@ -0,0 +1,236 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import os
+import hashlib
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DefaultGasLibraryFile = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gaslib.dat')
+DefaultCacheDir = os.path.join(os.path.expanduser('~'), '.cache', 'srsinst.uga')
+
+
+def read_gas_library(file_name=None):
+    """
+    Read a gas library file as a dict
+
+    Returns
+    --------
+        dict
+            {gas name in lower case: (sensitivity factor, reduction factor, [(mass, intensity), ...])}
+    """
+    if file_name is None:
+        file_name = DefaultGasLibraryFile
+    d = {}
+    with open(file_name, 'rt') as f:
+        count = 0
+        for line in f:
+            line = line.strip()
+            if line.startswith('#'):
+                continue
+            if len(line.split()) == 0:
+                continue
+            rem = count % 3
+            if rem == 0:
+                first = line.split('"')
+                name = first[1].lower()
+                sens = first[2].split()
+                sensitivity = float(sens[0])
+                reduction_factor = float(sens[1])
+            elif rem == 1:
+                mass = line.split()
+            else:
+                inten = line.split()
+                if len(mass) != len(inten):
+                    raise IndexError('{} has mal-formatted peak(s).'.format(name))
+                peaks = [(int(m), float(f)) for m, f in zip(mass, inten)]
+                d[name] = (sensitivity, reduction_factor, peaks)
+            count += 1
+    return d
+
+
+def build_coeff_matrix(gas_library, start_mass, stop_mass, gas_names):
+    """
+    Build a least square fit coefficient matrix for the mass range
+    from the reference spectra of gases
+
+    Returns
+    --------
+        Numpy array
+            (stop_mass - start_mass + 1, number of gases) matrix
+    """
+    matrix = np.zeros((stop_mass - start_mass + 1, len(gas_names)))
+    for i, gas in enumerate(gas_names):
+        if gas not in gas_library:
+            raise KeyError('{} is not in the gas library'.format(gas))
+        sensitivity, reduction_factor, peaks = gas_library[gas]
+        total_sensitivity = sensitivity * reduction_factor / 100.0
+        for mass, intensity in peaks:
+            if start_mass <= mass <= stop_mass:
+                matrix[mass - start_mass, i] = total_sensitivity * intensity
+    return matrix
+
+
+class GasLibrary:
+    """
+    Gas library compiled into NumPy arrays
+
+    Rows of fragments are gases in the order of names, and columns are
+    masses from 1 to the highest mass in the library.
+
+        library = GasLibrary.load()
+        matrix = library.select(['water', 'nitrogen', 'argon'], 1, 50)
+
+    load() keeps the compiled library in memory and in a .npy cache file named after
+    the SHA-256 hash of the library file, so a library file is parsed only once,
+    until it is edited.
+    """
+
+    CacheVersion = 1
+    _loaded = {}  # {(path, modified time, size): GasLibrary}
+    _loaded_lock = threading.Lock()
+
+    def __init__(self, names, sensitivities, reduction_factors, fragments, file_hash=''):
+        self.names = tuple(names)
+        self.sensitivities = np.asarray(sensitivities, dtype=np.float64)
+        self.reduction_factors = np.asarray(reduction_factors, dtype=np.float64)
+        self.fragments = np.asarray(fragments, dtype=np.float64)  # percent of the principal peak
+        self.masses = np.arange(1, self.fragments.shape[1] + 1)
+        self.file_hash = file_hash
+        self.gas_index = {name: i for i, name in enumerate(self.names)}
+
+        # Fragments scaled with the total sensitivity of each gas
+        total_sensitivities = self.sensitivities * self.reduction_factors / 100.0
+        self.coefficients = self.fragments * total_sensitivities[:, np.newaxis]
+
+    @classmethod
+    def from_dict(cls, gas_library, file_hash=''):
+        """Compile a dict from read_gas_library()"""
+        names = list(gas_library)
+        max_mass = max((mass for _, _, peaks in gas_library.values() for mass, _ in peaks),
+                       default=0)
+        fragments = np.zeros((len(names), max_mass))
+        for i, name in enumerate(names):
+            for mass, intensity in gas_library[name][2]:
+                if mass >= 1:
+                    fragments[i, mass - 1] = intensity
+        return cls(names,
+                   [gas_library[name][0] for name in names],
+                   [gas_library[name][1] for name in names],
+                   fragments, file_hash)
+
+    @classmethod
+    def load(cls, file_name=None, cache_dir=DefaultCacheDir):
+        """
+        Get the compiled library of a gas library file, from memory,
+        the cache file in cache_dir, or by parsing the file, in that order.
+        Set cache_dir to None not to use cache files.
+        """
+        path = os.path.abspath(DefaultGasLibraryFile if file_name is None else file_name)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with cls._loaded_lock:
+            library = cls._loaded.get(key)
+        if library is not None:
+            return library
+
+        with open(path, 'rb') as f:
+            file_hash = hashlib.sha256(f.read()).hexdigest()
+        cache_file = None
+        library = None
+        if cache_dir:
+            cache_file = os.path.join(cache_dir, 'gaslib-v{}-{}.npy'
+                                      .format(cls.CacheVersion, file_hash))
+            library = cls._read_cache(cache_file, file_hash)
+        if library is None:
+            library = cls.from_dict(read_gas_library(path), file_hash)
+            if cache_file:
+                library._write_cache(cache_file)
+
+        with cls._loaded_lock:
+            cls._loaded[key] = library
+        return library
+
+    def _cache_dtype(self):
+        return np.dtype([('name', 'U64'), ('sensitivity', 'f8'), ('reduction_factor', 'f8'),
+                         ('fragments', 'f8', (self.fragments.shape[1],))])
+
+    @classmethod
+    def _read_cache(cls, cache_file, file_hash):
+        try:
+            data = np.load(cache_file, allow_pickle=False)
+            return cls(data['name'].tolist(), data['sensitivity'],
+                       data['reduction_factor'], data['fragments'], file_hash)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning('Ignored gas library cache {}: {}'.format(cache_file, e))
+            return None
+
+    def _write_cache(self, cache_file):
+        data = np.zeros(len(self.names), dtype=self._cache_dtype())
+        data['name'] = self.names
+        data['sensitivity'] = self.sensitivities
+        data['reduction_factor'] = self.reduction_factors
+        data['fragments'] = self.fragments
+
+        # Write to a temporary file and rename, so that other processes never read a partial file
+        temp_file = '{}.{}.tmp'.format(cache_file, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(temp_file, 'wb') as f:
+                np.save(f, data, allow_pickle=False)
+            os.replace(temp_file, cache_file)
+        except OSError as e:
+            logger.warning('Failed writing gas library cache {}: {}'.format(cache_file, e))
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name.lower() in self.gas_index
+
+    def get_gas_indices(self, gas_names):
+        """Row indices of gases, raises KeyError with an unknown gas"""
+        indices = []
+        for gas in gas_names:
+            index = self.gas_index.get(gas.strip().lower())
+            if index is None:
+                raise KeyError('{} is not in the gas library'.format(gas))
+            indices.append(index)
+        return np.array(indices, dtype=int)
+
+    def select(self, gas_names, start_mass, stop_mass):
+        """
+        Coefficient matrix of gases for the mass range, the same as build_coeff_matrix()
+
+        Returns
+        --------
+            Numpy array
+                (stop_mass - start_mass + 1, number of gases) matrix
+        """
+        rows = self.coefficients[self.get_gas_indices(gas_names)]
+        matrix = np.zeros((stop_mass - start_mass + 1, len(rows)))
+        first = max(start_mass, 1)
+        last = min(stop_mass, len(self.masses))
+        if first <= last:
+            matrix[first - start_mass:last - start_mass + 1] = rows[:, first - 1:last].T
+        return matrix
+
+    def to_dict(self):
+        """The library in the format of read_gas_library()"""
+        d = {}
+        for i, name in enumerate(self.names):
+            masses = np.flatnonzero(self.fragments[i])
+            peaks = [(int(m) + 1, float(self.fragments[i, m])) for m in masses]
+            d[name] = (float(self.sensitivities[i]), float(self.reduction_factors[i]), peaks)
+        return d
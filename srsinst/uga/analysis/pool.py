@@ -0,0 +1,120 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Composition analysis in worker processes.
+
+CompositionAnalyzer sends ScanData to a process pool, where every worker keeps
+its own CompositionModel, so that baseline correction and fitting of scans
+from many UGAs run on all cores, away from the acquisition threads.
+
+    analyzer = CompositionAnalyzer(['water', 'nitrogen', 'oxygen', 'argon'], 1, 50,
+                                   callback=print)
+    scan.get_analog_scan()
+    analyzer.submit(ScanData.from_scan('uga', scan, conversion_factor, time.time()))
+    ...
+    analyzer.close()
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from .composition import CompositionModel, ScanData
+
+logger = logging.getLogger(__name__)
+
+_worker_model = None  # CompositionModel of a worker process
+
+
+def _init_worker(gas_names, start_mass, stop_mass, library_file):
+    global _worker_model
+    _worker_model = CompositionModel(gas_names, start_mass, stop_mass, library_file)
+
+
+def _analyze_in_worker(scan):
+    return _worker_model.analyze(scan)
+
+
+class CompositionAnalyzer:
+    """
+    Process pool to analyze composition of scans
+
+    Parameters
+    -----------
+        gas_names: list(str)
+            names of gases in the gas library
+        start_mass, stop_mass: int
+            mass range of the fit
+        library_file: str, optional
+            gas library file, the default is gaslib.dat of the package
+        max_workers: int, optional
+            number of worker processes, the default is the number of CPUs
+        max_pending: int, optional
+            scans submitted and not analyzed yet, beyond which new scans are dropped,
+            so that a slow analysis never blocks acquisition
+        callback: callable, optional
+            called with a CompositionResult from a thread of this process
+    """
+
+    def __init__(self, gas_names, start_mass, stop_mass, library_file=None,
+                 max_workers=None, max_pending=None, callback=None):
+        # Fail early with an unknown gas name, instead of in the workers
+        self.model = CompositionModel(gas_names, start_mass, stop_mass, library_file)
+        self.callback = callback
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 4 * self.max_workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=_init_worker,
+            initargs=(self.model.gas_names, start_mass, stop_mass, library_file))
+        self.pending = 0
+        self.completed = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def gas_names(self):
+        return self.model.gas_names
+
+    def submit(self, scan: ScanData):
+        """
+        Queue a scan for analysis without waiting.
+
+        Returns a Future of CompositionResult, or None if the scan is dropped.
+        """
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.dropped += 1
+                return None
+            self.pending += 1
+        future = self._executor.submit(_analyze_in_worker, scan)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logger.error('Composition analysis failed: {}: {}'.format(type(error).__name__, error))
+            return
+        if self.callback is not None:
+            try:
+                self.callback(future.result())
+            except Exception as e:
+                logger.error('Composition callback failed: {}: {}'.format(type(e).__name__, e))
+
+    def close(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,11 @@
+from srsinst.uga.lazy import make_lazy_getattr
+
+__getattr__, __dir__ = make_lazy_getattr(__name__, globals(), {
+    'SnapshotBuffer': '.ringbuffer',
+    'DataLogger': '.datalog',
+    'DataLogReader': '.datalog',
+    'LeakTestStream': '.leaktest',
+    'PhaseProfiler': '.profiler',
+    'PhaseReport': '.profiler',
+    'read_phase_history': '.profiler',
+})
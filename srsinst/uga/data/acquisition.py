@@ -0,0 +1,79 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import time
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AcquisitionWorker(threading.Thread):
+    """
+    Thread calling acquire() repeatedly and putting the results in a queue
+
+    The worker never waits for the consumer: if the output queue is full,
+    the oldest result is dropped. If acquire() raises an exception,
+    the worker stops and keeps the exception in error.
+
+    parameters
+    -----------
+
+        name: str
+            name of the thread
+
+        acquire: callable
+            function returning a result, called with no argument
+
+        output: queue.Queue, optional
+            queue to put results in. Results are discarded if None
+
+        period: float, optional
+            minimum seconds between the start of acquire() calls
+    """
+
+    def __init__(self, name, acquire, output=None, period=0.0):
+        super().__init__(name=name, daemon=True)
+        self.acquire = acquire
+        self.output = output
+        self.period = period
+        self.count = 0
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                result = self.acquire()
+            except Exception as e:
+                self.error = e
+                logger.error('{} stopped: {}: {}'.format(self.name, type(e).__name__, e))
+                return
+            self.count += 1
+            if self.output is not None:
+                self._put(result)
+            remaining = self.period - (time.monotonic() - started)
+            if remaining > 0:
+                self._stop_event.wait(remaining)
+
+    def _put(self, result):
+        while True:
+            try:
+                self.output.put_nowait(result)
+                return
+            except queue.Full:
+                try:
+                    self.output.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def stop(self):
+        """Request to stop after the current acquire() call"""
+        self._stop_event.set()
+
+    def is_stopping(self):
+        return self._stop_event.is_set()
@@ -0,0 +1,295 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Append-only binary log of UGA snapshots for long-term records.
+
+A log file has a 64-byte header followed by fixed-width records of RecordDtype.
+Records are grouped in chunks of chunk_size records, and the first and last
+timestamps of every completed chunk are appended to an index file,
+<log file>.idx, so that a time range is found by searching the index
+and then only the chunks it selects.
+
+DataLogger writes records from a background thread.
+DataLogReader memory-maps the log and returns NumPy arrays for a time range
+without loading the whole file.
+
+    logger = DataLogger('uga.ugalog')
+    logger.log(uga.read_snapshot())
+    ...
+    logger.close()
+
+    reader = DataLogReader('uga.ugalog')
+    records = reader.get_range(time.time() - 3600, time.time())
+    records['ig_pressure']
+"""
+
+import os
+import time
+import queue
+import struct
+import logging
+import threading
+
+import numpy as np
+
+from srsinst.uga.instruments.uga100.records import Snapshot
+
+logger = logging.getLogger(__name__)
+
+Magic = b'UGALOG'
+Version = 1
+HeaderFormat = '<6sHIId'  # magic, version, record size, chunk size, creation time
+HeaderSize = 64
+DefaultChunkSize = 4096
+
+RecordDtype = np.dtype([
+    ('timestamp', '<f8'),
+    ('ig_pressure', '<f8'),
+    ('pirani_pressure', '<f8'),
+    ('cm_pressure', '<f8'),
+    ('turbo_pump', '<i2'),
+    ('elbow', '<i2'),
+    ('chamber', '<i2'),
+    ('sample_inlet', '<i2'),
+    ('capillary', '<i2'),
+    ('states', '<u4'),
+    ('error', '<u2'),  # error number from ZERR, 0 if none
+])
+
+IndexDtype = np.dtype([('first', '<f8'), ('last', '<f8')])
+
+
+def get_index_path(path):
+    return '{}.idx'.format(path)
+
+
+def read_header(f):
+    """Read the header of a log file, and return the chunk size"""
+    f.seek(0)
+    data = f.read(HeaderSize)
+    if len(data) < HeaderSize:
+        raise ValueError('{} is too short for a UGA log header'.format(f.name))
+    magic, version, record_size, chunk_size, _ = \
+        struct.unpack_from(HeaderFormat, data)
+    if magic != Magic:
+        raise ValueError('{} is not a UGA log file'.format(f.name))
+    if version != Version or record_size != RecordDtype.itemsize:
+        raise ValueError('Unsupported UGA log version {} with record size {}'
+                         .format(version, record_size))
+    return chunk_size
+
+
+class DataLogWriter:
+    """
+    Append records to a log file and chunk timestamps to its index file.
+
+    An existing log is appended to after a partial trailing record is discarded,
+    and its index is rebuilt if it does not match the log.
+    """
+
+    def __init__(self, path, chunk_size=DefaultChunkSize):
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._file = open(path, 'r+b')
+            self.chunk_size = read_header(self._file)
+            count = (os.path.getsize(path) - HeaderSize) // RecordDtype.itemsize
+            self._file.truncate(HeaderSize + count * RecordDtype.itemsize)
+            self._file.seek(0, os.SEEK_END)
+            self.count = count
+            self._rebuild_index()
+        else:
+            self.chunk_size = chunk_size
+            self._file = open(path, 'w+b')
+            header = struct.pack(HeaderFormat, Magic, Version, RecordDtype.itemsize,
+                                 chunk_size, time.time())
+            self._file.write(header.ljust(HeaderSize, b'\0'))
+            self.count = 0
+            self._index_file = open(get_index_path(path), 'wb')
+        self._chunk_first = None
+        self._chunk_last = None
+        if self.count % self.chunk_size:
+            first_in_chunk = self.count - self.count % self.chunk_size
+            records = self._read_records(first_in_chunk, self.count)
+            self._chunk_first = float(records['timestamp'][0])
+            self._chunk_last = float(records['timestamp'][-1])
+
+    def _read_records(self, start, stop):
+        self._file.flush()
+        return np.memmap(self.path, RecordDtype, 'r', HeaderSize + start * RecordDtype.itemsize,
+                         (stop - start,))
+
+    def _rebuild_index(self):
+        index_path = get_index_path(self.path)
+        full_chunks = self.count // self.chunk_size
+        if os.path.exists(index_path) and \
+                os.path.getsize(index_path) == full_chunks * IndexDtype.itemsize:
+            self._index_file = open(index_path, 'ab')
+            return
+        self._index_file = open(index_path, 'wb')
+        if full_chunks:
+            timestamps = self._read_records(0, full_chunks * self.chunk_size)['timestamp']
+            chunks = timestamps.reshape(full_chunks, self.chunk_size)
+            index = np.empty(full_chunks, IndexDtype)
+            index['first'] = chunks[:, 0]
+            index['last'] = chunks[:, -1]
+            self._index_file.write(index.tobytes())
+            self._index_file.flush()
+
+    def write(self, records):
+        """Append records, a NumPy array of RecordDtype"""
+        for record in np.atleast_1d(records):
+            timestamp = float(record['timestamp'])
+            if self._chunk_first is None:
+                self._chunk_first = timestamp
+            self._chunk_last = timestamp
+            self._file.write(record.tobytes())
+            self.count += 1
+            if self.count % self.chunk_size == 0:
+                self._index_file.write(struct.pack('<dd', self._chunk_first, self._chunk_last))
+                self._chunk_first = None
+
+    def flush(self):
+        self._file.flush()
+        self._index_file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        self._index_file.close()
+
+
+def make_record(snapshot: Snapshot, error=0):
+    """Convert a Snapshot and an error number to a record of RecordDtype"""
+    record = np.zeros(1, RecordDtype)
+    for name in Snapshot._fields:
+        record[name] = getattr(snapshot, name)
+    record['error'] = error
+    return record
+
+
+_Stop = object()  # put in the queue by DataLogger.close()
+
+
+class DataLogger:
+    """
+    Log snapshots to a file from a background thread
+
+    log() only puts the snapshot in a queue, so that acquisition is not delayed
+    by disk access. Records are flushed to the file every flush_period seconds.
+    """
+
+    def __init__(self, path, chunk_size=DefaultChunkSize, flush_period=5.0):
+        self.path = path
+        self.flush_period = flush_period
+        self._writer = DataLogWriter(path, chunk_size)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='uga-datalog', daemon=True)
+        self._thread.start()
+
+    def log(self, snapshot: Snapshot, error=0):
+        self._queue.put(make_record(snapshot, error))
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                record = self._queue.get(timeout=self.flush_period)
+            except queue.Empty:
+                record = None
+            try:
+                if record is not None and record is not _Stop:
+                    self._writer.write(record)
+                if record is _Stop or time.monotonic() - last_flush >= self.flush_period:
+                    self._writer.flush()
+                    last_flush = time.monotonic()
+            except OSError as e:
+                logger.error('Writing to {} failed: {}'.format(self.path, e))
+            if record is _Stop:
+                return
+
+    def close(self):
+        """Write all queued records and close the file"""
+        self._queue.put(_Stop)
+        self._thread.join()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class DataLogReader:
+    """
+    Read a log file with memory mapping
+
+    Arrays returned are views of the mapped file, valid while the reader is open.
+    Call refresh() to see records appended after opening.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.chunk_size = read_header(f)
+        self.records = None
+        self.index = None
+        self.refresh()
+
+    def refresh(self):
+        count = (os.path.getsize(self.path) - HeaderSize) // RecordDtype.itemsize
+        if count > 0:
+            self.records = np.memmap(self.path, RecordDtype, 'r', HeaderSize, (count,))
+        else:
+            self.records = np.zeros(0, RecordDtype)
+
+        index_path = get_index_path(self.path)
+        full_chunks = count // self.chunk_size
+        index_count = 0
+        if os.path.exists(index_path):
+            index_count = min(full_chunks, os.path.getsize(index_path) // IndexDtype.itemsize)
+        if index_count > 0:
+            self.index = np.memmap(index_path, IndexDtype, 'r', 0, (index_count,))
+        else:
+            self.index = np.zeros(0, IndexDtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _find(self, timestamp, side):
+        """Index of timestamp in records, narrowed down with the chunk index"""
+        chunks = len(self.index)
+        if side == 'left':
+            chunk = int(np.searchsorted(self.index['last'], timestamp, 'left'))
+        else:
+            chunk = int(np.searchsorted(self.index['first'], timestamp, 'right')) - 1
+            chunk = max(chunk, 0)
+        start = chunk * self.chunk_size
+        stop = (chunk + 1) * self.chunk_size if chunk < chunks else len(self.records)
+        if side == 'right' and chunk == chunks - 1 and timestamp >= self.index['last'][-1]:
+            # Records after the last indexed chunk are not in the index yet
+            stop = len(self.records)
+        timestamps = self.records['timestamp'][start:stop]
+        return start + int(np.searchsorted(timestamps, timestamp, side))
+
+    def get_slice(self, start_time=None, end_time=None):
+        start = 0 if start_time is None else self._find(start_time, 'left')
+        stop = len(self.records) if end_time is None else self._find(end_time, 'right')
+        return slice(start, max(start, stop))
+
+    def get_range(self, start_time=None, end_time=None):
+        """Return records with start_time <= timestamp <= end_time as a structured array view"""
+        return self.records[self.get_slice(start_time, end_time)]
+
+    def get_columns(self, start_time=None, end_time=None, names=None):
+        """Return a dict of {column name: array} for the time range"""
+        records = self.get_range(start_time, end_time)
+        names = names or RecordDtype.names
+        return {name: records[name] for name in names}
+
+    def close(self):
+        self.records = None
+        self.index = None
@@ -0,0 +1,210 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Streaming of the leak test mass at the full rate of the RGA.
+
+LeakTestStream reads the ion current of a single mass with the UGA RGA
+as fast as the RGA measures, and keeps timestamped readings in a LeakSignalBuffer.
+detect_leak_response() finds the rise time and the peak of a response,
+after spraying helium on a suspected leak, for example.
+
+    stream = LeakTestStream(uga)  # the mass set with uga.mode.leak_test_mass
+    stream.start()
+    ...  # spray helium
+    response = stream.detect(threshold=1000)
+    stream.stop()
+"""
+
+import time
+import threading
+from typing import NamedTuple
+
+import numpy as np
+
+from .acquisition import AcquisitionWorker
+from .ringbuffer import SnapshotBuffer
+
+
+class LeakSignalBuffer(SnapshotBuffer):
+    """
+    SnapshotBuffer of timestamped ion currents, with a single float column
+    and no temperature columns, so that the latest n samples are always
+    a contiguous NumPy view.
+    """
+
+    PressureColumns = ('intensity',)
+    TemperatureColumns = ()
+
+    def append(self, timestamp, intensity):
+        self.append_values(timestamp, (intensity,), ())
+
+    def get_intensities(self, n=None):
+        """View of the latest n ion currents in the unit of the RGA, 0.1 fA"""
+        return self.get_pressures(n)[:, 0]
+
+    def get_latest(self):
+        """Return the latest (timestamp, intensity), or None if empty"""
+        if len(self) == 0:
+            return None
+        return float(self.get_timestamps(1)[0]), float(self.get_intensities(1)[0])
+
+
+class LeakResponse(NamedTuple):
+    """Response of the leak test signal found by detect_leak_response()"""
+    onset_time: float  # when the signal crossed 10 % of the rise
+    rise_time: float  # seconds from 10 % to 90 % of the rise
+    peak_time: float
+    peak: float
+    baseline: float
+
+    @property
+    def amplitude(self):
+        return self.peak - self.baseline
+
+
+def _crossing_time(t, y, level, before):
+    """Interpolated time of the last upward crossing of level before index before"""
+    below = np.flatnonzero(y[:before] < level)
+    if len(below) == 0:
+        return float(t[0])
+    i = below[-1]
+    if y[i + 1] == y[i]:
+        return float(t[i + 1])
+    return float(t[i] + (t[i + 1] - t[i]) * (level - y[i]) / (y[i + 1] - y[i]))
+
+
+def detect_leak_response(timestamps, intensities, threshold, baseline=None,
+                         baseline_points=10, smoothing=1):
+    """
+    Find the rise and the peak of a response in a leak test signal
+
+    Parameters
+    -----------
+        timestamps, intensities: Numpy array
+            signal from before the response to after its peak
+        threshold: float
+            minimum rise above the baseline to be a response
+        baseline: float, optional
+            signal without a leak. If None, the median of the first
+            baseline_points samples is used
+        smoothing: int
+            number of samples in the moving average applied before detection
+
+    Returns
+    --------
+        LeakResponse, or None if the signal does not rise by threshold
+    """
+    t = np.asarray(timestamps, dtype=np.float64)
+    y = np.asarray(intensities, dtype=np.float64)
+    if smoothing > 1 and len(y) >= smoothing:
+        y = np.convolve(y, np.ones(smoothing) / smoothing, mode='valid')
+        t = t[smoothing - 1:]
+    if len(y) < 2:
+        return None
+    if baseline is None:
+        baseline = float(np.median(y[:max(1, baseline_points)]))
+
+    peak_index = int(np.argmax(y))
+    amplitude = y[peak_index] - baseline
+    if amplitude < threshold or peak_index == 0:
+        return None
+    onset = _crossing_time(t, y, baseline + 0.1 * amplitude, peak_index)
+    end = _crossing_time(t, y, baseline + 0.9 * amplitude, peak_index)
+    return LeakResponse(onset, end - onset, float(t[peak_index]), float(y[peak_index]),
+                        baseline)
+
+
+class LeakTestStream:
+    """
+    Read a single mass with the UGA RGA repeatedly in a background thread
+
+    The RGA noise floor is set to the fastest scan speed while streaming,
+    and the previous scan parameters are restored by stop(). The UGA
+    connection lock is held only for one reading at a time, so other
+    commands to the UGA are served between readings.
+
+    Parameters
+    -----------
+        uga: UGA100
+            UGA with the RGA on
+        mass: int, optional
+            mass to read. If None, the leak test mass of the UGA is used
+        capacity: int
+            number of readings kept in the buffer
+        scan_speed: int
+            RGA noise floor setting used while streaming, 7 for the fastest
+    """
+
+    def __init__(self, uga, mass=None, capacity=100000, scan_speed=7):
+        self.uga = uga
+        self.mass = mass
+        self.scan_speed = scan_speed
+        self.buffer = LeakSignalBuffer(capacity)
+        self.lock = threading.Lock()  # held while the buffer is updated
+        self.worker = None
+        self._saved_parameters = None
+
+    @property
+    def error(self):
+        """Exception that stopped the stream, or None"""
+        return None if self.worker is None else self.worker.error
+
+    def is_running(self):
+        return self.worker is not None and self.worker.is_alive()
+
+    def start(self):
+        if self.is_running():
+            return
+        if self.mass is None:
+            self.mass = self.uga.mode.leak_test_mass
+        rga = self.uga.rga
+        self._saved_parameters = rga.get_scan_parameters()
+        rga.set_scan_parameters(*self._saved_parameters._replace(scan_speed=self.scan_speed))
+        self.worker = AcquisitionWorker('uga-leak-test', self.read_once)
+        self.worker.start()
+
+    def stop(self):
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker.join()
+        if self._saved_parameters is not None:
+            self.uga.rga.set_scan_parameters(*self._saved_parameters)
+            self._saved_parameters = None
+
+    def read_once(self):
+        """Read the mass once and append it to the buffer with the middle time of the reading"""
+        started = time.time()
+        intensity = self.uga.rga.scan.get_single_mass_scan(self.mass)
+        timestamp = (started + time.time()) / 2.0
+        with self.lock:
+            self.buffer.append(timestamp, intensity)
+        return intensity
+
+    def get_rate(self, n=100):
+        """Readings per second over the latest n readings"""
+        with self.lock:
+            timestamps = self.buffer.get_timestamps(n)
+            if len(timestamps) < 2 or timestamps[-1] == timestamps[0]:
+                return 0.0
+            return (len(timestamps) - 1) / (timestamps[-1] - timestamps[0])
+
+    def get_signal(self, start_time=None, end_time=None):
+        """Copies of (timestamps, intensities) from start_time up to end_time"""
+        with self.lock:
+            selection = self.buffer.get_time_range(start_time, end_time)
+            return (self.buffer.get_timestamps()[selection].copy(),
+                    self.buffer.get_intensities()[selection].copy())
+
+    def detect(self, threshold, start_time=None, end_time=None, **kwargs):
+        """detect_leak_response() on the signal from start_time up to end_time"""
+        return detect_leak_response(*self.get_signal(start_time, end_time), threshold, **kwargs)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
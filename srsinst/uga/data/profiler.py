@@ -0,0 +1,465 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Timing of UGA mode transitions, such as pump-down to Ready, sleep and system bake.
+
+PhaseProfiler polls the mode and the state of every pump, valve and gauge,
+including sub-states such as TurningOn4 in Mode.StateDict, together with pressures,
+turbo pump speed and current in a single batch, and records every change.
+PhaseReport breaks a run into phases, the time each item spent in each state,
+and appends them to a CSV history file to compare units and runs over time.
+
+    profiler = PhaseProfiler(uga)
+    report = profiler.run(uga.mode.start, Keys.Ready, timeout=1800)
+    print(report.get_text())
+    report.append_to_history('uga-phases.csv')
+
+    records = read_phase_history('uga-phases.csv', 'Mode', Keys.Start)
+"""
+
+import os
+import csv
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import NamedTuple, Tuple, Optional
+
+from srsgui.inst.exceptions import InstQueryError
+
+from srsinst.uga.instruments.uga100.keys import Keys
+from srsinst.uga.instruments.uga100.components import Mode, Pressure
+from srsinst.uga.instruments.uga100.watcher import ModeItem
+from .acquisition import AcquisitionWorker
+
+logger = logging.getLogger(__name__)
+
+# (item name, query command, dict to decode the reply) polled by PhaseProfiler.
+# Item names are the same as the ones used by StateWatcher.
+ProfileItems = (
+    (ModeItem, 'ZMOD?', Mode.ModeDict),
+    ('Bypass Pump', 'ZCBP?', Mode.StateDict),
+    ('Roughing Pump', 'ZCRP?', Mode.StateDict),
+    ('Turbo Pump', 'ZCTP?', Mode.StateDict),
+    ('Bypass Valve', 'ZCBV?', Mode.StateDict),
+    ('Sample Valve', 'ZCSV?', Mode.StateDict),
+    ('Vent Valve', 'ZCVV?', Mode.StateDict),
+    ('Ion Gauge', 'ZCIG?', Mode.StateDict),
+    ('RGA', 'ZCRG?', Mode.StateDict),
+    ('Heaters', 'ZCHT?', Mode.StateDict),
+)
+
+ItemNames = tuple(item[0] for item in ProfileItems)
+ItemIndex = {name: i for i, name in enumerate(ItemNames)}
+
+MeasurementCommands = [
+    'ZQAD? {}'.format(Pressure.GaugeDict[Keys.Pirani]),
+    'ZQAD? {}'.format(Pressure.GaugeDict[Keys.CM]),
+    'ZQAD? {}'.format(Pressure.GaugeDict[Keys.IG]),
+    'ZQHZ?', 'ZQCU?', 'ZQTA?', 'ZQTB?',
+]
+
+ProfileCommands = [item[1] for item in ProfileItems] + MeasurementCommands
+
+# {reply value: key} of each item
+_ReplyKeys = tuple({value: key for key, value in item[2].items()} for item in ProfileItems)
+
+TransitionalStates = frozenset(
+    key for key, value in Mode.StateDict.items()
+    if Mode.StateDict[Keys.TurningOn3] <= value <= Mode.StateDict[Keys.TurningIdle11])
+
+HistoryFields = (
+    'run_start', 'serial_number', 'model_name', 'firmware_version', 'label',
+    'item', 'state', 'start', 'duration',
+    'pirani_pressure', 'cm_pressure', 'ig_pressure', 'turbo_speed', 'turbo_current',
+)
+
+
+class ProfileSample(NamedTuple):
+    """States and measurements of a UGA polled with ProfileCommands"""
+    timestamp: float
+    states: Tuple[str, ...]  # in the order of ProfileItems
+    pirani_pressure: float  # in Torr
+    cm_pressure: float
+    ig_pressure: float
+    turbo_speed: int  # in Hz
+    turbo_current: float  # in mA
+    elbow: int  # in °C
+    chamber: int
+
+    def get_state(self, item):
+        return self.states[ItemIndex[item]]
+
+    def is_settled(self):
+        """True if no item is in a sub-state of a transition, such as TurningOn4"""
+        return TransitionalStates.isdisjoint(self.states)
+
+
+def make_profile_sample(replies, timestamp=None):
+    """Convert replies of ProfileCommands to a ProfileSample"""
+    count = len(ProfileItems)
+    try:
+        states = tuple(keys[int(r)] for keys, r in zip(_ReplyKeys, replies[:count]))
+        pirani, cm, ig, speed = (int(r) for r in replies[count:count + 4])
+        current = float(replies[count + 4])
+        elbow, chamber = (int(r) for r in replies[count + 5:count + 7])
+    except (ValueError, KeyError, IndexError):
+        raise InstQueryError('Error during conversion of profile sample: {}'.format(replies))
+    return ProfileSample(time.time() if timestamp is None else timestamp, states,
+                         pirani * 1e-6, cm * 1e-6, ig * 1e-12, speed, current, elbow, chamber)
+
+
+class Transition(NamedTuple):
+    """
+    Change of an item between two polls. timestamp is the middle of the polls,
+    so it is off by at most half a poll period.
+    """
+    timestamp: float
+    item: str
+    old: str
+    new: str
+    sample: ProfileSample  # the first sample with the new state
+
+
+class Phase(NamedTuple):
+    """Time an item spent in a state"""
+    item: str
+    state: str
+    start: float
+    end: float
+    start_sample: ProfileSample
+    end_sample: ProfileSample
+    complete: bool  # False if the phase started before or ended after the run
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+class HistoryRecord(NamedTuple):
+    """A phase read from a history file by read_phase_history()"""
+    run_start: datetime
+    serial_number: str
+    model_name: str
+    firmware_version: str
+    label: str
+    item: str
+    state: str
+    start: float  # seconds from the start of the run
+    duration: float
+    pirani_pressure: float  # at the end of the phase
+    cm_pressure: float
+    ig_pressure: float
+    turbo_speed: int
+    turbo_current: float
+
+
+class PhaseReport:
+    """
+    Phases of a run recorded by PhaseProfiler
+
+    Parameters
+    -----------
+        label: str
+            name of the run, such as 'start' or 'bake'
+        identity: IdentityProfile or None
+            identity of the UGA from UGA100.check_id()
+        samples: list(ProfileSample)
+        transitions: list(Transition)
+    """
+
+    def __init__(self, label, identity, samples, transitions):
+        if not samples:
+            raise ValueError('No samples in the profile')
+        self.label = label
+        self.model_name = identity.model_name if identity else ''
+        self.serial_number = identity.serial_number if identity else ''
+        self.firmware_version = identity.firmware_version if identity else ''
+        self.samples = list(samples)
+        self.transitions = list(transitions)
+        self.start_time = self.samples[0].timestamp
+        self.end_time = self.samples[-1].timestamp
+
+    @property
+    def duration(self):
+        return self.end_time - self.start_time
+
+    def get_phases(self, item=None):
+        """
+        Return the list of Phase of an item, or of all items
+        if item is None, in the order of start time.
+        """
+        names = ItemNames if item is None else (item,)
+        phases = []
+        first, last = self.samples[0], self.samples[-1]
+        for name in names:
+            index = ItemIndex[name]
+            start, start_sample = first.timestamp, first
+            for t in self.transitions:
+                if t.item != name:
+                    continue
+                phases.append(Phase(name, start_sample.states[index], start, t.timestamp,
+                                    start_sample, t.sample, start_sample is not first))
+                start, start_sample = t.timestamp, t.sample
+            phases.append(Phase(name, start_sample.states[index], start, last.timestamp,
+                                start_sample, last, False))
+        phases.sort(key=lambda p: p.start)
+        return phases
+
+    def get_time_to(self, item, state):
+        """Seconds from the start of the run until item first entered state, or None"""
+        for t in self.transitions:
+            if t.item == item and t.new == state:
+                return t.timestamp - self.start_time
+        return None
+
+    def get_text(self):
+        """Table of complete phases for display"""
+        lines = ['{} run of {} S/N {} (firmware {}) at {}, {:.1f} s'.format(
+            self.label, self.model_name, self.serial_number, self.firmware_version,
+            datetime.fromtimestamp(self.start_time).strftime('%Y-%m-%d %H:%M:%S'),
+            self.duration)]
+        lines.append('{:>9}  {:<14}{:<18}{:>10}  {:>10}  {:>10}  {:>7}'.format(
+            'start(s)', 'item', 'state', 'time(s)', 'Pirani', 'IG', 'TP(Hz)'))
+        for p in self.get_phases():
+            if not p.complete:
+                continue
+            s = p.end_sample
+            lines.append('{:9.1f}  {:<14}{:<18}{:10.1f}  {:10.2e}  {:10.2e}  {:7d}'.format(
+                p.start - self.start_time, p.item, p.state, p.duration,
+                s.pirani_pressure, s.ig_pressure, s.turbo_speed))
+        return '\n'.join(lines)
+
+    def get_history_rows(self):
+        """Complete phases as dicts with HistoryFields"""
+        run_start = datetime.fromtimestamp(self.start_time).isoformat(timespec='seconds')
+        rows = []
+        for p in self.get_phases():
+            if not p.complete:
+                continue
+            s = p.end_sample
+            rows.append(dict(zip(HistoryFields, (
+                run_start, self.serial_number, self.model_name, self.firmware_version,
+                self.label, p.item, p.state, round(p.start - self.start_time, 3),
+                round(p.duration, 3), s.pirani_pressure, s.cm_pressure, s.ig_pressure,
+                s.turbo_speed, s.turbo_current))))
+        return rows
+
+    def append_to_history(self, path):
+        """Append complete phases to a CSV history file, with the header if the file is new"""
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=HistoryFields)
+            if is_new:
+                writer.writeheader()
+            writer.writerows(self.get_history_rows())
+
+    def to_dict(self):
+        """The report with all samples, for JSON"""
+        return {
+            'label': self.label,
+            'model_name': self.model_name,
+            'serial_number': self.serial_number,
+            'firmware_version': self.firmware_version,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'items': list(ItemNames),
+            'phases': [{'item': p.item, 'state': p.state, 'start': p.start, 'end': p.end,
+                        'duration': p.duration, 'complete': p.complete}
+                       for p in self.get_phases()],
+            'samples': {field: [getattr(s, field) for s in self.samples]
+                        for field in ProfileSample._fields},
+        }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+
+def read_phase_history(path, item=None, state=None):
+    """Read a history file written by PhaseReport.append_to_history() as a list of HistoryRecord"""
+    records = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            if item is not None and row['item'] != item:
+                continue
+            if state is not None and row['state'] != state:
+                continue
+            records.append(HistoryRecord(
+                datetime.fromisoformat(row['run_start']), row['serial_number'],
+                row['model_name'], row['firmware_version'], row['label'],
+                row['item'], row['state'], float(row['start']), float(row['duration']),
+                float(row['pirani_pressure']), float(row['cm_pressure']),
+                float(row['ig_pressure']), int(row['turbo_speed']),
+                float(row['turbo_current'])))
+    return records
+
+
+class PhaseProfiler:
+    """
+    Poll the states and measurements of a UGA in a background thread,
+    and record every state change.
+
+    It polls every fast_period while any item is in a sub-state of a transition,
+    or within hold_time after a change or wake(), and every slow_period otherwise,
+    so that a system bake lasting hours does not fill the memory.
+
+    Parameters
+    -----------
+        uga: UGA100
+            connected UGA
+        fast_period: float
+            seconds between polls during transitions
+        slow_period: float
+            seconds between polls while all items are settled
+        hold_time: float
+            seconds to keep polling fast after a change
+    """
+
+    def __init__(self, uga, fast_period=0.1, slow_period=1.0, hold_time=2.0):
+        self.uga = uga
+        self.fast_period = fast_period
+        self.slow_period = slow_period
+        self.hold_time = hold_time
+        self._fast_until = 0.0
+        self._action_index = 0  # transitions recorded before the latest wake()
+        self.label = ''
+        self.samples = []
+        self.transitions = []
+        self.lock = threading.Lock()  # held while samples and transitions are updated
+        self.worker = None
+
+    @property
+    def error(self):
+        """Exception that stopped polling, or None"""
+        return None if self.worker is None else self.worker.error
+
+    def is_running(self):
+        return self.worker is not None and self.worker.is_alive()
+
+    def start(self, label=''):
+        """Clear the records, poll once and start polling in the background"""
+        if self.is_running():
+            return
+        self.label = label
+        with self.lock:
+            self.samples = []
+            self.transitions = []
+        self.worker = None
+        self.read_once()
+        self.wake()
+        self.worker = AcquisitionWorker('uga-phase-profiler', self.read_once,
+                                        period=self.fast_period)
+        self.worker.start()
+
+    def stop(self):
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker.join()
+
+    def wake(self):
+        """
+        Poll fast for hold_time, before a command that starts a transition.
+        is_done() counts only mode changes recorded after the latest wake().
+        """
+        self._fast_until = time.monotonic() + self.hold_time
+        with self.lock:
+            self._action_index = len(self.transitions)
+        if self.worker is not None:
+            self.worker.period = self.fast_period
+
+    def read_once(self):
+        """Poll once, record the changes from the previous sample, and return the sample"""
+        sample = make_profile_sample(self.uga.query_batch(ProfileCommands))
+        with self.lock:
+            previous = self.samples[-1] if self.samples else None
+            self.samples.append(sample)
+            if previous is not None:
+                timestamp = (previous.timestamp + sample.timestamp) / 2.0
+                for name, old, new in zip(ItemNames, previous.states, sample.states):
+                    if old != new:
+                        self.transitions.append(Transition(timestamp, name, old, new, sample))
+        if not sample.is_settled() or (previous is not None and
+                                       previous.states != sample.states):
+            self._fast_until = time.monotonic() + self.hold_time
+        if self.worker is not None:
+            self.worker.period = self.fast_period \
+                if time.monotonic() < self._fast_until else self.slow_period
+        return sample
+
+    def get_latest(self) -> Optional[ProfileSample]:
+        with self.lock:
+            return self.samples[-1] if self.samples else None
+
+    def get_transitions(self, start=0):
+        """Transitions recorded from index start, to follow them during a run"""
+        with self.lock:
+            return self.transitions[start:]
+
+    def is_done(self, target_mode):
+        """
+        True if the latest sample is in target_mode with all items settled,
+        after the mode changed at least once since the latest wake().
+        A UGA already in target_mode before the command, such as Ready
+        before system bake, is not done until it leaves and comes back.
+        """
+        with self.lock:
+            if not any(t.item == ModeItem for t in self.transitions[self._action_index:]):
+                return False
+            sample = self.samples[-1]
+        return sample.get_state(ModeItem) == target_mode and sample.is_settled()
+
+    def wait_for_mode(self, target_mode, timeout):
+        """
+        Wait until the mode is target_mode with all items settled.
+        Returns False on timeout. The exception that stopped polling is raised.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.error is not None:
+                raise self.error
+            if self.is_done(target_mode):
+                return True
+            time.sleep(self.fast_period)
+        return False
+
+    def get_report(self) -> PhaseReport:
+        with self.lock:
+            return PhaseReport(self.label, self.uga.identity_profile,
+                               self.samples, self.transitions)
+
+    def run(self, action, target_mode, timeout=1800.0, label=None):
+        """
+        Profile action, such as uga.mode.start, until the UGA settles in target_mode.
+
+        Parameters
+        -----------
+            action: callable
+                called with no argument after the first poll, which is taken by start()
+            target_mode: str
+                key of Mode.ModeDict that ends the run, such as Keys.Ready
+            timeout: float
+                maximum seconds to wait for target_mode
+            label: str, optional
+                name of the run. The name of action if None
+
+        Returns
+        --------
+            PhaseReport
+        """
+        self.start(getattr(action, '__name__', '') if label is None else label)
+        try:
+            self.wake()
+            action()
+            self.uga.wake_state_watcher()
+            if not self.wait_for_mode(target_mode, timeout):
+                logger.warning('{} did not reach {} in {} s'
+                               .format(self.label, target_mode, timeout))
+        finally:
+            self.stop()
+        self.read_once()
+        return self.get_report()
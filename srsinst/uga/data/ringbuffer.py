@@ -0,0 +1,119 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import numpy as np
+
+from srsinst.uga.instruments.uga100.records import Snapshot
+
+
+class SnapshotBuffer:
+    """
+    Preallocated ring buffer of UGA snapshots, stored column by column.
+
+    Every sample is written twice, at index i and i + capacity of arrays
+    with 2 x capacity rows, so that the latest n samples are always
+    a contiguous slice. Appending is O(1), and windows are returned
+    as NumPy views without copying. Memory use is fixed by the capacity.
+
+        >>> buffer = SnapshotBuffer(capacity=100000)
+        >>> buffer.append(uga.read_snapshot())
+        >>> buffer.get_column('ig_pressure', 100)  # the latest 100 IG pressures
+    """
+
+    PressureColumns = ('ig_pressure', 'pirani_pressure', 'cm_pressure')
+    TemperatureColumns = ('turbo_pump', 'elbow', 'chamber', 'sample_inlet', 'capillary')
+
+    def __init__(self, capacity=100000):
+        if capacity < 1:
+            raise ValueError('capacity should be positive: {}'.format(capacity))
+        self.capacity = capacity
+        self._timestamps = np.zeros(2 * capacity, dtype=np.float64)
+        self._pressures = np.zeros((2 * capacity, len(self.PressureColumns)), dtype=np.float64)
+        self._temperatures = np.zeros((2 * capacity, len(self.TemperatureColumns)), dtype=np.int16)
+        self._states = np.zeros(2 * capacity, dtype=np.uint32)
+        self._index = 0  # next row to write, in 0 .. capacity - 1
+        self._size = 0
+        self.total_count = 0  # number of samples appended since creation or clear()
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        self._index = 0
+        self._size = 0
+        self.total_count = 0
+
+    def append(self, snapshot: Snapshot):
+        self.append_values(snapshot.timestamp,
+                           [getattr(snapshot, name) for name in self.PressureColumns],
+                           [getattr(snapshot, name) for name in self.TemperatureColumns],
+                           snapshot.states)
+
+    def append_values(self, timestamp, pressures, temperatures, states=0):
+        """Append a sample with values in the order of PressureColumns and TemperatureColumns"""
+        for i in (self._index, self._index + self.capacity):
+            self._timestamps[i] = timestamp
+            self._pressures[i] = pressures
+            self._temperatures[i] = temperatures
+            self._states[i] = states
+        self._index = (self._index + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self.total_count += 1
+
+    def _get_slice(self, n=None):
+        """Slice of the mirrored arrays for the latest n samples, oldest first"""
+        if n is None or n > self._size:
+            n = self._size
+        end = self._index + self.capacity
+        return slice(end - n, end)
+
+    def get_timestamps(self, n=None):
+        """View of the latest n timestamps in seconds since the epoch"""
+        return self._timestamps[self._get_slice(n)]
+
+    def get_pressures(self, n=None):
+        """View of the latest n pressures in Torr, an (n, 3) array in PressureColumns order"""
+        return self._pressures[self._get_slice(n)]
+
+    def get_temperatures(self, n=None):
+        """View of the latest n temperatures in °C, an (n, 5) array in TemperatureColumns order"""
+        return self._temperatures[self._get_slice(n)]
+
+    def get_states(self, n=None):
+        """View of the latest n ZBST state bitfields"""
+        return self._states[self._get_slice(n)]
+
+    def get_column(self, name, n=None):
+        """View of the latest n values of a Snapshot field"""
+        if name == 'timestamp':
+            return self.get_timestamps(n)
+        if name == 'states':
+            return self.get_states(n)
+        if name in self.PressureColumns:
+            return self.get_pressures(n)[:, self.PressureColumns.index(name)]
+        if name in self.TemperatureColumns:
+            return self.get_temperatures(n)[:, self.TemperatureColumns.index(name)]
+        raise KeyError('{} is not a column of {}'.format(name, self.__class__.__name__))
+
+    def get_time_range(self, start_time=None, end_time=None):
+        """
+        Return a slice selecting samples from start_time up to end_time
+        in the arrays returned with n=None
+        """
+        timestamps = self.get_timestamps()
+        start = 0 if start_time is None else np.searchsorted(timestamps, start_time, 'left')
+        end = len(timestamps) if end_time is None else \
+            np.searchsorted(timestamps, end_time, 'right')
+        return slice(int(start), int(end))
+
+    def get_latest(self):
+        """Return the latest sample as a Snapshot, or None if empty"""
+        if self._size == 0:
+            return None
+        i = (self._index - 1) % self.capacity
+        return Snapshot(float(self._timestamps[i]),
+                        *(float(v) for v in self._pressures[i]),
+                        *(int(v) for v in self._temperatures[i]),
+                        int(self._states[i]))
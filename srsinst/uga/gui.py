@@ -0,0 +1,32 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Control of the optional GUI packages used by srsgui and srsinst.rga.
+
+srsgui and srsinst.rga import Qt and matplotlib only if they are available.
+Scripts without plots, such as uga-monitor, hide them from the import system
+before the instrument driver is imported, which keeps the startup time
+to a fraction of a second.
+
+    from srsinst.uga.gui import block_gui_modules
+    block_gui_modules()
+    from srsinst.uga import UGA100
+"""
+
+import sys
+
+# Optional packages of srsgui and srsinst.rga not used without a GUI
+GuiModules = ('matplotlib', 'PySide6', 'PySide2', 'PyQt6', 'PyQt5')
+
+
+def block_gui_modules():
+    """
+    Make imports of GuiModules fail, as if they were not installed, in this process.
+    Modules already imported are kept.
+    """
+    for name in GuiModules:
+        if name not in sys.modules:
+            sys.modules[name] = None
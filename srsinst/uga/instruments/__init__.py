@@ -1 +1,6 @@
-from .get_instruments import get_rga, get_uga
+from srsinst.uga.lazy import make_lazy_getattr
+
+__getattr__, __dir__ = make_lazy_getattr(__name__, globals(), {
+    'get_rga': '.get_instruments',
+    'get_uga': '.get_instruments',
+})
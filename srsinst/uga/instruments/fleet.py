@@ -0,0 +1,230 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Polling service for many UGAs with a shared scheduler.
+
+FleetPoller reads a Snapshot and a StatusState from every UGA with a single
+batch query on a worker pool, with a poll interval for each unit and start
+times staggered over the interval, and publishes the results to a FleetStore.
+Tasks read the latest results from the store without touching the instruments.
+
+    from srsinst.uga.instruments.fleet import FleetPoller, get_fleet_store
+
+    # In a Task with UGAs defined in the .taskconfig file
+    poller = FleetPoller.from_task(self, interval=2.0)
+    poller.start()
+    ...
+    record = get_fleet_store().get('uga2')
+    print(record.snapshot.ig_pressure, record.state.mode)
+    ...
+    poller.stop()
+"""
+
+import time
+import heapq
+import logging
+import threading
+from typing import NamedTuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from srsgui import Task
+
+from .uga100.uga import UGA100
+from .uga100.records import Snapshot
+from .uga100.components import Status, StatusState
+from .get_instruments import get_uga
+
+logger = logging.getLogger(__name__)
+
+
+class FleetRecord(NamedTuple):
+    """Latest result of polling a UGA"""
+    name: str
+    timestamp: float
+    snapshot: Optional[Snapshot]
+    state: Optional[StatusState]
+    error: Optional[str]  # message of the exception from the last poll, None if successful
+    poll_count: int
+
+
+class FleetStore:
+    """
+    Thread-safe store of the latest FleetRecord of each UGA
+    """
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+        self._updated = threading.Condition(self._lock)
+
+    def put(self, record: FleetRecord):
+        with self._lock:
+            self._records[record.name] = record
+            self._updated.notify_all()
+
+    def get(self, name) -> Optional[FleetRecord]:
+        """Return the latest record of the UGA, or None if not polled yet"""
+        with self._lock:
+            return self._records.get(name)
+
+    def get_all(self):
+        """Return a dict of {name: latest record}"""
+        with self._lock:
+            return dict(self._records)
+
+    def names(self):
+        with self._lock:
+            return list(self._records)
+
+    def wait_for_update(self, timeout=None):
+        """Wait until any record is updated. Returns False on timeout"""
+        with self._lock:
+            return self._updated.wait(timeout)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+_fleet_store = FleetStore()
+
+
+def get_fleet_store() -> FleetStore:
+    """Return the FleetStore shared in the process"""
+    return _fleet_store
+
+
+class FleetPoller:
+    """
+    Poll UGAs on a worker pool and publish the results to a FleetStore
+
+    Parameters
+    -----------
+        ugas: dict
+            {name: UGA100 instance}
+        interval: float
+            seconds between the start of polls of a UGA
+        intervals: dict, optional
+            {name: interval} for UGAs polled at a different rate
+        max_workers: int, optional
+            number of worker threads, the default is one per UGA up to 8
+        store: FleetStore, optional
+            the default is the store from get_fleet_store()
+    """
+
+    # Snapshot and state in a single exchange
+    PollCommands = UGA100.SnapshotCommands + Status.StateCommands
+
+    def __init__(self, ugas, interval=2.0, intervals=None, max_workers=None, store=None):
+        self.ugas = dict(ugas)
+        self.interval = interval
+        self.intervals = dict(intervals) if intervals else {}
+        self.max_workers = max_workers or max(1, min(8, len(self.ugas)))
+        self.store = store if store is not None else get_fleet_store()
+
+        self._queue = []  # heap of (due time, name)
+        self._poll_counts = {name: 0 for name in self.ugas}
+        self._condition = threading.Condition()
+        self._executor = None
+        self._thread = None
+        self._running = False
+
+    @classmethod
+    def from_task(cls, task: Task, names=None, **kwargs):
+        """
+        Create a FleetPoller for UGAs in a task.
+
+        If names is None, all UGA100 instruments in the .taskconfig file are used.
+        """
+        if names is None:
+            names = [name for name, inst in task.inst_dict.items()
+                     if isinstance(inst, UGA100)]
+        ugas = {name: get_uga(task, name) for name in names}
+        return cls(ugas, **kwargs)
+
+    def get_interval(self, name):
+        return self.intervals.get(name, self.interval)
+
+    def start(self):
+        """Start polling with start times staggered over the interval of each UGA"""
+        if self._running:
+            return
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix='fleet')
+        now = time.monotonic()
+        count = len(self.ugas)
+        with self._condition:
+            self._queue = [(now + i * self.get_interval(name) / count, name)
+                           for i, name in enumerate(self.ugas)]
+            heapq.heapify(self._queue)
+        self._thread = threading.Thread(target=self._schedule, name='fleet-scheduler',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def is_running(self):
+        return self._running
+
+    def _schedule(self):
+        while True:
+            with self._condition:
+                while self._running:
+                    if self._queue:
+                        delay = self._queue[0][0] - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+                if not self._running:
+                    return
+                _, name = heapq.heappop(self._queue)
+            self._executor.submit(self._poll, name)
+
+    def _poll(self, name):
+        started = time.monotonic()
+        uga = self.ugas[name]
+        snapshot = state = error = None
+        try:
+            replies = uga.query_batch(self.PollCommands)
+            count = len(UGA100.SnapshotCommands)
+            snapshot = UGA100.make_snapshot(replies[:count])
+            state = uga.status.add_errors(Status.make_state(replies[count:]))
+        except Exception as e:
+            error = '{}: {}'.format(type(e).__name__, e)
+            logger.warning('Polling {} failed: {}'.format(name, error))
+        self._poll_counts[name] += 1
+
+        previous = self.store.get(name)
+        if error is not None and previous is not None:
+            # Keep the last good readings along with the error
+            snapshot, state = previous.snapshot, previous.state
+        self.store.put(FleetRecord(name, time.time(), snapshot, state, error,
+                                   self._poll_counts[name]))
+
+        with self._condition:
+            if self._running:
+                due = max(started + self.get_interval(name), time.monotonic())
+                heapq.heappush(self._queue, (due, name))
+                self._condition.notify()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
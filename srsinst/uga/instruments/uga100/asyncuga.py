@@ -0,0 +1,371 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Asynchronous UGA client over TCP/IP using asyncio streams.
+
+AsyncUGA100 has the same component tree as UGA100, with the commands of each
+component available as coroutines, so that one event loop can poll many UGAs.
+
+    import asyncio
+    from srsinst.uga import AsyncUGA100, Keys
+
+    async def main():
+        uga = AsyncUGA100('192.168.1.10', 'srsuga', 'srsuga')
+        await uga.connect()
+        print(await uga.mode.get('state'))
+        print(await uga.pressure.get('values', Keys.IG))
+        await uga.ig.set('state', Keys.On)
+        snapshot = await uga.read_snapshot()
+        await uga.disconnect()
+
+    asyncio.run(main())
+
+Requests to a UGA are sent one at a time. A semaphore shared by multiple
+AsyncUGA100 instances bounds the number of requests in flight across all of them.
+Binary RGA scans and RGA total pressure are not available asynchronously.
+"""
+
+import time
+import asyncio
+
+from srsgui.inst.indexcommands import IndexCommand
+from srsgui.inst.component import Component
+from srsgui.inst.communications.interface import Interface
+from srsgui.inst.exceptions import InstException, InstCommunicationError, \
+                                   InstLoginFailureError, InstQueryError, InstSetError
+from srsinst.rga.instruments.rga100.commands import RgaIntCommand, RgaFloatCommand
+
+from .uga import UGA100
+from .components import Status
+from .records import ErrorRecord
+from .errors import ErrorHistory
+
+
+class _TemplateRoot(Component):
+    """
+    Parent of the components used as command templates by AsyncComponent,
+    with an interface that is never connected
+    """
+
+    def __init__(self):
+        super().__init__(None)
+        self.comm = Interface()
+
+
+class AsyncComponent:
+    """
+    Asynchronous counterpart of a Component, created from a component of UGA100.ComponentClasses
+
+    Commands are accessed with get() and set() using the command name
+    of the Component, and child components are attributes.
+    """
+
+    def __init__(self, client, component: Component):
+        self._client = client
+        self._component = component
+        self._commands = {}
+        for name in component.get_command_dict(include_superclass=True):
+            command = self._find_command(component, name)
+            if command is not None:
+                self._commands[name] = command
+        for name in component.get_component_dict():
+            setattr(self, name, AsyncComponent(client, getattr(component, name)))
+
+    @staticmethod
+    def _find_command(component, name):
+        if name in component.__dict__:
+            return component.__dict__[name]
+        for c in type(component).__mro__:
+            if name in c.__dict__:
+                return c.__dict__[name]
+        return None
+
+    @property
+    def commands(self):
+        """Names of commands available with get() and set()"""
+        return list(self._commands)
+
+    def _get_command(self, name):
+        if name not in self._commands:
+            raise AttributeError('{} has no command {}'
+                                 .format(type(self._component).__name__, name))
+        return self._commands[name]
+
+    async def get(self, name, index=None):
+        """Query a command, with an index for an index command"""
+        command = self._get_command(name)
+        if not command._get_enable:
+            raise AttributeError('No query command for {}'.format(command.remote_command))
+        if isinstance(command, IndexCommand):
+            query_string = '{}? {}'.format(command.remote_command,
+                                           command._convert_index(index))
+        else:
+            query_string = command._get_command_format.format(command.remote_command)
+
+        reply = await self._client.query_text(query_string)
+        try:
+            if callable(command._get_convert_function):
+                return command._get_convert_function(reply)
+            return reply
+        except ValueError:
+            raise InstQueryError('Error during conversion CMD: {} Reply: {}'
+                                 .format(query_string, reply))
+
+    async def set(self, name, value, index=None):
+        """
+        Set a command, with an index for an index command
+
+        RGA commands replying with a status byte return the status.
+        """
+        command = self._get_command(name)
+        if not command._set_enable:
+            raise AttributeError('No set command for {}'.format(command.remote_command))
+        try:
+            if callable(command._set_convert_function):
+                value = command._set_convert_function(value)
+        except ValueError:
+            raise InstSetError('Error during conversion: CMD: {} {}'
+                               .format(command.remote_command, value))
+        if isinstance(command, IndexCommand):
+            set_string = '{} {}, {}'.format(command.remote_command,
+                                            command._convert_index(index), value)
+        else:
+            set_string = command._set_command_format.format(command.remote_command, value)
+        if isinstance(command, (RgaIntCommand, RgaFloatCommand)):
+            return int(await self._client.query_text(set_string))
+        await self._client.send(set_string)
+
+
+class AsyncMode(AsyncComponent):
+    async def start(self):
+        await self._client.send('ZMST')
+
+    async def stop(self):
+        await self._client.send('ZMSP')
+
+    async def sleep(self):
+        await self._client.send('ZMSL')
+
+
+class AsyncStatus(AsyncComponent):
+    """
+    Asynchronous Status, draining errors in batches like Status.
+    Error messages are cached in the Status component it is created from.
+    """
+
+    def __init__(self, client, component: Status):
+        super().__init__(client, component)
+        self.error_history = ErrorHistory()
+
+    async def read_error_codes(self):
+        """Asynchronous Status.read_error_codes()"""
+        codes = []
+        while len(codes) <= Status.MaxErrorCode:
+            new_codes, is_empty = Status.parse_error_codes(
+                await self._client.query_batch(Status.ErrorReadCommands))
+            codes.extend(new_codes)
+            if is_empty:
+                break
+        return codes
+
+    async def get_error_messages(self, codes=None):
+        """Asynchronous Status.get_error_messages()"""
+        status = self._component
+        codes = range(Status.MaxErrorCode + 1) if codes is None else codes
+        try:
+            for chunk, commands in status.get_missing_message_commands(codes):
+                status.update_error_messages(chunk, await self._client.query_batch(commands))
+        except InstException:
+            pass
+        return status.lookup_error_messages(codes)
+
+    async def drain_errors(self):
+        """Asynchronous Status.drain_errors()"""
+        timestamp = time.time()
+        codes = await self.read_error_codes()
+        messages = await self.get_error_messages(codes)
+        records = tuple(ErrorRecord(timestamp, code, messages[code]) for code in codes)
+        self.error_history.extend(records)
+        return records
+
+    async def get_state(self):
+        """Asynchronous Status.get_state()"""
+        replies = await self._client.query_batch(Status.StateCommands)
+        state = Status.make_state(replies)
+        if state.states & Status.ErrorMask:
+            records = await self.drain_errors()
+            state = state._replace(errors=tuple(r.message for r in records),
+                                   error_codes=tuple(r.code for r in records))
+        return state
+
+    async def get_status_text(self):
+        return (await self.get_state()).get_text()
+
+
+class AsyncUGA100:
+    """
+    Asynchronous UGA client over TCP/IP
+
+    Parameters
+    -----------
+        ip_address: str
+            IP address of the UGA
+        user_id: str
+            user name for login
+        password: str
+            password for login
+        port: int, optional
+            TCP port of the UGA, the default is 818
+        timeout: float, optional
+            seconds to wait for a reply
+        semaphore: asyncio.Semaphore, optional
+            shared among clients to bound the number of requests in flight
+    """
+    _term_char = UGA100._term_char
+
+    def __init__(self, ip_address, user_id='srsuga', password='srsuga', port=818,
+                 timeout=10.0, semaphore=None):
+        self.ip_address = ip_address
+        self.user_id = user_id
+        self.password = password
+        self.port = port
+        self.timeout = timeout
+        self.semaphore = semaphore
+
+        self._reader = None
+        self._writer = None
+        self._lock = None
+        self._model_name = None
+        self._serial_number = None
+        self._firmware_version = None
+
+        # The component tree is built from the component classes of UGA100
+        root = _TemplateRoot()
+        for name, component_class in UGA100.ComponentClasses:
+            async_class = {'mode': AsyncMode, 'status': AsyncStatus}.get(name, AsyncComponent)
+            setattr(self, name, async_class(self, component_class(root)))
+
+    def is_connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self):
+        """Open a TCP connection, login and configure components for the model"""
+        self._lock = asyncio.Lock()
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.ip_address, self.port), self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            raise InstCommunicationError('Failed connecting to {}'.format(self.ip_address))
+
+        self._writer.write(b' ' + self._term_char)
+        await self._read_until(b'Name:')
+        self._writer.write(self.user_id.encode() + self._term_char)
+        await self._read_until(b'Password', required=False)
+        self._writer.write(self.password.encode() + self._term_char)
+        try:
+            await self._read_until(b'Welcome')
+        except InstCommunicationError:
+            await self.disconnect()
+            raise InstLoginFailureError('Check if user id and password are correct.')
+        return await self.check_id()
+
+    async def _read_until(self, prompt, required=True):
+        data = b''
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        while prompt not in data:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                if required:
+                    raise InstCommunicationError('No {} prompt from {}'
+                                                 .format(prompt.decode(), self.ip_address))
+                break
+            try:
+                chunk = await asyncio.wait_for(self._reader.read(1024), remaining)
+            except asyncio.TimeoutError:
+                continue
+            if not chunk:
+                raise InstCommunicationError('Connection closed by {}'.format(self.ip_address))
+            data += chunk
+        return data
+
+    async def disconnect(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+        self._writer = None
+        self._reader = None
+
+    async def check_id(self):
+        reply = await self.query_text('ZQID?')
+        ids = UGA100.parse_id_string(reply)
+        if ids is None:
+            return None, None, None
+        self._model_name, self._serial_number, self._firmware_version = ids
+        names = UGA100.get_model_components(self._model_name)
+        for name in UGA100.OptionalComponents:
+            if name not in names and name in self.__dict__:
+                delattr(self, name)
+        return ids
+
+    async def _exchange(self, message: bytes, count):
+        if not self.is_connected():
+            raise InstCommunicationError('{} not connected'.format(self.ip_address))
+        async with self._lock:
+            self._writer.write(message)
+            await self._writer.drain()
+            replies = []
+            try:
+                for _ in range(count):
+                    reply = await asyncio.wait_for(
+                        self._reader.readuntil(self._term_char), self.timeout)
+                    replies.append(reply.decode('utf-8').strip())
+            except asyncio.TimeoutError:
+                # A late reply would be taken as the reply to the next request
+                await self.disconnect()
+                raise InstCommunicationError('Timeout with {} on {}'
+                                             .format(message, self.ip_address))
+            except asyncio.IncompleteReadError:
+                await self.disconnect()
+                raise InstCommunicationError('Connection closed by {}'.format(self.ip_address))
+            return replies
+
+    async def _limited(self, message, count):
+        if self.semaphore is None:
+            return await self._exchange(message, count)
+        async with self.semaphore:
+            return await self._exchange(message, count)
+
+    async def send(self, cmd):
+        await self._limited(cmd.encode('utf-8') + self._term_char, 0)
+
+    async def query_text(self, cmd):
+        replies = await self._limited(cmd.encode('utf-8') + self._term_char, 1)
+        return replies[0]
+
+    async def query_batch(self, commands):
+        """Asynchronous UGA100.query_batch()"""
+        if not commands:
+            return []
+        message = b''.join(cmd.encode('utf-8') + self._term_char for cmd in commands)
+        return await self._limited(message, len(commands))
+
+    async def read_snapshot(self):
+        """Asynchronous UGA100.read_snapshot()"""
+        return UGA100.make_snapshot(await self.query_batch(UGA100.SnapshotCommands))
+
+    async def get_status(self):
+        return await self.status.get_status_text()
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.disconnect()
@@ -0,0 +1,181 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Time-to-live cache for query replies of slow-changing UGA settings.
+
+Identification, Ethernet configuration and setup parameters change only when
+they are set, either remotely or from the front panel. With the cache enabled
+with UGA100.enable_cache(), their replies are kept for a TTL, and sending
+a command invalidates the cached replies of the same remote command.
+ZRST invalidates everything.
+
+    >>> uga.enable_cache()
+    >>> uga.status.serial_number  # queried from the UGA
+    '94224'
+    >>> uga.status.serial_number  # from the cache
+    '94224'
+"""
+
+import re
+import time
+import threading
+
+from .proxy import InterfaceProxy
+
+Forever = None
+"""TTL value for replies that never expire while connected"""
+
+DefaultTTL = {
+    # Identification
+    'ZQID': Forever,
+    'ZQSN': Forever,
+    'ZQFV': Forever,
+    'ZQMC': Forever,
+
+    # Ethernet
+    'ZPIP': 30.0,
+    'ZPGW': 30.0,
+    'ZPSM': 30.0,
+    'ZPNM': 30.0,
+    'ZPPW': 30.0,
+    'ZPDU': 30.0,
+    'ZPSP': 30.0,
+    'ZPTO': 30.0,
+    'ZPBA': 30.0,
+
+    # Setup parameters
+    'ZPPU': 30.0,
+    'ZPFL': 30.0,
+    'ZPTB': 30.0,
+    'ZPTH': 30.0,
+    'ZPBT': 30.0,
+    'ZPBO': 30.0,
+    'ZPRO': 30.0,
+    'ZPRI': 30.0,
+    'ZPAS': 30.0,
+    'ZPAV': 30.0,
+    'ZPLM': 30.0,
+    'ZCPC': 30.0,
+    'ZCVL': 30.0,
+}
+
+InvalidateAllCommands = ('ZRST',)
+
+_command_name = re.compile(r'\s*([A-Za-z]+)')
+
+
+def get_command_name(cmd: str) -> str:
+    """Return the remote command name of a command string, such as 'ZPTB' for 'ZPTB? 1'"""
+    match = _command_name.match(cmd)
+    return match.group(1).upper() if match else ''
+
+
+class CommandCache:
+    """
+    Query replies with expiration time, keyed by the query string
+    """
+
+    def __init__(self, ttl_dict=None):
+        self.ttl_dict = dict(DefaultTTL)
+        if ttl_dict:
+            self.ttl_dict.update(ttl_dict)
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # query string: (reply, expiration time)
+        self._generations = {}  # remote command name: number of invalidations
+        self._generation = 0  # number of invalidations of all entries
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_key(cmd):
+        return ' '.join(cmd.upper().split())
+
+    def is_cacheable(self, cmd):
+        return '?' in cmd and get_command_name(cmd) in self.ttl_dict
+
+    def get(self, cmd):
+        """Return the cached reply for the query, or None if not cached or expired"""
+        key = self._get_key(cmd)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                reply, expiration = entry
+                if expiration is None or expiration > time.monotonic():
+                    self.hits += 1
+                    return reply
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def get_generation(self, cmd):
+        """Return a value that changes whenever cached replies of cmd are invalidated"""
+        with self._lock:
+            return self._generation, self._generations.get(get_command_name(cmd), 0)
+
+    def put(self, cmd, reply, generation=None):
+        """
+        Cache the reply for the query. If generation from get_generation() is given,
+        the reply is not cached when the command was invalidated since then,
+        as it may have been read before a new value was set.
+        """
+        name = get_command_name(cmd)
+        ttl = self.ttl_dict.get(name)
+        expiration = None if ttl is Forever else time.monotonic() + ttl
+        with self._lock:
+            if generation is not None and \
+                    generation != (self._generation, self._generations.get(name, 0)):
+                return
+            self._entries[self._get_key(cmd)] = (reply, expiration)
+
+    def invalidate(self, name=None):
+        """Remove cached replies of the remote command name, or all, if name is None"""
+        with self._lock:
+            if name is None:
+                self._generation += 1
+                self._entries.clear()
+                return
+            self._generations[name] = self._generations.get(name, 0) + 1
+            for key in [k for k in self._entries if get_command_name(k) == name]:
+                del self._entries[key]
+
+    def notify_sent(self, message):
+        """Invalidate entries affected by the commands in a message sent to the UGA"""
+        for cmd in re.split(r'[\r\n;]', message):
+            name = get_command_name(cmd)
+            if not name:
+                continue
+            if name in InvalidateAllCommands:
+                self.invalidate()
+            elif name in self.ttl_dict and '?' not in cmd:
+                self.invalidate(name)
+
+
+class CachingInterface(InterfaceProxy):
+    """
+    Interface proxy answering cacheable queries from a CommandCache
+    """
+
+    def __init__(self, interface, cache: CommandCache):
+        super().__init__(interface)
+        self.cache = cache
+
+    def query_text(self, cmd):
+        if not self.cache.is_cacheable(cmd):
+            return self.interface.query_text(cmd)
+        reply = self.cache.get(cmd)
+        if reply is None:
+            generation = self.cache.get_generation(cmd)
+            reply = self.interface.query_text(cmd)
+            self.cache.put(cmd, reply, generation)
+        return reply
+
+    def send(self, cmd):
+        self.interface.send(cmd)
+        self.cache.notify_sent(cmd)
+
+    def _send(self, cmd):
+        self.interface._send(cmd)
+        self.cache.notify_sent(cmd)
@@ -3,6 +3,9 @@
 ##! Subject to the MIT License
 ##! 
 
+import time
+from typing import NamedTuple, Tuple
+
 from srsgui import Component, Instrument
 
 from srsgui import Command, GetCommand,\
@@ -15,8 +18,12 @@ from srsgui import IndexCommand, IndexGetCommand, \
                    IntIndexCommand, IntIndexGetCommand, \
                    BoolIndexCommand, BoolIndexGetCommand,\
                    FloatIndexCommand, FloatIndexGetCommand
+from srsgui.inst.exceptions import InstException, InstQueryError, InstIdError
 from srsinst.rga import RGA100
+from srsinst.rga.instruments.rga100.scans import Scans, Scans200, Scans300
 from .keys import Keys
+from .records import ScanParameters, ErrorRecord
+from .errors import ErrorHistory
 
 
 class Mode(Component):
@@ -67,12 +74,15 @@ class Mode(Component):
 
     def start(self):
         self.comm.send('ZMST')
+        self._parent.wake_state_watcher()
 
     def stop(self):
         self.comm.send('ZMSP')
-        
+        self._parent.wake_state_watcher()
+
     def sleep(self):
         self.comm.send('ZMSL')
+        self._parent.wake_state_watcher()
 
     allow_run_button = [start, stop, sleep]
 
@@ -122,20 +132,138 @@ class VentValve(Component):
 
 
 class RGA(RGA100):
+    """
+    RGA in the UGA, with scan parameters tracked to avoid redundant commands
+
+    set_scan_parameters() keeps a shadow copy of the scan parameters
+    in the RGA, and sends only the ones that changed. Named scan profiles
+    are switched with use_scan_profile().
+
+        uga.rga.add_scan_profile('survey', 1, 100, 4, 10)
+        uga.rga.add_scan_profile('histogram', 10, 45, 3, 10)
+        uga.rga.use_scan_profile('survey')
+        uga.rga.scan.get_analog_scan()
+
+    The shadow copy is not updated when scan parameters are changed
+    with scan.set_parameters() or scan commands directly.
+    Call invalidate_scan_parameters() after doing so.
+    """
     state = DictCommand('ZCRG', Mode.OffOnDict, Mode.StateDict)
 
+    # ScanParameters field: Scans command
+    ScanCommandNames = {
+        'initial_mass': 'initial_mass',
+        'final_mass': 'final_mass',
+        'scan_speed': 'speed',
+        'steps_per_amu': 'resolution',
+    }
+
     def __init__(self, parent):
+        self._scan_parameters = None
+        self.scan_profiles = {}
         super().__init__()
 
         self._parent = parent
         self._parent._children.append(self)
         self.comm = parent.comm
         self.update_components()
+        # The RGA is configured in UGA100.check_id(), when the RGA is on.
+
+    def check_id(self):
+        if not self.is_connected():
+            return None, None, None
+        return self.configure(self.query_text('ID?').strip())
+
+    def configure(self, reply):
+        """
+        Configure the RGA with a reply of 'ID?', as RGA100.check_id() does,
+        without querying it again.
+
+        returns
+        --------
+            tuple
+                (model_name, serial_number, firmware_version)
+        """
+        self.invalidate_scan_parameters()
+        self._m_max = 100
+        if len(reply) < 20:
+            return None, None, None
+
+        if self._IdString not in reply:
+            raise InstIdError("Invalid instrument: {} not in {}"
+                              .format(self._IdString, reply[0:9]))
+        self._id_string = reply
+        self._model_name = reply[0:9]
+        self._firmware_version = reply[12:16]
+        self._serial_number = reply[18:]
+
+        try:
+            self._m_max = int(reply[6:9])  # uninitialized unit has '???'
+        except ValueError:
+            self._m_max = 100
+
+        for max_mass, scan_class in ((300, Scans300), (200, Scans200), (100, Scans)):
+            if self._m_max >= max_mass:
+                self._m_max = max_mass
+                if not isinstance(self.scan, scan_class):
+                    self.scan = scan_class(self)
+                break
+        return self._model_name, self._serial_number, self._firmware_version
+
+    def invalidate_scan_parameters(self):
+        """Forget the shadow copy, so that all parameters are sent next time"""
+        self._scan_parameters = None
+
+    def get_scan_parameters(self) -> ScanParameters:
+        """Return scan parameters from the shadow copy, or read them from the RGA"""
+        if self._scan_parameters is None:
+            self._scan_parameters = ScanParameters(*self.scan.get_parameters())
+        return self._scan_parameters
+
+    def set_scan_parameters(self, initial_mass, final_mass, scan_speed, steps_per_amu):
+        """
+        Set scan parameters like Scans.set_parameters(),
+        sending only the parameters different from the shadow copy.
+
+        Returns the number of parameters changed.
+        """
+        new = ScanParameters(initial_mass, final_mass, scan_speed, steps_per_amu)
+        old = self._scan_parameters
+        if old == new:
+            return 0
+
+        self._scan_parameters = None  # unknown if an exception occurs during update
+        if old is None:
+            self.scan.set_parameters(*new)
+            self._scan_parameters = new
+            return len(new)
+
+        fields = list(self.ScanCommandNames)
+        if new.initial_mass > old.final_mass:
+            # Keep the initial mass not larger than the final mass at any time
+            fields[0], fields[1] = fields[1], fields[0]
+        count = 0
+        for field in fields:
+            value = getattr(new, field)
+            if value != getattr(old, field):
+                setattr(self.scan, self.ScanCommandNames[field], value)
+                count += 1
+        self._scan_parameters = new
+        return count
+
+    def add_scan_profile(self, name, initial_mass, final_mass, scan_speed, steps_per_amu):
+        self.scan_profiles[name] = ScanParameters(initial_mass, final_mass,
+                                                  scan_speed, steps_per_amu)
+
+    def remove_scan_profile(self, name):
+        del self.scan_profiles[name]
+
+    def use_scan_profile(self, name):
+        """Set scan parameters of a profile. Returns the number of parameters changed"""
+        if name not in self.scan_profiles:
+            raise KeyError('No scan profile named {}'.format(name))
+        return self.set_scan_parameters(*self.scan_profiles[name])
 
-        if self.comm.is_connected():
-            if self.state == Keys.On:
-                self.check_id()
-   
 
 class IonGauge(Component):
     """
@@ -281,6 +409,18 @@ class Status(Component):
         0:  ('Bypass Pump', 'On', 'Off')
     }
 
+    ErrorMask = 1 << 15
+
+    # (name, mask, idle mask, on tag, off tag) to decode StateBitDict items.
+    # Pumps with an idle state have the idle bit next to the on bit.
+    StateItems = tuple(
+        (item[0], 1 << bit,
+         1 << (bit + 1) if item[0] in ('Turbo Pump', 'Roughing Pump') else 0,
+         item[1], item[2])
+        for bit, item in StateBitDict.items()
+        if item[0] not in (None, 'Error', 'TP Idle', 'RP Idle')
+    )
+
     pressure_interlock = BoolCommand('ZCPC')
     speaker_volume = IntCommand('ZCVL')
     
@@ -295,66 +435,196 @@ class Status(Component):
     error = DictGetCommand('ZERR', Keys.ErrorMessageDict)
     error_number = IntGetCommand('ZERR')
 
+    MaxErrorCode = 126
+    ErrorReadSize = 4  # ZERR? queries sent in a single write while draining errors
+    ErrorReadCommands = ['ZERR?'] * ErrorReadSize
+    ErrorMessageReadSize = 32  # ZEDS? queries sent in a single write
+
+    # Messages used for codes not read with ZEDS from the UGA
+    LocalErrorMessages = {code: message for message, code in Keys.ErrorMessageDict.items()}
+
     def __init__(self, parent):
         super().__init__(parent)
-        self.error_message = IndexGetCommand('ZEDS', index_max=126)
+        self.error_message = IndexGetCommand('ZEDS', index_max=self.MaxErrorCode)
         self.add_parent_to_index_commands()
 
         self.exclude_capture = [Status.error_number, self.error_message]
+        self.error_history = ErrorHistory()
+        self._error_messages = {}  # {code: message} read with ZEDS
+
+    @staticmethod
+    def parse_error_codes(replies):
+        """
+        Convert replies of ZERR? to error codes, up to the first 0.
+
+        Returns
+        --------
+            tuple(list(int), bool)
+                error codes, and True if the error queue is empty
+        """
+        codes = []
+        for reply in replies:
+            try:
+                code = int(reply)
+            except ValueError:
+                raise InstQueryError('Error during conversion of ZERR? reply: {}'.format(reply))
+            if code == 0:
+                return codes, True
+            codes.append(code)
+        return codes, False
+
+    def read_error_codes(self):
+        """
+        Read error codes in the error queue until it is empty.
+
+        ZERR? queries are sent ErrorReadSize at a time in a single write.
+        Extra queries after the queue is empty reply 0, and are harmless.
+        Reading stops after MaxErrorCode + 1 errors, the size of the queue.
+        """
+        codes = []
+        while len(codes) <= self.MaxErrorCode:
+            new_codes, is_empty = self.parse_error_codes(
+                self._parent.query_batch(self.ErrorReadCommands))
+            codes.extend(new_codes)
+            if is_empty:
+                break
+        return codes
+
+    def drain_errors(self):
+        """
+        Read all errors in the error queue, and add them to error_history.
+
+        Returns
+        --------
+            tuple(ErrorRecord)
+                errors in the order they occurred
+        """
+        timestamp = time.time()
+        codes = self.read_error_codes()
+        messages = self.get_error_messages(codes)
+        records = tuple(ErrorRecord(timestamp, code, messages[code]) for code in codes)
+        self.error_history.extend(records)
+        return records
+
+    def get_missing_message_commands(self, codes):
+        """ZEDS? queries for codes without a cached message, in batches of ErrorMessageReadSize"""
+        missing = [code for code in dict.fromkeys(codes) if code not in self._error_messages]
+        return [(missing[i:i + self.ErrorMessageReadSize],
+                 ['ZEDS? {}'.format(code) for code in missing[i:i + self.ErrorMessageReadSize]])
+                for i in range(0, len(missing), self.ErrorMessageReadSize)]
+
+    def update_error_messages(self, codes, replies):
+        """Cache non-empty ZEDS? replies of codes"""
+        self._error_messages.update((code, reply) for code, reply in zip(codes, replies) if reply)
+
+    def lookup_error_messages(self, codes):
+        """{code: message} of codes from the cache, or the local table if not cached"""
+        return {code: self._error_messages.get(code) or self.LocalErrorMessages.get(
+                    code, 'Unknown error ({})'.format(code))
+                for code in codes}
+
+    def get_error_messages(self, codes=None):
+        """
+        Return {code: message} for codes, or for 0 to MaxErrorCode if None.
+
+        Messages are read with ZEDS? only for codes seen the first time,
+        in batches, and cached one by one. If reading fails, the messages read
+        so far are kept, and the local table is used for the rest,
+        which are read again next time.
+        """
+        codes = range(self.MaxErrorCode + 1) if codes is None else codes
+        try:
+            for chunk, commands in self.get_missing_message_commands(codes):
+                self.update_error_messages(chunk, self._parent.query_batch(commands))
+        except InstException:
+            pass
+        return self.lookup_error_messages(codes)
+
+    def get_error_message(self, code):
+        """Message of an error code from the ZEDS table, or the local table if unavailable"""
+        return self.get_error_messages([code])[code]
+
+    def get_state(self):
+        """
+        Get mode, state bitfields and errors with a single batch query.
+
+        Errors are drained with drain_errors() only when the error bit is set in the states.
+
+        Returns
+        --------
+            StatusState
+                immutable record to decode the bitfields and render text on demand
+        """
+        return self.add_errors(self.make_state(self._parent.query_batch(self.StateCommands)))
+
+    def add_errors(self, state):
+        """Drain errors into a StatusState from make_state(), if the error bit is set"""
+        if state.states & Status.ErrorMask:
+            records = self.drain_errors()
+            state = state._replace(errors=tuple(r.message for r in records),
+                                   error_codes=tuple(r.code for r in records))
+        return state
+
+    # ZBCT? clears the changed bits when read, so only StateWatcher reads it,
+    # with WatchCommands. Other readers would erase changes from each other.
+    StateCommands = ['ZMOD?', 'ZBST?', 'ZBTT?']
+    WatchCommands = StateCommands + ['ZBCT?']
+
+    @staticmethod
+    def make_state(replies, errors=()):
+        """Convert replies of StateCommands or WatchCommands to a StatusState"""
+        try:
+            mode = Mode.state.value_to_key(replies[0])
+            states, changing = int(replies[1]), int(replies[2])
+            changed = int(replies[3]) if len(replies) > 3 else 0
+        except (ValueError, IndexError):
+            raise InstQueryError('Error during conversion of status: {}'.format(replies))
+        return StatusState(time.time(), mode, states, changed, changing, tuple(errors))
 
     def get_status_text(self):
-        out_buffer = ''
-        error_buffer = 'Errors: '
+        return self.get_state().get_text()
+
+
+class StatusState(NamedTuple):
+    """
+    Mode, state bitfields and errors of a UGA from Status.get_state()
+
+    states, changed and changing are the raw ZBST, ZBCT and ZBTT bitfields,
+    decoded with Status.StateItems only when requested.
+    changed is 0 unless read with Status.WatchCommands.
+    """
+    timestamp: float
+    mode: str
+    states: int
+    changed: int
+    changing: int
+    errors: Tuple[str, ...]  # messages of error_codes
+    error_codes: Tuple[int, ...] = ()
+
+    def get_item_state(self, mask, idle_mask=0, on_tag='On', off_tag='Off'):
+        if self.changing & idle_mask:
+            return 'Changing'
+        if self.states & idle_mask:
+            return 'Idle'
+        if self.changing & mask:
+            return 'Changing'
+        if self.states & mask:
+            return on_tag
+        return off_tag
+
+    def get_item_states(self):
+        """Return a dict of {item name: state text}"""
+        return {name: self.get_item_state(mask, idle_mask, on_tag, off_tag)
+                for name, mask, idle_mask, on_tag, off_tag in Status.StateItems}
+
+    def get_text(self):
         item_line_format = '{}: {} \n'
-        
-        states = self.states
-        changed = self.changed
-        changing = self.changing        
-
-        out_buffer += item_line_format.format('Mode', self._parent.mode.state)
-        
-        for ind in Status.StateBitDict:
-            item_name = Status.StateBitDict[ind][0]
-            on_tag = Status.StateBitDict[ind][1]
-            off_tag = Status.StateBitDict[ind][2]
-            if item_name in (None, 'TP Idle', 'RP Idle'):
-                continue
-
-            mask = 1 << ind                
-            if item_name == 'Error':
-                if not states & mask:
-                    error_buffer += off_tag
-                    continue
-
-                while True:
-                    error = self.error
-                    if error == Keys.OK:
-                        break
-                    error_buffer += '{}\n'.format(error)
-                continue
-
-            if item_name in ('Turbo Pump', 'Roughing Pump'):
-                idle_mask = mask << 1
-                if changing & idle_mask:                
-                    text = item_line_format.format(item_name, 'Changing')
-                elif states & idle_mask:
-                    text = item_line_format.format(item_name, 'Idle')
-                elif changing & mask:
-                    text = item_line_format.format(item_name, 'Changing')
-                elif states & mask:
-                    text = item_line_format.format(item_name, on_tag)
-                else:
-                    text = item_line_format.format(item_name, off_tag)
-                out_buffer += text
-                continue
-                
-            if changing & mask:
-                text = item_line_format.format(item_name, 'Changing')
-            elif states & mask:
-                text = item_line_format.format(item_name, on_tag)
-            else:
-                text = item_line_format.format(item_name, off_tag)
-            out_buffer += text
-            
-        out_buffer += error_buffer   
-        return out_buffer
+        lines = [item_line_format.format('Mode', self.mode)]
+        lines.extend(item_line_format.format(name, state)
+                     for name, state in self.get_item_states().items())
+        if not self.states & Status.ErrorMask:
+            lines.append('Errors: None')
+        else:
+            lines.append('Errors: ')
+            lines.extend('{}\n'.format(error) for error in self.errors)
+        return ''.join(lines)
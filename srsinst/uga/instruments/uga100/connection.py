@@ -0,0 +1,263 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import time
+import socket
+import select
+import logging
+import threading
+
+from srsgui.inst.communications.tcpipinterface import TcpipInterface
+from srsgui.inst.exceptions import InstCommunicationError, InstLoginFailureError
+
+logger = logging.getLogger(__name__)
+
+
+class ManagedTcpipInterface(TcpipInterface):
+    """
+    TCP/IP interface that keeps a login session to a UGA alive
+
+    * Login waits for each prompt instead of fixed delays.
+    * A keep-alive query is sent when the connection has been idle for
+      keepalive_interval seconds, so that the UGA does not close the session
+      after the Ethernet timeout.
+    * If the UGA closed the session, the interface connects and logs in again
+      with backoff before the next command, and a query interrupted by
+      a closed connection is sent again once. Components keep using the same
+      interface, so nothing is rebuilt.
+
+    It has the same NAME as TcpipInterface, and replaces it in UGA100.available_interfaces.
+    """
+
+    KeepAliveCommand = 'ZMOD?'
+
+    def __init__(self):
+        super().__init__()
+        self.auto_reconnect = True
+        self.keepalive_interval = 20.0  # seconds, None to disable
+        self.reconnect_timeout = 60.0  # seconds to keep trying before giving up
+        self.max_backoff = 8.0  # seconds, the longest delay between reconnect attempts
+        self.reconnect_count = 0
+
+        self._login_args = None
+        self._local = threading.local()  # receiving: True in a thread inside _recv()
+        self._sent = False  # if the last _send() succeeded
+        self._last_activity = time.monotonic()
+        self._reconnect_callback = None
+        self._keepalive_thread = None
+        self._keepalive_stop = threading.Event()
+
+    def set_reconnect_callback(self, callback):
+        """Set a function called with no argument after reconnecting, with the lock released"""
+        self._reconnect_callback = callback if callable(callback) else None
+
+    def connect_with_login(self, ip_address, userid, password, port=818):
+        with self._lock:
+            self._open(ip_address, userid, password, port)
+        self._login_args = (ip_address, userid, password, port)
+        if self._connect_callback:
+            self._connect_callback('Connected TCPIP IP: {} port: {}'.format(ip_address, port))
+        self._start_keepalive()
+
+    def _open(self, ip_address, userid, password, port):
+        """Open a new socket and login, with the lock acquired"""
+        self._close_socket()
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.socket.settimeout(self._timeout)
+        try:
+            self.socket.connect((ip_address, port))
+        except OSError:
+            self._close_socket()
+            raise InstCommunicationError('Failed connecting to {}'.format(ip_address))
+        self.socket.setblocking(False)  # select() is used for timeout
+        self._ip_address = ip_address
+        self._tcp_port = port
+
+        for _ in range(3):
+            self._write(b' ' + self._term_char)
+            if b'Name:' in self._read_until(b'Name:', required=False).split(b'\r')[-1]:
+                break
+        else:
+            self._close_socket()
+            raise InstCommunicationError('No login prompt error')
+
+        self._write(userid.encode() + self._term_char)
+        self._read_until(b'Password', required=False)
+        self._write(password.encode() + self._term_char)
+        if b'Welcome' not in self._read_until(b'Welcome', required=False):
+            self._close_socket()
+            raise InstLoginFailureError('Check if user id and password are correct.')
+
+        self._userid = userid
+        self._password = password
+        self._is_connected = True
+        self._last_activity = time.monotonic()
+
+    def _write(self, data):
+        try:
+            self.socket.sendall(data)
+        except OSError:
+            self._close_socket()
+            raise InstCommunicationError('Sending to {} failed'.format(self._ip_address))
+
+    def _read_until(self, prompt, required=True):
+        """Read until prompt is received, or timeout"""
+        data = b''
+        deadline = time.monotonic() + self._timeout
+        while prompt not in data:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if required:
+                    raise InstCommunicationError('No {} prompt from {}'
+                                                 .format(prompt.decode(), self._ip_address))
+                break
+            ready, _, _ = select.select([self.socket], [], [], remaining)
+            if not ready:
+                continue
+            try:
+                chunk = self.socket.recv(1024)
+            except OSError:
+                chunk = b''
+            if not chunk:
+                self._close_socket()
+                raise InstCommunicationError('Connection closed by {}'.format(self._ip_address))
+            data += chunk
+        return data
+
+    def _close_socket(self):
+        self._is_connected = False
+        if self.socket is not None:
+            try:
+                self.socket.close()
+            except OSError:
+                pass
+
+    def _is_closed_by_peer(self):
+        """Check without blocking if the UGA closed the connection"""
+        try:
+            ready, _, _ = select.select([self.socket], [], [], 0)
+            if not ready:
+                return False
+            return self.socket.recv(1, socket.MSG_PEEK) == b''
+        except (OSError, ValueError):
+            return True
+
+    def _reconnect(self):
+        """Connect and login again with backoff, with the lock acquired"""
+        if not (self.auto_reconnect and self._login_args):
+            raise InstCommunicationError('Not connected to {}'.format(self._ip_address))
+        delay = 0.5
+        deadline = time.monotonic() + self.reconnect_timeout
+        while True:
+            try:
+                self._open(*self._login_args)
+                self.reconnect_count += 1
+                logger.info('Reconnected to {}'.format(self._ip_address))
+                return
+            except InstLoginFailureError:
+                raise
+            except InstCommunicationError as e:
+                if time.monotonic() + delay > deadline:
+                    raise InstCommunicationError('Reconnecting to {} failed: {}'
+                                                 .format(self._ip_address, e))
+                logger.warning('Reconnecting to {} failed: {}. Retry in {} s'
+                               .format(self._ip_address, e, delay))
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    def _ensure_connected(self):
+        """Reconnect before sending, if the session was closed"""
+        if self._is_connected and not self._is_closed_by_peer():
+            return False
+        self._close_socket()
+        self._reconnect()
+        return True
+
+    def _send(self, cmd):
+        self._sent = False
+        reconnected = self._ensure_connected()
+        try:
+            super()._send(cmd)
+        except InstCommunicationError:
+            if not (self.auto_reconnect and self._login_args):
+                raise
+            self._close_socket()
+            self._reconnect()
+            reconnected = True
+            super()._send(cmd)
+        self._sent = True
+        self._last_activity = time.monotonic()
+        if reconnected and self._reconnect_callback:
+            # Run after the lock is released by the caller
+            threading.Thread(target=self._reconnect_callback, daemon=True).start()
+
+    # TcpipInterface calls disconnect() when the connection is lost while receiving.
+    # It is turned into _drop_connection() in the receiving thread only.
+    def _recv(self):
+        self._local.receiving = True
+        try:
+            return super()._recv()
+        finally:
+            self._local.receiving = False
+
+    def _read_binary(self, length=4):
+        self._local.receiving = True
+        try:
+            return super()._read_binary(length)
+        finally:
+            self._local.receiving = False
+
+    def query_text(self, cmd):
+        try:
+            return super().query_text(cmd)
+        except InstCommunicationError:
+            if not self._sent or self._is_connected or \
+                    not (self.auto_reconnect and self._login_args):
+                raise
+            # The connection was closed before the reply. Queries are safe to repeat.
+            logger.warning("Connection lost with '{}', querying again".format(cmd))
+            return super().query_text(cmd)
+
+    def _drop_connection(self):
+        """Close the socket of a lost connection, keeping the login for reconnecting"""
+        self._close_socket()
+
+    def disconnect(self):
+        """Close the connection, and stop keep-alive and reconnecting"""
+        if getattr(self._local, 'receiving', False):
+            self._drop_connection()
+            return
+        self._login_args = None
+        self._stop_keepalive()
+        super().disconnect()
+
+    def _start_keepalive(self):
+        self._stop_keepalive()
+        if not self.keepalive_interval:
+            return
+        self._keepalive_stop.clear()
+        self._keepalive_thread = threading.Thread(target=self._keepalive, daemon=True,
+                                                  name='uga-keepalive')
+        self._keepalive_thread.start()
+
+    def _stop_keepalive(self):
+        self._keepalive_stop.set()
+        thread = self._keepalive_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._keepalive_thread = None
+
+    def _keepalive(self):
+        while not self._keepalive_stop.is_set():
+            idle = time.monotonic() - self._last_activity
+            if idle < self.keepalive_interval:
+                self._keepalive_stop.wait(self.keepalive_interval - idle)
+                continue
+            try:
+                self.query_text(self.KeepAliveCommand)
+            except InstCommunicationError as e:
+                logger.warning('Keep-alive to {} failed: {}'.format(self._ip_address, e))
+                self._last_activity = time.monotonic()
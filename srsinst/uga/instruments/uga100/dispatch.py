@@ -0,0 +1,270 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Dispatch of raw remote commands, such as ones typed in a terminal.
+
+CommandDispatcher classifies a command by looking up its prefix, 4 characters
+for UGA commands starting with 'Z', 2 characters for RGA commands, and whether
+it has '?', in a table built from the command descriptors of the components.
+
+    dispatcher = CommandDispatcher(uga)
+    dispatcher.execute('ZMOD?')          # CommandReply('ZMOD?', 'query', '1', None)
+    dispatcher.execute_batch(['ZPTB 1, 100', 'ZPTB? 1', 'ZQTA?'])  # in one write
+"""
+
+from typing import NamedTuple, Optional
+
+from srsgui import IndexCommand
+from srsgui.inst.component import Component, DirCommand
+from srsgui.inst.commands import Command
+from srsgui.inst.exceptions import InstException, InstCommunicationError
+from srsinst.rga.instruments.rga100.commands import RgaIntCommand, RgaFloatCommand, \
+                                                    RgaTotalPressureCommand
+
+
+class CommandKind:
+    Query = 'query'  # text reply
+    Set = 'set'  # no reply
+    Status = 'status'  # RGA command replying a status byte, with or without '?'
+    Binary = 'binary'  # RGA query replying a 4-byte binary integer
+    SingleMass = 'single mass'
+    AnalogScan = 'analog scan'
+    HistogramScan = 'histogram scan'
+    Invalid = 'invalid'
+
+    # Kinds sent together in a single write by execute_batch()
+    Batchable = (Query, Set)
+
+
+class CommandSpec(NamedTuple):
+    kind: str
+    attribute: Optional[str] = None  # path of the descriptor from the UGA, such as 'mode.state'
+    error: Optional[str] = None  # reason of an invalid command
+
+
+class CommandReply(NamedTuple):
+    command: str
+    kind: str
+    reply: str
+    error: Optional[str] = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def get_text(self):
+        """Reply, or the error message for the terminal"""
+        return self.reply if self.error is None else 'Error: {}'.format(self.error)
+
+
+UnknownQuery = CommandSpec(CommandKind.Query)
+UnknownSet = CommandSpec(CommandKind.Set)
+
+# RGA commands not defined with descriptors in the components
+ExtraCommands = {
+    ('IN', False): CommandSpec(CommandKind.Status),
+    ('MR', False): CommandSpec(CommandKind.SingleMass),
+    ('SC', False): CommandSpec(CommandKind.AnalogScan),
+    ('HS', False): CommandSpec(CommandKind.HistogramScan),
+}
+
+
+def get_prefix(cmd):
+    """Command prefix used as the key of the dispatch table"""
+    return cmd[:4] if cmd.startswith('Z') else cmd[:2]
+
+
+def iter_commands(component, path=''):
+    """
+    Yield (attribute path, descriptor) of all the commands of a component and its children,
+    including index commands, such as ZQAD, which are instance attributes
+    """
+    seen = set()
+    for cls in type(component).__mro__:
+        if not issubclass(cls, Component) or cls is Component:
+            break
+        for name, descriptor in vars(cls).items():
+            if name in seen or not isinstance(descriptor, Command) or \
+                    isinstance(descriptor, DirCommand):
+                continue
+            seen.add(name)
+            yield path + name, descriptor
+    for name, child in vars(component).items():
+        if isinstance(child, IndexCommand) and name not in seen:
+            seen.add(name)
+            yield path + name, child
+    for name, child in vars(component).items():
+        if name != '_parent' and isinstance(child, Component):
+            yield from iter_commands(child, '{}{}.'.format(path, name))
+
+
+def has_base_class(descriptor, suffix):
+    """
+    Check if a class of the descriptor has a name ending with suffix.
+    Query only and set only descriptors, such as IntGetCommand and DictGetCommand,
+    do not share a base class other than by name.
+    """
+    return any(cls.__name__.endswith(suffix) for cls in type(descriptor).__mro__)
+
+
+def get_kinds(descriptor):
+    """{is_query: CommandKind} allowed by a descriptor"""
+    if isinstance(descriptor, RgaTotalPressureCommand):
+        return {True: CommandKind.Binary}
+    if isinstance(descriptor, (RgaIntCommand, RgaFloatCommand)):
+        return {True: CommandKind.Query, False: CommandKind.Status}
+    if has_base_class(descriptor, 'GetCommand'):
+        return {True: CommandKind.Query}
+    if has_base_class(descriptor, 'SetCommand'):
+        return {False: CommandKind.Set}
+    return {True: CommandKind.Query, False: CommandKind.Set}
+
+
+def build_dispatch_table(uga):
+    """
+    Build {(prefix, is_query): CommandSpec} from the command descriptors
+    of the components of uga
+    """
+    table = dict(ExtraCommands)
+    prefixes = set()
+    for path, descriptor in iter_commands(uga):
+        prefix = descriptor.remote_command.upper()
+        prefixes.add(prefix)
+        for is_query, kind in get_kinds(descriptor).items():
+            table.setdefault((prefix, is_query), CommandSpec(kind, path))
+
+    # Forms not allowed by any descriptor of a prefix
+    for prefix in prefixes:
+        for is_query, form in ((True, 'set only'), (False, 'query only')):
+            table.setdefault((prefix, is_query), CommandSpec(
+                CommandKind.Invalid, error="'{}' is {}".format(prefix, form)))
+    return table
+
+
+class CommandDispatcher:
+    """
+    Execute raw remote commands to a UGA and its RGA with replies as CommandReply.
+
+    Errors are returned in CommandReply.error instead of raised,
+    and a command not allowed by its descriptor is not sent.
+    Commands with a prefix not in the table are queried if they have '?',
+    and sent otherwise.
+    """
+
+    def __init__(self, uga):
+        self.uga = uga
+        self.table = build_dispatch_table(uga)
+
+    def classify(self, cmd) -> CommandSpec:
+        """Return the CommandSpec of a command in upper case"""
+        is_query = '?' in cmd
+        spec = self.table.get((get_prefix(cmd), is_query))
+        if spec is None:
+            return UnknownQuery if is_query else UnknownSet
+        return spec
+
+    def execute(self, cmd_string) -> CommandReply:
+        cmd = cmd_string.strip().upper()
+        spec = self.classify(cmd)
+        if spec.kind == CommandKind.Invalid:
+            return CommandReply(cmd, spec.kind, '', spec.error)
+        try:
+            return CommandReply(cmd, spec.kind, self._execute(cmd, spec))
+        except (InstException, ValueError) as e:
+            return CommandReply(cmd, spec.kind, '', '{}: {}'.format(type(e).__name__, e))
+
+    def _execute(self, cmd, spec):
+        comm = self.uga.comm
+        rga = self.uga.rga
+        if spec.kind == CommandKind.Query:
+            return comm.query_text(cmd).strip()
+        if spec.kind == CommandKind.Set:
+            comm.send(cmd)
+            return ''
+        if spec.kind == CommandKind.Status:
+            return comm.query_text_with_long_timeout(cmd).strip()
+        if spec.kind == CommandKind.Binary:
+            with comm.get_lock():
+                comm._send(cmd)
+                return str(rga.scan.read_long())
+        if spec.kind == CommandKind.SingleMass:
+            try:
+                mass = int(cmd[2:].strip())
+            except ValueError:
+                raise ValueError("Invalid mass in '{}'".format(cmd))
+            return str(rga.scan.get_single_mass_scan(mass))
+        if spec.kind == CommandKind.AnalogScan:
+            rga.scan.get_analog_scan()
+            return 'Scan Completed'
+        if spec.kind == CommandKind.HistogramScan:
+            rga.scan.get_histogram_scan()
+            return 'Scan Completed'
+        raise ValueError("Unknown command kind '{}'".format(spec.kind))
+
+    def execute_batch(self, cmd_strings):
+        """
+        Execute commands in order, returning a list of CommandReply.
+
+        Consecutive queries and set commands are sent in a single write,
+        and their replies read together. Other commands are executed one by one.
+        """
+        replies = []
+        pending = []  # (cmd, spec) to send together
+        for cmd_string in cmd_strings:
+            cmd = cmd_string.strip().upper()
+            if not cmd:
+                continue
+            spec = self.classify(cmd)
+            if spec.kind in CommandKind.Batchable:
+                pending.append((cmd, spec))
+                continue
+            replies.extend(self._execute_pending(pending))
+            pending = []
+            replies.append(self.execute(cmd))
+        replies.extend(self._execute_pending(pending))
+        return replies
+
+    def _execute_pending(self, pending):
+        if not pending:
+            return []
+        if len(pending) == 1:
+            return [self.execute(pending[0][0])]
+
+        comm = self.uga.comm
+        term_char = comm.get_term_char()
+        query_count = sum(1 for _, spec in pending if spec.kind == CommandKind.Query)
+        message = ''.join(cmd + term_char.decode() for cmd, _ in pending)
+        received = b''
+        sent = False
+        error = None
+        try:
+            with comm.get_lock():
+                comm._send(message)
+                sent = True
+                while received.count(term_char) < query_count:
+                    data = comm._recv()
+                    if not data:
+                        raise InstCommunicationError('Timeout with batch')
+                    received += data
+        except InstException as e:
+            error = '{}: {}'.format(type(e).__name__, e)
+        texts = [r.decode(encoding='utf-8', errors='replace').strip()
+                 for r in received.split(term_char)][:received.count(term_char)]
+        if comm._query_callback:
+            comm._query_callback('Sent Batch: {} Reply: {}'
+                                 .format([cmd for cmd, _ in pending], texts))
+
+        replies = []
+        for cmd, spec in pending:
+            if not sent:
+                replies.append(CommandReply(cmd, spec.kind, '', error))
+            elif spec.kind != CommandKind.Query:
+                replies.append(CommandReply(cmd, spec.kind, ''))
+            elif texts:
+                replies.append(CommandReply(cmd, spec.kind, texts.pop(0)))
+            else:
+                replies.append(CommandReply(cmd, spec.kind, '', error or 'No reply'))
+        return replies
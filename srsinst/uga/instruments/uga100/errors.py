@@ -0,0 +1,61 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import threading
+from collections import deque
+
+from .records import ErrorRecord
+
+
+class ErrorHistory:
+    """
+    Ring of the latest ErrorRecords read from a UGA, safe to use from multiple threads
+
+        uga.status.drain_errors()
+        for record in uga.status.error_history.get_records(since=start_time):
+            print(record.timestamp, record.code, record.message)
+    """
+
+    def __init__(self, capacity=1000):
+        self._records = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.total_count = 0  # number of errors appended since creation or clear()
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def capacity(self):
+        return self._records.maxlen
+
+    def append(self, record: ErrorRecord):
+        with self._lock:
+            self._records.append(record)
+            self.total_count += 1
+
+    def extend(self, records):
+        with self._lock:
+            self._records.extend(records)
+            self.total_count += len(records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self.total_count = 0
+
+    def get_records(self, since=None, n=None):
+        """List of records with timestamps after since, the latest n of them if n is given"""
+        with self._lock:
+            records = list(self._records)
+        if since is not None:
+            records = [r for r in records if r.timestamp > since]
+        if n is not None:
+            records = records[-n:] if n > 0 else []
+        return records
+
+    def get_latest(self):
+        """The latest ErrorRecord, or None"""
+        with self._lock:
+            return self._records[-1] if self._records else None
@@ -0,0 +1,109 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+from srsgui.inst.communications.interface import Interface
+
+
+class InterfaceProxy(Interface):
+    """
+    Interface that forwards everything to another interface.
+
+    Components use their comm attribute for every remote command, so a subclass
+    installed as UGA100.comm can intercept commands of all components,
+    while passing the isinstance(comm, Interface) checks done by srsgui.
+    Attributes not defined here are looked up in the wrapped interface.
+    """
+
+    def __init__(self, interface: Interface):
+        # Interface.__init__() is not called, the wrapped interface holds the state.
+        self.interface = interface
+
+    def __getattr__(self, name):
+        # Called only for attributes not found in the proxy
+        if name == 'interface':
+            raise AttributeError(name)
+        return getattr(self.interface, name)
+
+    @property
+    def NAME(self):
+        return self.interface.NAME
+
+    @property
+    def _cmd_in_waiting(self):
+        return self.interface._cmd_in_waiting
+
+    @_cmd_in_waiting.setter
+    def _cmd_in_waiting(self, cmd):
+        self.interface._cmd_in_waiting = cmd
+
+    def get_innermost(self):
+        """Return the actual communication interface under all the proxies"""
+        interface = self.interface
+        while isinstance(interface, InterfaceProxy):
+            interface = interface.interface
+        return interface
+
+    def set_callbacks(self, *args, **kwargs):
+        self.interface.set_callbacks(*args, **kwargs)
+
+    def get_lock(self):
+        return self.interface.get_lock()
+
+    def connect(self, *args, **kwargs):
+        self.interface.connect(*args, **kwargs)
+
+    def disconnect(self):
+        self.interface.disconnect()
+
+    def is_connected(self):
+        return self.interface.is_connected()
+
+    def set_term_char(self, ch):
+        self.interface.set_term_char(ch)
+
+    def get_term_char(self):
+        return self.interface.get_term_char()
+
+    def _send(self, cmd):
+        self.interface._send(cmd)
+
+    def _write_binary(self, binary_array):
+        self.interface._write_binary(binary_array)
+
+    def _recv(self):
+        return self.interface._recv()
+
+    def _read_binary(self, length=4):
+        return self.interface._read_binary(length)
+
+    def _read_long(self):
+        return self.interface._read_long()
+
+    def send(self, cmd):
+        self.interface.send(cmd)
+
+    def recv(self):
+        return self.interface.recv()
+
+    def query_text(self, cmd):
+        return self.interface.query_text(cmd)
+
+    def query_int(self, cmd):
+        return int(self.query_text(cmd))
+
+    def query_float(self, cmd):
+        return float(self.query_text(cmd))
+
+    def set_timeout(self, seconds):
+        self.interface.set_timeout(seconds)
+
+    def get_timeout(self):
+        return self.interface.get_timeout()
+
+    def query_text_with_long_timeout(self, cmd, timeout=30.0):
+        return self.interface.query_text_with_long_timeout(cmd, timeout)
+
+    def get_info(self):
+        return self.interface.get_info()
@@ -0,0 +1,60 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Immutable records returned by batched queries to a UGA.
+
+They are plain named tuples, so they can be passed between threads,
+pickled and used without importing the instrument driver.
+"""
+
+from typing import NamedTuple, Optional
+
+
+class Snapshot(NamedTuple):
+    """
+    Pressure and temperature readings of a UGA taken in a single exchange.
+
+    Pressures are in Torr, regardless of the front panel display unit.
+    Temperatures are in °C, and 255 means the sensor is not working properly.
+    """
+    timestamp: float
+    ig_pressure: float
+    pirani_pressure: float
+    cm_pressure: float
+    turbo_pump: int
+    elbow: int
+    chamber: int
+    sample_inlet: int
+    capillary: int
+    states: int  # ZBST bitfield, decoded with Status.StateBitDict
+
+
+class ScanParameters(NamedTuple):
+    """RGA scan parameters, in the order of Scans.set_parameters() arguments"""
+    initial_mass: int
+    final_mass: int
+    scan_speed: int
+    steps_per_amu: int
+
+
+class IdentityProfile(NamedTuple):
+    """
+    Identity of a UGA and its RGA, from UGA100.check_id().
+
+    rga_id_string is the reply of 'ID?' from the RGA, or None if the RGA was off.
+    """
+    id_string: str
+    model_name: str
+    serial_number: str
+    firmware_version: str
+    rga_id_string: Optional[str]
+
+
+class ErrorRecord(NamedTuple):
+    """An error read from the error queue of a UGA with ZERR?"""
+    timestamp: float
+    code: int
+    message: str
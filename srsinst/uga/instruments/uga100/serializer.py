@@ -0,0 +1,222 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Serialized access to a UGA shared by multiple threads.
+
+All the components of a UGA share one communication interface. SerializingInterface
+queues every access to it in a CommandQueue, which grants the link in the order of
+priority, then arrival:
+
+    * Queries, such as status and gauge readings, have High priority.
+    * Batches and scans taken with comm.get_lock() have Normal priority.
+    * Work done inside 'with uga.command_queue.priority(Priority.Low)' has Low priority.
+
+A running exchange is never interrupted, but a status query waiting for the link
+goes ahead of a scan waiting for it. An identical query already waiting in the queue,
+such as two threads reading 'ZQAD? 2', is sent once and both get the reply.
+Queries that clear what they read, in NonCoalescableCommands, are always sent.
+"""
+
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+
+from .proxy import InterfaceProxy
+from .cache import get_command_name
+
+# Queries that remove what they read from the UGA, so every caller needs its own reply:
+# ZERR? pops an error from the error queue, and ZBCT? clears the changed bits.
+NonCoalescableCommands = frozenset(('ZERR', 'ZBCT'))
+
+
+class Priority:
+    High = 0
+    Normal = 1
+    Low = 2
+
+
+class _Request:
+    """Query waiting in the queue, shared by the callers coalesced into it"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.reply = None
+        self.error = None
+
+
+class CommandQueue:
+    """
+    Priority queue of threads waiting to use a communication link,
+    with the queries waiting in it.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._owner = None  # thread id using the link
+        self._waiting = []  # heap of (priority, arrival, thread id)
+        self._arrival = itertools.count()
+        self._pending = {}  # {query key: _Request} waiting for the link
+        self._pending_lock = threading.Lock()
+        self._local = threading.local()
+
+        self.query_count = 0  # queries requested
+        self.coalesced_count = 0  # queries answered with the reply of another caller
+
+    @contextmanager
+    def priority(self, level):
+        """Use level as the priority of all the commands of the current thread in the block"""
+        previous = getattr(self._local, 'priority', None)
+        self._local.priority = level
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def get_priority(self, default):
+        level = getattr(self._local, 'priority', None)
+        return default if level is None else level
+
+    def acquire(self, priority):
+        """Wait until the link is free and no thread with higher priority is waiting"""
+        ident = threading.get_ident()
+        with self._condition:
+            if self._owner is None and not self._waiting:
+                self._owner = ident
+                return
+            entry = (priority, next(self._arrival), ident)
+            heapq.heappush(self._waiting, entry)
+            while self._owner is not None or self._waiting[0] is not entry:
+                self._condition.wait()
+            heapq.heappop(self._waiting)
+            self._owner = ident
+
+    def release(self):
+        with self._condition:
+            self._owner = None
+            self._condition.notify_all()
+
+    def get_waiting_count(self):
+        with self._condition:
+            return len(self._waiting)
+
+    def join_or_add(self, key):
+        """
+        Return (request, True) for a new query to send, or
+        (request, False) for one waiting in the queue to share the reply with.
+        """
+        with self._pending_lock:
+            self.query_count += 1
+            request = self._pending.get(key)
+            if request is not None:
+                self.coalesced_count += 1
+                return request, False
+            request = _Request()
+            self._pending[key] = request
+            return request, True
+
+    def remove(self, key, request):
+        """Stop coalescing into request, when it is about to be sent"""
+        with self._pending_lock:
+            if self._pending.get(key) is request:
+                del self._pending[key]
+
+
+class _QueueLock:
+    """Lock returned by SerializingInterface.get_lock(), taking the queue, then the interface lock"""
+
+    def __init__(self, queue: CommandQueue, lock, priority):
+        self.queue = queue
+        self.lock = lock
+        self.priority = priority
+
+    def acquire(self, blocking=True, timeout=-1):
+        self.queue.acquire(self.priority)
+        self.lock.acquire()
+        return True
+
+    def release(self):
+        self.lock.release()
+        self.queue.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class SerializingInterface(InterfaceProxy):
+    """
+    Interface proxy passing every access to the link through a CommandQueue
+
+    Threads that use the wrapped interface directly, such as the keep-alive
+    thread of ManagedTcpipInterface, take only the interface lock, which is
+    always taken after the queue, so they stay serialized with the others.
+    """
+
+    def __init__(self, interface, queue: CommandQueue):
+        super().__init__(interface)
+        self.queue = queue
+        self.non_coalescable = set(NonCoalescableCommands)
+
+    def is_coalescable(self, cmd):
+        return '?' in cmd and get_command_name(cmd) not in self.non_coalescable
+
+    @staticmethod
+    def _get_key(cmd):
+        return ' '.join(cmd.upper().split())
+
+    def get_lock(self):
+        return _QueueLock(self.queue, self.interface.get_lock(),
+                          self.queue.get_priority(Priority.Normal))
+
+    @contextmanager
+    def _use_link(self, priority):
+        self.queue.acquire(self.queue.get_priority(priority))
+        try:
+            yield
+        finally:
+            self.queue.release()
+
+    def query_text(self, cmd):
+        if not self.is_coalescable(cmd):
+            # A command with a status reply or a destructive read, not safe to share
+            with self._use_link(Priority.High):
+                return self.interface.query_text(cmd)
+
+        key = self._get_key(cmd)
+        request, is_new = self.queue.join_or_add(key)
+        if not is_new:
+            request.event.wait()
+            if request.error is not None:
+                raise request.error
+            return request.reply
+        try:
+            with self._use_link(Priority.High):
+                # Callers arriving from now on get a newer reply
+                self.queue.remove(key, request)
+                request.reply = self.interface.query_text(cmd)
+            return request.reply
+        except Exception as e:
+            request.error = e
+            raise
+        finally:
+            self.queue.remove(key, request)
+            request.event.set()
+
+    def query_text_with_long_timeout(self, cmd, timeout=30.0):
+        with self._use_link(Priority.Normal):
+            return self.interface.query_text_with_long_timeout(cmd, timeout)
+
+    def send(self, cmd):
+        with self._use_link(Priority.High):
+            self.interface.send(cmd)
+
+    def recv(self):
+        with self._use_link(Priority.High):
+            return self.interface.recv()
@@ -0,0 +1,746 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Simulated UGA for testing and benchmarking without hardware.
+
+SimulatedUGA models the Z-command set of a UGA: identification, mode control with
+pump-down state transitions, component states, gauge readings, temperatures,
+state bitfields and the error queue. It can be reached in two ways:
+
+    * LoopbackInterface, an in-process interface used like a serial port
+
+        >>> from srsinst.uga.instruments.uga100.simulator import create_simulated_uga
+        >>> uga = create_simulated_uga()
+        >>> uga.check_id()
+        ('SRS_UGA', '94224', '1.018')
+
+    * SimulatedUGAServer, a TCP server with the same login sequence as a UGA
+
+        >>> server = SimulatedUGAServer(SimulatedUGA(), port=8818).start()
+        >>> uga = UGA100('tcpip', '127.0.0.1', 'srsuga', 'srsuga', 8818)
+
+Latency is configurable with link_latency, paid once per write to the link,
+and command_latency, paid for every command processed.
+RGA head commands are not modelled except for 'ID?', status bytes of RGA
+set commands, scan parameters and binary readings. Single mass readings with 'MR',
+and every point of analog ('SC') and histogram ('HS') scans, return
+rga_signal(mass, time) as 4-byte binary data.
+"""
+
+import time
+import random
+import socket
+import threading
+import socketserver
+from collections import deque
+
+from srsgui.inst.communications.interface import Interface
+from srsgui.inst.exceptions import InstCommunicationError
+
+from .keys import Keys
+from .components import Mode
+from .uga import UGA100
+
+TERM_CHAR = b'\r'
+
+# Component state commands and the state bits they drive in ZBST, ZBCT and ZBTT
+# Pumps have the idle bit next to the on bit.
+ComponentBits = {
+    'ZCBP': 0,
+    'ZCRP': 1,
+    'ZCTP': 3,
+    'ZCBV': 5,
+    'ZCSV': 6,
+    'ZCRG': 7,
+    'ZCIG': 8,
+    'ZCVV': 9,
+    'ZCHT': 10,
+}
+IdlePumps = ('ZCRP', 'ZCTP')
+
+ErrorBit = 15
+PowerBit = 14
+AutoModeBit = 13
+BakeModeBit = 11
+
+InvalidCommand = 9
+NotAQuery = 12
+MissingParameter = 13
+OutOfRange = 15
+TurboNotReady = 42
+TooManyErrors = 126
+
+# Parameters stored as they are set, with their power-on values
+DefaultParameters = {
+    'ZPBO': '100', 'ZPRO': '100', 'ZPRI': '50',
+    'ZPAS': '1', 'ZPAV': '1', 'ZPFL': '0',
+    'ZPBT': '8', 'ZPPU': '0', 'ZPLM': '4',
+    'ZCMI': '1', 'ZCPC': '1', 'ZCVL': '5',
+    'ZPBA': '28800',
+    'ZPIP': '192.168.1.10', 'ZPGW': '192.168.1.1', 'ZPSM': '255.255.255.0',
+    'ZPNM': 'srsuga', 'ZPPW': 'srsuga',
+    'ZPDU': '1', 'ZPSP': '100', 'ZPTO': '60',
+}
+
+IndexParameters = {
+    'ZPTB': ['120', '120'],
+    'ZPTH': ['80', '80', '80', '80'],
+}
+
+RgaIdString = 'SRSRGA200VER0.24SN12226'
+
+# RGA set commands replying a status byte
+RgaStatusCommands = ('EE', 'IE', 'VF', 'FL', 'HV', 'IN')
+
+# RGA scan parameters stored as they are set, with their power-on values
+RgaScanParameters = {'MI': 1, 'MF': 65, 'NF': 4, 'SA': 10}
+
+Off = Mode.StateDict[Keys.Off]
+On = Mode.StateDict[Keys.On]
+Idle = Mode.StateDict[Keys.Idle]
+
+
+class SimulatedUGA:
+    """
+    Protocol-level model of a UGA
+
+    Parameters
+    -----------
+        model_name: str
+            'SRS_UGA', 'SRS_UGA_LT', 'SRS_UGA_HT' or 'SRS_UGA_PM'
+        link_latency: float
+            seconds of delay for every write to the link
+        command_latency: float or dict
+            seconds of delay for every command processed. A dict maps
+            a command name, such as 'ZQAD', to its delay, with the key None as the default.
+        transition_time: float
+            seconds between sub-states during mode changes
+        seed: int
+            seed for the noise added to gauge readings
+        rga_signal: callable, optional
+            rga_signal(mass, time.monotonic()) returns the ion current in 0.1 fA
+            for a single mass reading. A constant background with noise by default.
+    """
+    def __init__(self, model_name='SRS_UGA', serial_number='94224', firmware_version='1.018',
+                 link_latency=0.0, command_latency=0.0, transition_time=0.5, seed=0,
+                 rga_signal=None):
+        self.model_name = model_name
+        self.serial_number = serial_number
+        self.firmware_version = firmware_version
+        self.link_latency = link_latency
+        self.command_latency = command_latency
+        self.transition_time = transition_time
+        self.rga_signal = rga_signal
+
+        self.command_count = 0
+        self.write_count = 0
+
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Return to the power-on state"""
+        with self._lock:
+            self.mode = Mode.ModeDict[Keys.Off]
+            self.states = {cmd: Off for cmd in ComponentBits}
+            self.parameters = dict(DefaultParameters)
+            self.index_parameters = {k: list(v) for k, v in IndexParameters.items()}
+            self.rga_parameters = dict(RgaScanParameters)
+            self.errors = deque()
+            self._transitions = []
+            self._changed = 0
+            self._last_bits = self._get_state_bits()
+
+    # Link side
+    def get_latency(self, command_name):
+        if isinstance(self.command_latency, dict):
+            return self.command_latency.get(command_name, self.command_latency.get(None, 0.0))
+        return self.command_latency
+
+    def handle_write(self, data: bytes) -> bytes:
+        """
+        Process all the commands in data written to the link at once,
+        and return the replies to be read back.
+        """
+        self.write_count += 1
+        if self.link_latency:
+            time.sleep(self.link_latency)
+        replies = b''
+        for line in data.split(TERM_CHAR):
+            line = line.decode('utf-8', errors='replace').strip()
+            if not line:
+                continue
+            reply = self.process(line)
+            if isinstance(reply, bytes):
+                replies += reply  # binary RGA data without a terminator
+            elif reply is not None:
+                replies += reply.encode('utf-8') + TERM_CHAR
+        return replies
+
+    def process(self, line: str):
+        """
+        Process a single command line.
+
+        Returns the reply string for a query, or None for a set command.
+        """
+        with self._lock:
+            self.command_count += 1
+            self._update()
+
+            is_query = '?' in line
+            text = line.replace('?', ' ')
+            name = text.split()[0].upper() if text.split() else ''
+            args = [a.strip() for a in text[len(name):].split(',') if a.strip()] \
+                if name else []
+
+            latency = self.get_latency(name)
+            if latency:
+                time.sleep(latency)
+
+            if not name.startswith('Z'):
+                return self._process_rga(line, is_query)
+            handler = getattr(self, '_{}'.format(name.lower()), None)
+            if handler is not None:
+                return handler(is_query, args)
+            if name in self.parameters:
+                return self._parameter(name, is_query, args)
+            if name in self.index_parameters:
+                return self._index_parameter(name, is_query, args)
+            if name in self.states:
+                return self._component(name, is_query, args)
+            self._push_error(InvalidCommand)
+            return '' if is_query else None
+
+    # State model
+    def _update(self):
+        now = time.monotonic()
+        while self._transitions and self._transitions[0][0] <= now:
+            _, changes, mode = self._transitions.pop(0)
+            self.states.update(changes)
+            if mode is not None:
+                self.mode = mode
+        bits = self._get_state_bits()
+        self._changed |= bits ^ self._last_bits
+        self._last_bits = bits
+
+    def _schedule(self, steps):
+        """
+        Replace pending transitions with steps, a list of (state changes, mode)
+        applied at every transition_time
+        """
+        now = time.monotonic()
+        self._transitions = []
+        for i, (changes, mode) in enumerate(steps):
+            self._transitions.append((now + i * self.transition_time, changes, mode))
+        self._update()
+
+    def _get_state_bits(self):
+        bits = 1 << PowerBit
+        for cmd, bit in ComponentBits.items():
+            state = self.states[cmd]
+            if state == On:
+                bits |= 1 << bit
+            elif state == Idle and cmd in IdlePumps:
+                bits |= 1 << (bit + 1)
+        if self.mode not in (Mode.ModeDict[Keys.Off], Mode.ModeDict[Keys.Manual]):
+            bits |= 1 << AutoModeBit
+        if self.mode == Mode.ModeDict[Keys.SystemBake]:
+            bits |= 1 << BakeModeBit
+        if self.errors:
+            bits |= 1 << ErrorBit
+        return bits
+
+    def _get_changing_bits(self):
+        bits = 0
+        for cmd, bit in ComponentBits.items():
+            state = self.states[cmd]
+            if Mode.StateDict[Keys.TurningOn3] <= state <= Mode.StateDict[Keys.TurningIdle11]:
+                if cmd in IdlePumps and state >= Mode.StateDict[Keys.TurningIdle8]:
+                    bits |= 1 << (bit + 1)
+                else:
+                    bits |= 1 << bit
+        return bits
+
+    def _push_error(self, code):
+        if len(self.errors) >= TooManyErrors - 1:
+            self.errors[-1] = TooManyErrors
+        else:
+            self.errors.append(code)
+
+    def _noise(self, value):
+        return int(value * (1.0 + self._random.uniform(-0.01, 0.01)))
+
+    # Generic commands
+    def _parameter(self, name, is_query, args):
+        if is_query:
+            return self.parameters[name]
+        if not args:
+            self._push_error(MissingParameter)
+            return None
+        self.parameters[name] = args[0]
+        return None
+
+    def _index_parameter(self, name, is_query, args):
+        values = self.index_parameters[name]
+        try:
+            index = int(args[0])
+            if not 0 <= index < len(values):
+                raise IndexError
+        except (IndexError, ValueError):
+            self._push_error(OutOfRange if args else MissingParameter)
+            return '' if is_query else None
+        if is_query:
+            return values[index]
+        if len(args) < 2:
+            self._push_error(MissingParameter)
+            return None
+        values[index] = args[1]
+        return None
+
+    def _component(self, name, is_query, args):
+        if is_query:
+            return str(self.states[name])
+        try:
+            target = int(args[0])
+        except (IndexError, ValueError):
+            self._push_error(MissingParameter)
+            return None
+        if name in ('ZCRP', 'ZCTP', 'ZCBP') and target != self.states[name]:
+            transitional = Mode.StateDict[Keys.TurningOn3] if target == On else \
+                           Mode.StateDict[Keys.TurningIdle8] if target == Idle else \
+                           Mode.StateDict[Keys.TurningOff6]
+            self.states[name] = transitional
+            self._transitions.append((time.monotonic() + self.transition_time,
+                                      {name: target}, None))
+            self._transitions.sort(key=lambda t: t[0])
+        else:
+            self.states[name] = target
+        return None
+
+    def _process_rga(self, line, is_query):
+        command = line.strip().upper()
+        if command == 'ID?':
+            return RgaIdString
+        if command.startswith('MR') and command[2:].isdigit():
+            return self._get_rga_readings([int(command[2:])])
+        if command == 'TP?':
+            return (0).to_bytes(4, 'little', signed=True)
+
+        name, arg = command[:2], command[2:].strip('? ')
+        parameters = self.rga_parameters
+        if name in parameters:
+            if is_query:
+                return str(parameters[name])
+            parameters[name] = int(arg) if arg.isdigit() else RgaScanParameters[name]
+            return None
+        initial_mass, final_mass, steps = parameters['MI'], parameters['MF'], parameters['SA']
+        if command == 'AP?':
+            return str((final_mass - initial_mass) * steps + 1)
+        if command == 'HP?':
+            return str(final_mass - initial_mass + 1)
+        if command == 'SC1':
+            masses = [initial_mass + i / steps
+                      for i in range((final_mass - initial_mass) * steps + 1)]
+            return self._get_rga_readings(masses, True)
+        if command == 'HS1':
+            return self._get_rga_readings(range(initial_mass, final_mass + 1), True)
+        if is_query or name in RgaStatusCommands:
+            return '0'
+        return None
+
+    def _get_rga_readings(self, masses, with_total=False):
+        """Binary readings of masses, followed by the total current for a scan"""
+        readings = []
+        for mass in masses:
+            if self.rga_signal is not None:
+                readings.append(int(self.rga_signal(mass, time.monotonic())))
+            else:
+                readings.append(self._noise(1000))
+        if with_total:
+            total = sum(readings)
+            # The total is read as a line after an analog scan
+            while TERM_CHAR in total.to_bytes(4, 'little', signed=True):
+                total += 1
+            readings.append(total)
+        return b''.join(r.to_bytes(4, 'little', signed=True) for r in readings)
+
+    # Identification
+    def _zqid(self, is_query, args):
+        return '{},S/N {},V {}'.format(self.model_name, self.serial_number, self.firmware_version)
+
+    def _zqsn(self, is_query, args):
+        return self.serial_number
+
+    def _zqfv(self, is_query, args):
+        return self.firmware_version
+
+    def _zqmc(self, is_query, args):
+        return '00:19:B3:0A:00:01'
+
+    # Mode control
+    def _zmod(self, is_query, args):
+        if not is_query:
+            self._push_error(InvalidCommand)
+            return None
+        return str(self.mode)
+
+    def _zmst(self, is_query, args):
+        start = Mode.ModeDict[Keys.Start]
+        turning_on4 = Mode.StateDict[Keys.TurningOn4]
+        turning_on5 = Mode.StateDict[Keys.TurningOn5]
+        turning_on3 = Mode.StateDict[Keys.TurningOn3]
+        self._schedule([
+            ({'ZCRP': turning_on3, 'ZCBP': turning_on3}, start),
+            ({'ZCRP': On, 'ZCBP': On, 'ZCBV': On}, None),
+            ({'ZCTP': turning_on3}, None),
+            ({'ZCTP': turning_on4}, None),
+            ({'ZCTP': turning_on5}, None),
+            ({'ZCTP': On, 'ZCSV': On}, Mode.ModeDict[Keys.Ready]),
+        ])
+
+    def _zmsp(self, is_query, args):
+        self._schedule([
+            ({'ZCSV': Off, 'ZCBV': Off, 'ZCIG': Off, 'ZCRG': Off, 'ZCHT': Off,
+              'ZCTP': Mode.StateDict[Keys.TurningOff6]}, Mode.ModeDict[Keys.Stop]),
+            ({'ZCTP': Mode.StateDict[Keys.TurningOff7]}, None),
+            ({'ZCTP': Off, 'ZCRP': Mode.StateDict[Keys.TurningOff6]}, None),
+            ({'ZCRP': Off, 'ZCBP': Off}, Mode.ModeDict[Keys.Off]),
+        ])
+
+    def _zmsl(self, is_query, args):
+        self._schedule([
+            ({'ZCSV': Off, 'ZCIG': Off, 'ZCRG': Off,
+              'ZCTP': Mode.StateDict[Keys.TurningIdle8]}, Mode.ModeDict[Keys.Sleep]),
+            ({'ZCTP': Mode.StateDict[Keys.TurningIdle9]}, None),
+            ({'ZCTP': Mode.StateDict[Keys.TurningIdle10]}, None),
+            ({'ZCTP': Mode.StateDict[Keys.TurningIdle11]}, None),
+            ({'ZCTP': Idle, 'ZCRP': Idle}, Mode.ModeDict[Keys.Idle]),
+        ])
+
+    def _zmlt(self, is_query, args):
+        leak_test = Mode.ModeDict[Keys.LeakTest]
+        if is_query:
+            return '1' if self.mode == leak_test else '0'
+        if args and args[0] != '0':
+            if self.mode != Mode.ModeDict[Keys.Ready]:
+                self._push_error(TurboNotReady)
+                return None
+            self.mode = leak_test
+        elif self.mode == leak_test:
+            self.mode = Mode.ModeDict[Keys.Ready]
+        return None
+
+    def _zmbk(self, is_query, args):
+        bake = Mode.ModeDict[Keys.SystemBake]
+        if is_query:
+            return '1' if self.mode == bake else '0'
+        if args and args[0] != '0':
+            self.mode = bake
+            self.states['ZCHT'] = On
+        elif self.mode == bake:
+            self.states['ZCHT'] = Off
+            self._zmst(False, [])
+        return None
+
+    def _zrst(self, is_query, args):
+        self.reset()
+
+    # Measurements
+    def _zqad(self, is_query, args):
+        try:
+            gauge = int(args[0])
+        except (IndexError, ValueError):
+            self._push_error(MissingParameter)
+            return ''
+        tp_on = self.states['ZCTP'] == On
+        rp_on = self.states['ZCRP'] in (On, Idle)
+        if gauge in (0, 1):  # Pirani on the roughing line in uTorr
+            return str(self._noise(5e3 if rp_on else 760e6))
+        if gauge == 2:  # CM on the bypass line in uTorr
+            return str(self._noise(1e6 if self.states['ZCBP'] == On else 760e6))
+        if gauge == 3:  # IG in the chamber in pTorr
+            return str(self._noise(2e4) if tp_on and self.states['ZCIG'] == On else 0)
+        self._push_error(OutOfRange)
+        return ''
+
+    def _get_temperature(self, heater_index):
+        if self.states['ZCHT'] == On:
+            return int(self.index_parameters['ZPTB'][min(heater_index, 1)])
+        return 25
+
+    def _zqtt(self, is_query, args):
+        return str(35 if self.states['ZCTP'] == On else 25)
+
+    def _zqta(self, is_query, args):
+        return str(self._get_temperature(0))
+
+    def _zqtb(self, is_query, args):
+        return str(self._get_temperature(1))
+
+    def _zqtc(self, is_query, args):
+        return str(int(self.index_parameters['ZPTH'][2]) if self.states['ZCSV'] == On else 25)
+
+    def _zqtd(self, is_query, args):
+        return str(int(self.index_parameters['ZPTH'][3]) if self.states['ZCSV'] == On else 25)
+
+    def _zqhz(self, is_query, args):
+        state = self.states['ZCTP']
+        if state == On:
+            return '1500'
+        if state == Idle:
+            return '1000'
+        if state in (Mode.StateDict[Keys.TurningOn4], Mode.StateDict[Keys.TurningOn5]):
+            return '750'
+        return '0'
+
+    def _zqcu(self, is_query, args):
+        return '{:.1f}'.format(self._noise(250) if self.states['ZCTP'] == On else 0.0)
+
+    def _zqbr(self, is_query, args):
+        if self.mode == Mode.ModeDict[Keys.SystemBake]:
+            return str(int(self.parameters['ZPBT']) * 60)
+        return '0'
+
+    # Status
+    def _zbst(self, is_query, args):
+        return str(self._get_state_bits())
+
+    def _zbct(self, is_query, args):
+        changed, self._changed = self._changed, 0
+        return str(changed)
+
+    def _zbtt(self, is_query, args):
+        return str(self._get_changing_bits())
+
+    def _zerr(self, is_query, args):
+        if not is_query:
+            self._push_error(NotAQuery)
+            return None
+        return str(self.errors.popleft()) if self.errors else '0'
+
+    def _zeds(self, is_query, args):
+        try:
+            code = int(args[0])
+        except (IndexError, ValueError):
+            self._push_error(MissingParameter)
+            return ''
+        for message, number in Keys.ErrorMessageDict.items():
+            if number == code:
+                return message
+        return 'Unknown error ({})'.format(code)
+
+
+class LoopbackInterface(Interface):
+    """
+    In-process interface to a SimulatedUGA, behaving like a serial port
+    """
+
+    NAME = 'loopback'
+
+    def __init__(self):
+        super().__init__()
+        self.type = LoopbackInterface.NAME
+        self.simulator = None
+        self._buffer = b''
+        self._timeout = 3.0
+
+    def connect(self, simulator=None):
+        self.simulator = simulator if simulator is not None else SimulatedUGA()
+        self._buffer = b''
+        self._is_connected = True
+        if self._connect_callback:
+            self._connect_callback('Connected loopback: {}'.format(self.simulator.model_name))
+
+    def disconnect(self):
+        self._is_connected = False
+        if self._disconnect_callback:
+            self._disconnect_callback('Disconnected loopback')
+
+    @staticmethod
+    def parse_parameter_string(param_string):
+        return [LoopbackInterface.NAME]
+
+    def _send(self, cmd):
+        byte_cmd = bytes(cmd, 'utf-8')
+        if self._term_char not in byte_cmd:
+            byte_cmd += self._term_char
+        self._write_binary(byte_cmd)
+
+    def _write_binary(self, binary_array):
+        if not self._is_connected:
+            raise InstCommunicationError('Loopback not connected')
+        self._buffer += self.simulator.handle_write(bytes(binary_array))
+
+    def _recv(self):
+        index = self._buffer.find(self._term_char)
+        if index < 0:
+            reply, self._buffer = self._buffer, b''
+        else:
+            reply = self._buffer[:index + len(self._term_char)]
+            self._buffer = self._buffer[index + len(self._term_char):]
+        return reply
+
+    def _read_binary(self, length=4):
+        data, self._buffer = self._buffer[:length], self._buffer[length:]
+        return data
+
+    def query_text(self, cmd):
+        with self.get_lock():
+            self._cmd_in_waiting = cmd
+            self._send(cmd)
+            reply = self._recv()
+            if reply == b'':
+                raise InstCommunicationError("Cmd '{}' on loopback timeout".format(cmd))
+            self._cmd_in_waiting = None
+            decoded_reply = reply.decode(encoding='utf-8').strip()
+            if self._query_callback:
+                self._query_callback('Queried Cmd: {} Reply: {}'.format(cmd, decoded_reply))
+            return decoded_reply
+
+    def set_timeout(self, seconds):
+        self._timeout = seconds
+
+    def get_timeout(self):
+        return self._timeout
+
+    def clear_buffer(self):
+        self._buffer = b''
+
+    def get_info(self):
+        return {'type': self.type,
+                'model_name': self.simulator.model_name if self.simulator else None}
+
+
+class _SimulatedUGAHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        simulator = server.simulator
+        self.request.settimeout(server.idle_timeout)
+        server.add_request(self.request)
+        try:
+            self.serve_session(server, simulator)
+        finally:
+            server.remove_request(self.request)
+
+    def serve_session(self, server, simulator):
+        logged_in = False
+        login_step = 0
+        buffer = b''
+        while True:
+            try:
+                data = self.request.recv(1024)
+            except OSError:  # including timeout after idle_timeout
+                break
+            if not data:
+                break
+            buffer += data
+            *lines, buffer = buffer.split(TERM_CHAR)
+            if not logged_in:
+                for line in lines:
+                    text = line.decode('utf-8', errors='replace').strip()
+                    if login_step == 0:
+                        self.request.sendall(b'\r\nName: ')
+                        login_step = 1
+                    elif login_step == 1:
+                        user_id = text
+                        self.request.sendall(b'Password: ')
+                        login_step = 2
+                    elif login_step == 2:
+                        if user_id == server.user_id and text == server.password:
+                            self.request.sendall(b'Welcome\r')
+                            logged_in = True
+                        else:
+                            self.request.sendall(b'Login incorrect\r\nName: ')
+                            login_step = 1
+                continue
+            if lines:
+                commands = TERM_CHAR.join(lines) + TERM_CHAR
+                replies = simulator.handle_write(commands)
+                if replies:
+                    self.request.sendall(replies)
+
+
+class SimulatedUGAServer(socketserver.ThreadingTCPServer):
+    """
+    TCP server exposing a SimulatedUGA with the same login sequence as a UGA.
+
+    The default port is 818, the UGA port, which requires privileges on most systems.
+    Use port=0 to get a free port, available from server_address after construction.
+
+    Like the Ethernet timeout of a UGA, a session idle for idle_timeout seconds
+    is closed. drop_connections() closes all sessions to simulate a network blip.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, simulator=None, host='127.0.0.1', port=818,
+                 user_id='srsuga', password='srsuga', idle_timeout=None):
+        super().__init__((host, port), _SimulatedUGAHandler)
+        self.simulator = simulator if simulator is not None else SimulatedUGA()
+        self.user_id = user_id
+        self.password = password
+        self.idle_timeout = idle_timeout
+        self.session_count = 0
+        self._requests = set()
+        self._requests_lock = threading.Lock()
+        self._thread = None
+
+    def add_request(self, request):
+        with self._requests_lock:
+            self._requests.add(request)
+            self.session_count += 1
+
+    def remove_request(self, request):
+        with self._requests_lock:
+            self._requests.discard(request)
+
+    def drop_connections(self):
+        """Close all sessions"""
+        with self._requests_lock:
+            requests = list(self._requests)
+        for request in requests:
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve in a daemon thread"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def create_simulated_uga(simulator=None):
+    """
+    Create a UGA100 instance connected to a SimulatedUGA over a LoopbackInterface
+
+    The simulator is available as uga.comm.simulator
+    """
+    uga = UGA100()
+    term_char = uga.get_term_char()
+    uga.comm = LoopbackInterface()
+    uga.set_term_char(term_char)
+    uga.comm.connect(simulator)
+    uga.update_components()
+    uga._wrap_comm()
+    uga.check_id()
+    return uga
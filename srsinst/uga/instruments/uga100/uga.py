@@ -3,9 +3,11 @@
 ##! Subject to the MIT License
 ##! 
 
+import time
+
 from srsgui.inst.component import Component
-from srsgui.inst.instrument import Instrument, SerialInterface, TcpipInterface
-from srsgui.inst.exceptions import InstIdError
+from srsgui.inst.instrument import Instrument, SerialInterface
+from srsgui.inst.exceptions import InstIdError, InstCommunicationError, InstQueryError
 
 from srsgui.task.inputs import FindListInput, IntegerListInput, Ip4Input, StringInput, PasswordInput
 
@@ -15,6 +17,13 @@ from .components import BypassPump, RoughingPump, TurboPump, \
                         Pressure, Heaters, Temperature, \
                         Ethernet, Status, Mode
 from .keys import Keys
+from .records import Snapshot, IdentityProfile
+from .cache import CommandCache, CachingInterface
+from .serializer import CommandQueue, SerializingInterface
+from .proxy import InterfaceProxy
+from .watcher import StateWatcher
+from .connection import ManagedTcpipInterface
+from .dispatch import CommandDispatcher
 
 
 class UGA100(Instrument):
@@ -29,7 +38,7 @@ class UGA100(Instrument):
                 'hardware_flow_control': True
             }
         ],
-        [   TcpipInterface,
+        [   ManagedTcpipInterface,
             {
                 'ip_address': Ip4Input('192.168.1.10'),
                 'user_id': StringInput('srsuga'),
@@ -39,119 +48,388 @@ class UGA100(Instrument):
         ]
     ]
 
+    OptionalComponents = {
+        'bp': BypassPump,
+        'bv': BypassValve,
+        'sv': SampleValve,
+        'mi': MultipleInlet,
+    }
+
+    # (attribute name, component class) of the component tree, in the order created.
+    # AsyncUGA100 builds the same tree from them.
+    ComponentClasses = (
+        ('mode', Mode),
+        ('bp', BypassPump),
+        ('rp', RoughingPump),
+        ('tp', TurboPump),
+        ('bv', BypassValve),
+        ('sv', SampleValve),
+        ('vv', VentValve),
+        ('rga', RGA),
+        ('ig', IonGauge),
+        ('mi', MultipleInlet),
+        ('ht', Heaters),
+        ('temperature', Temperature),
+        ('pressure', Pressure),
+        ('ethernet', Ethernet),
+        ('status', Status),
+    )
+
+    # Optional components available with each model, checked in order
+    ModelComponents = (
+        ('UGA_HT', ('bp',)),
+        ('UGA_LT', ('bv', 'sv', 'mi')),
+        ('UGA_PM', ('sv', 'mi')),
+        ('UGA',    ('bv', 'sv', 'mi', 'bp')),
+    )
+
+    # {serial number: IdentityProfile} of UGAs checked in this process
+    IdentityProfiles = {}
+
     def __init__(self, interface_type=None, *args):
+        self.cache = None
+        self.command_queue = CommandQueue()
+        self.use_command_queue = True
+        self.state_watcher = None
+        self.use_identity_profiles = True
+        self.identity_profile = None
+        self._id_checked = False  # check_id() succeeded on the current connection
+        self._dispatcher = None
         super().__init__(interface_type, *args)
 
-        self.mode = Mode(self)
-        self.bp = BypassPump(self)
-        self.rp = RoughingPump(self)
-        self.tp = TurboPump(self)
-        self.bv = BypassValve(self)
-        self.sv = SampleValve(self)
-        self.vv = VentValve(self)
-        self.rga = RGA(self)
-        self.ig = IonGauge(self)
-        self.mi = MultipleInlet(self)
-        self.ht = Heaters(self)
-
-        self.temperature = Temperature(self)
-        self.pressure = Pressure(self)
-        self.ethernet = Ethernet(self)
-        self.status = Status(self)
-
-    def check_id(self):
+        for name, component_class in self.ComponentClasses:
+            setattr(self, name, component_class(self))
+
+        if self.is_connected():
+            self._setup_connection()
+            self.check_id()
+
+    def connect(self, interface_type, *args):
+        self._id_checked = False
+        super().connect(interface_type, *args)
+        if self.is_connected():
+            self._setup_connection()
+            self.check_id()
+
+    def _setup_connection(self):
+        """
+        Install the interface proxies after connecting. Instrument.__init__()
+        connects without calling connect() of a subclass, so this is called
+        from __init__() as well.
+        """
+        if self.cache is not None:
+            self.cache.invalidate()
+        self._wrap_comm()
+        comm = self.comm.get_innermost() if isinstance(self.comm, InterfaceProxy) else self.comm
+        if isinstance(comm, ManagedTcpipInterface):
+            comm.set_reconnect_callback(self._on_reconnect)
+        if self.state_watcher is not None and self.state_watcher.has_subscribers():
+            self.state_watcher.start()
+
+    def _on_reconnect(self):
+        """
+        The UGA may have been power cycled while disconnected,
+        so settings kept on this side are read again.
+        """
+        self._id_checked = False
+        if self.cache is not None:
+            self.cache.invalidate()
+        if hasattr(self, 'rga'):
+            self.rga.invalidate_scan_parameters()
+        self.wake_state_watcher()
+
+    def disconnect(self):
+        self._id_checked = False
+        if self.state_watcher is not None:
+            self.state_watcher.stop()
+        super().disconnect()
+
+    def _wrap_comm(self):
+        """
+        Install the enabled interface proxies over the communication interface
+        and share it with all the components.
+        """
+        comm = self.comm
+        if isinstance(comm, InterfaceProxy):
+            comm = comm.get_innermost()
+        if comm is None:
+            return
+        if self.use_command_queue:
+            comm = SerializingInterface(comm, self.command_queue)
+        if self.cache is not None:
+            comm = CachingInterface(comm, self.cache)
+        if comm is not self.comm:
+            self.comm = comm
+            self.update_components()
+
+    def enable_cache(self, ttl_dict=None):
+        """
+        Cache replies of slow-changing settings, such as identification,
+        Ethernet configuration and setup parameters.
+
+        Parameters
+        -----------
+            ttl_dict: dict, optional
+                {remote command name: TTL in seconds} to override cache.DefaultTTL.
+                None as a TTL means the reply does not expire while connected.
+        """
+        self.cache = CommandCache(ttl_dict)
+        self._wrap_comm()
+
+    def disable_cache(self):
+        """Query all settings from the UGA every time"""
+        self.cache = None
+        self._wrap_comm()
+
+    def enable_command_queue(self):
+        """
+        Pass all commands through command_queue, which is the default.
+        Queries go ahead of scans waiting for the UGA, and identical
+        queries waiting at the same time are sent once.
+        """
+        self.use_command_queue = True
+        self._wrap_comm()
+
+    def disable_command_queue(self):
+        """Use only the interface lock, in the order threads happen to get it"""
+        self.use_command_queue = False
+        self._wrap_comm()
+
+    def check_id(self, force=False):
+        """
+        Check the ID of the UGA, configure the RGA if it is on,
+        and keep only the optional components available with the model.
+
+        It is called when connecting. Later calls on the same connection return
+        the checked identity without querying, unless force is True.
+
+        ZQID? and ZCRG? are sent in a single batch. If the same UGA with the RGA on
+        was checked before in this process, the RGA is configured from
+        the saved IdentityProfile without querying it. Set use_identity_profiles
+        to False to query the RGA every time.
+        """
         if not self.is_connected():
             return None, None, None
+        if self._id_checked and not force:
+            return self._model_name, self._serial_number, self._firmware_version
 
-        reply = self.query_text('ZQID?').strip()
-        strings = reply.split(',')
+        id_reply, rga_state_reply = self.query_batch(['ZQID?', 'ZCRG?'])
+        ids = self.parse_id_string(id_reply)
+        if ids is None:
+            return None, None, None
+        model_name, serial_number, firmware_version = ids
+
+        rga_id_string = None
+        if RGA.state.value_to_key(rga_state_reply) == Keys.On:
+            profile = self.IdentityProfiles.get(serial_number)
+            if self.use_identity_profiles and profile is not None and \
+                    profile.id_string == id_reply and profile.rga_id_string:
+                rga_id_string = profile.rga_id_string
+                self.rga.configure(rga_id_string)
+            elif self.rga.check_id()[0] is not None:
+                rga_id_string = self.rga._id_string
+
+        self.configure_components(model_name)
+
+        self._id_string = id_reply
+        self._model_name = model_name
+        self._serial_number = serial_number
+        self._firmware_version = firmware_version
+        self.identity_profile = IdentityProfile(id_reply, model_name, serial_number,
+                                                firmware_version, rga_id_string)
+        self.IdentityProfiles[serial_number] = self.identity_profile
+        self._id_checked = True
+        return self._model_name, self._serial_number, self._firmware_version
 
+    @classmethod
+    def parse_id_string(cls, reply):
+        """
+        Parse the reply of ZQID? into (model name, serial number, firmware version)
+
+        Returns None if the reply is not in the expected format.
+        """
+        strings = reply.split(',')
         if len(strings) != 3:
-            return None, None, None
+            return None
 
         model_name = strings[0].strip()
         serial_number = strings[1].strip()[4:]
         firmware_version = strings[2].strip()[2:]
 
-        if self._IdString not in reply:
+        if cls._IdString not in reply:
             raise InstIdError("Invalid instrument: {} not in {}"
-                              .format(self._IdString, reply))
-        if self.rga.state == Keys.On:
-            self.rga.check_id()  # configure RGA
-
-        if 'UGA_HT' in model_name:
-            if hasattr(self, 'bv'):
-                del self.bv
-            if hasattr(self, 'sv'):
-                del self.sv
-            if hasattr(self, 'mi'):
-                del self.mi
-            if not hasattr(self, 'bp'):
-                self.bp = BypassPump(self)
-        elif 'UGA_LT' in model_name:
-            if not hasattr(self, 'bv'):
-                self.bv = BypassValve(self)
-            if not hasattr(self, 'sv'):
-                self.sv = SampleValve(self)
-            if not hasattr(self, 'mi'):
-                self.mi = MultipleInlet(self)
-            if hasattr(self, 'bp'):
-                del self.bp
-        elif 'UGA_PM' in model_name:
-            if hasattr(self, 'bv'):
-                del self.bv
-            if not hasattr(self, 'sv'):
-                self.sv = SampleValve(self)
-            if not hasattr(self, 'mi'):
-                self.mi = MultipleInlet(self)
-            if hasattr(self, 'bp'):
-                del self.bp
-        elif 'UGA' in model_name:
-            if not hasattr(self, 'bv'):
-                self.bv = BypassValve(self)
-            if not hasattr(self, 'sv'):
-                self.sv = SampleValve(self)
-            if not hasattr(self, 'mi'):
-                self.mi = MultipleInlet(self)
-            if not hasattr(self, 'bp'):
-                self.bp = BypassPump(self)
-
-        self._id_string = reply
-        self._model_name = model_name
-        self._serial_number = serial_number
-        self._firmware_version = firmware_version
-        return self._model_name, self._serial_number, self._firmware_version
-        
+                              .format(cls._IdString, reply))
+        return model_name, serial_number, firmware_version
+
+    @classmethod
+    def get_model_components(cls, model_name):
+        """Return names of the optional components available with the model"""
+        for model, names in cls.ModelComponents:
+            if model in model_name:
+                return names
+        return ()
+
+    def configure_components(self, model_name):
+        """Add or remove optional components depending on the model"""
+        self._dispatcher = None  # rebuilt with the commands of the new components
+        names = self.get_model_components(model_name)
+        for name, component_class in self.OptionalComponents.items():
+            if name in names:
+                if not hasattr(self, name):
+                    setattr(self, name, component_class(self))
+            elif hasattr(self, name):
+                component = getattr(self, name)
+                if component in self._children:
+                    self._children.remove(component)
+                delattr(self, name)
+
     def get_status(self):
         return self.status.get_status_text()
 
+    def subscribe(self, callback, items=None):
+        """
+        Call callback(change) with a StateChange when the mode or a component state changes.
+
+        The state is polled in a background thread, fast while something is
+        changing and slowly while stable. See watcher.StateWatcher.
+
+        Parameters
+        -----------
+            callback: callable
+                called from the watcher thread with a watcher.StateChange
+            items: list(str), optional
+                'Mode' and names in Status.StateItems, such as 'Turbo Pump'.
+                If None, callback is called for all items.
+
+        Returns
+        --------
+            StateWatcher
+                to change polling periods or get the latest StatusState
+        """
+        if self.state_watcher is None:
+            self.state_watcher = StateWatcher(self)
+        self.state_watcher.subscribe(callback, items)
+        if self.is_connected():
+            self.state_watcher.start()
+        return self.state_watcher
+
+    def unsubscribe(self, callback):
+        """Remove a callback, and stop polling if no subscriber is left"""
+        if self.state_watcher is None:
+            return
+        self.state_watcher.unsubscribe(callback)
+        if not self.state_watcher.has_subscribers():
+            self.state_watcher.stop()
+
+    def wake_state_watcher(self):
+        """Poll the state fast, after a command to start a transition"""
+        if self.state_watcher is not None and self.state_watcher.is_running():
+            self.state_watcher.wake()
+
+    def query_batch(self, commands):
+        """
+        Send multiple query commands in a single write and read all the replies.
+
+        The link latency is paid once for the whole batch instead of once per command.
+
+        Parameters
+        -----------
+            commands: list(str)
+                query commands, such as ['ZQAD? 3', 'ZQTA?']
+
+        Returns
+        --------
+            list(str)
+                replies in the same order as the commands
+        """
+        if not commands:
+            return []
+        comm = self.comm
+        term_char = comm.get_term_char()
+        message = ''.join(cmd + term_char.decode() for cmd in commands)
+        with comm.get_lock():
+            comm._cmd_in_waiting = commands[0]
+            comm._send(message)
+            reply = b''
+            while reply.count(term_char) < len(commands):
+                received = comm._recv()
+                if not received:
+                    raise InstCommunicationError("Timeout with batch: '{}'"
+                                                 .format(', '.join(commands)))
+                reply += received
+            comm._cmd_in_waiting = None
+        replies = [r.decode(encoding='utf-8').strip()
+                   for r in reply.split(term_char)][:len(commands)]
+        if comm._query_callback:
+            comm._query_callback('Queried Batch: {} Reply: {}'
+                                 .format(commands, replies))
+        return replies
+
+    def read_snapshot(self):
+        """
+        Read pressures, temperatures and the state bits with a single batch query.
+
+        Returns
+        --------
+            Snapshot
+                named tuple with pressures in Torr and temperatures in °C
+        """
+        return self.make_snapshot(self.query_batch(self.SnapshotCommands))
+
+    SnapshotCommands = [
+        'ZQAD? {}'.format(Pressure.GaugeDict[Keys.IG]),
+        'ZQAD? {}'.format(Pressure.GaugeDict[Keys.Pirani]),
+        'ZQAD? {}'.format(Pressure.GaugeDict[Keys.CM]),
+        'ZQTT?', 'ZQTA?', 'ZQTB?', 'ZQTC?', 'ZQTD?',
+        'ZBST?',
+    ]
+
+    @staticmethod
+    def make_snapshot(replies):
+        """Convert replies of SnapshotCommands to a Snapshot"""
+        try:
+            values = [int(r) for r in replies]
+        except ValueError:
+            raise InstQueryError('Error during conversion of snapshot: {}'.format(replies))
+        return Snapshot(timestamp=time.time(),
+                        ig_pressure=values[0] * 1e-12,
+                        pirani_pressure=values[1] * 1e-6,
+                        cm_pressure=values[2] * 1e-6,
+                        turbo_pump=values[3],
+                        elbow=values[4],
+                        chamber=values[5],
+                        sample_inlet=values[6],
+                        capillary=values[7],
+                        states=values[8])
+
     def reset(self):
         self.comm.send('ZRST')
 
+    def get_dispatcher(self):
+        """CommandDispatcher built from the command descriptors on first use"""
+        if self._dispatcher is None:
+            self._dispatcher = CommandDispatcher(self)
+        return self._dispatcher
+
     def handle_command(self, cmd_string: str):
-        cmd = cmd_string.upper()
-        reply = ''
-        if '?' in cmd or cmd.startswith("FL") or cmd.startswith("HV") or \
-                cmd.startswith("VF") or cmd.startswith("EE") or \
-                cmd.startswith("IE") or cmd.startswith("IN"):
-            reply = self.query_text(cmd).strip()
-        elif cmd.startswith("MR"):
-            # self.send(cmd)
-            try:
-                mass = int(cmd[2:].strip())
-                intensity = self.rga.scan.get_single_mass_scan(mass)  # read_long()
-                reply = str(intensity)
-            except:
-                pass
-        elif cmd.startswith("SC") and len(cmd) < 10:
-            self.rga.scan.get_analog_scan()
-            reply = "Scan Completed"
-        elif cmd.startswith("HS"):
-            self.rga.scan.get_histogram_scan()
-            reply = "Scan Completed"
-        else:
-            self.send(cmd)
-        return reply
+        """
+        Execute a raw remote command of the UGA or the RGA, and return the reply,
+        or the error message starting with 'Error:'.
+        Use execute_commands() to get replies with errors separately.
+        """
+        return self.get_dispatcher().execute(cmd_string).get_text()
+
+    def execute_commands(self, cmd_strings):
+        """
+        Execute raw remote commands, sending consecutive queries and set commands
+        in a single write.
+
+        Returns
+        --------
+            list(CommandReply)
+                reply and error of each command, in the same order as cmd_strings
+        """
+        return self.get_dispatcher().execute_batch(cmd_strings)
 
 
 if __name__ == '__main__':
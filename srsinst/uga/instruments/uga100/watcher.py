@@ -0,0 +1,167 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+State change notifications for a UGA with adaptive polling.
+
+StateWatcher polls mode and state bitfields with Status.WatchCommands in a single
+exchange. It polls fast while any bit is set in the changing (ZBTT) or changed
+(ZBCT) bitfields, or shortly after a change, and slowly while the UGA is stable.
+It is the only reader of ZBCT, which is cleared when read.
+Callbacks subscribed to an item are called with a StateChange only when the item
+changes. Items are 'Mode' and the names in Status.StateItems, such as 'Turbo Pump',
+'Vent Valve', 'Ion Gauge', 'RGA' and 'Heaters'.
+
+    def on_change(change):
+        print(change.item, change.old, '->', change.new)
+
+    uga.subscribe(on_change, ['Mode', 'Turbo Pump'])
+    uga.mode.start()  # wakes the watcher for fast polling
+    ...
+    uga.unsubscribe(on_change)
+"""
+
+import time
+import logging
+import threading
+from typing import NamedTuple
+
+from .components import Status, StatusState
+
+logger = logging.getLogger(__name__)
+
+ModeItem = 'Mode'
+
+
+class StateChange(NamedTuple):
+    """Change of an item found by StateWatcher"""
+    timestamp: float
+    item: str
+    old: str
+    new: str  # the same as old if the item changed and changed back between polls
+    state: StatusState
+
+
+class StateWatcher:
+    """
+    Poll the state of a UGA in a background thread and call subscribers on changes
+
+    Parameters
+    -----------
+        uga: UGA100
+            connected UGA to watch
+        fast_period: float
+            seconds between polls while something is changing
+        slow_period: float
+            seconds between polls while the UGA is stable
+        hold_time: float
+            seconds to keep fast polling after the last change
+    """
+
+    ItemNames = (ModeItem,) + tuple(item[0] for item in Status.StateItems)
+
+    def __init__(self, uga, fast_period=0.2, slow_period=2.0, hold_time=2.0):
+        self.uga = uga
+        self.fast_period = fast_period
+        self.slow_period = slow_period
+        self.hold_time = hold_time
+
+        self.latest = None  # StatusState from the last poll
+        self.poll_count = 0
+        self._subscribers = []  # list of (callback, set of items)
+        self._fast_until = 0.0
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._thread = None
+        self._running = False
+
+    def subscribe(self, callback, items=None):
+        """
+        Call callback(change) for changes of items, a list of names in ItemNames.
+        If items is None, callback is called for changes of all items.
+        """
+        items = set(self.ItemNames if items is None else items)
+        unknown = items - set(self.ItemNames)
+        if unknown:
+            raise KeyError('Unknown state items: {}'.format(', '.join(sorted(unknown))))
+        with self._lock:
+            self._subscribers.append((callback, items))
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s[0] != callback]
+
+    def has_subscribers(self):
+        with self._lock:
+            return len(self._subscribers) > 0
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='uga-state-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def is_running(self):
+        return self._running
+
+    def wake(self):
+        """Poll now and keep polling fast, after a command starts a transition"""
+        self._fast_until = time.monotonic() + self.hold_time
+        self._wake_event.set()
+
+    def get_period(self):
+        return self.fast_period if time.monotonic() < self._fast_until else self.slow_period
+
+    def poll(self):
+        """Read the state once, call subscribers and return the list of StateChange"""
+        state = Status.make_state(self.uga.query_batch(Status.WatchCommands))
+        previous, self.latest = self.latest, state
+        self.poll_count += 1
+        if state.changing or state.changed:
+            self._fast_until = time.monotonic() + self.hold_time
+        if previous is None:
+            return []
+
+        changes = []
+        if state.mode != previous.mode:
+            changes.append(StateChange(state.timestamp, ModeItem, previous.mode, state.mode, state))
+        for name, mask, idle_mask, on_tag, off_tag in Status.StateItems:
+            old = previous.get_item_state(mask, idle_mask, on_tag, off_tag)
+            new = state.get_item_state(mask, idle_mask, on_tag, off_tag)
+            if old != new or state.changed & (mask | idle_mask):
+                changes.append(StateChange(state.timestamp, name, old, new, state))
+        if changes:
+            self._fast_until = time.monotonic() + self.hold_time
+            self._dispatch(changes)
+        return changes
+
+    def _dispatch(self, changes):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for change in changes:
+            for callback, items in subscribers:
+                if change.item not in items:
+                    continue
+                try:
+                    callback(change)
+                except Exception as e:
+                    logger.error('State change callback failed: {}: {}'.format(type(e).__name__, e))
+
+    def _run(self):
+        while self._running:
+            self._wake_event.clear()
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning('Polling state failed: {}: {}'.format(type(e).__name__, e))
+            self._wake_event.wait(self.get_period())
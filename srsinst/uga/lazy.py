@@ -0,0 +1,35 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Lazy exports of a package, with module-level __getattr__ (PEP 562).
+
+    __getattr__, __dir__ = make_lazy_getattr(__name__, globals(), {
+        'UGA100': '.instruments.uga100.uga',
+    })
+
+A name is imported from its module on first access, and kept in the package
+globals, so later accesses cost nothing.
+"""
+
+from importlib import import_module
+
+
+def make_lazy_getattr(package_name, package_globals, lazy_names):
+    """
+    Return (__getattr__, __dir__) for a package exporting lazy_names,
+    {name: module name}, relative to the package if it starts with '.'.
+    """
+    def __getattr__(name):
+        if name not in lazy_names:
+            raise AttributeError("module {!r} has no attribute {!r}".format(package_name, name))
+        value = getattr(import_module(lazy_names[name], package_name), name)
+        package_globals[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(package_globals) | set(lazy_names))
+
+    return __getattr__, __dir__
@@ -0,0 +1,250 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+"""
+Headless monitor of UGAs, the command line counterpart of UGAStateMonitorTask.
+
+It connects to the UGAs defined with 'inst:' lines of a .taskconfig file,
+reads a snapshot of pressures, temperatures and states from each of them
+periodically, and writes them to stdout or a file as text, CSV or JSON lines.
+Errors are drained from the UGA when the error bit is set.
+Snapshots can be logged to .ugalog files with DataLogger as well.
+
+    uga-monitor uga.taskconfig --period 1 --format jsonl
+    uga-monitor --connect uga=tcpip:192.168.1.10:srsuga:srsuga:818 --log-dir logs
+    uga-monitor --simulate --count 10
+
+Neither Qt nor matplotlib is imported. They are hidden from the import system
+with block_gui_modules() before the instrument driver is imported.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+from pathlib import Path
+
+from srsinst.uga.gui import block_gui_modules
+
+logger = logging.getLogger(__name__)
+
+DefaultConfigFile = str(Path(__file__).parent / 'uga.taskconfig')
+
+OutputFormats = ('text', 'csv', 'jsonl')
+
+
+def read_instrument_lines(file_name):
+    """
+    Return a list of (name, module name, class name, connection parameters or None)
+    from 'inst:' lines of a .taskconfig file. Other lines are ignored,
+    so that task modules are not imported.
+    """
+    instruments = []
+    with open(file_name, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('#') or ':' not in line:
+                continue
+            key, value = line.split(':', 1)
+            if key.strip().lower() != 'inst':
+                continue
+            items = [item.strip() for item in value.split(',')]
+            if len(items) < 3 or len(items) > 4:
+                raise ValueError('Invalid inst line: {}'.format(line))
+            instruments.append((items[0], items[1], items[2],
+                                items[3] if len(items) == 4 else None))
+    return instruments
+
+
+def connect_ugas(args):
+    """Return {name: connected UGA100} from the command line arguments"""
+    from importlib import import_module
+    from srsinst.uga.instruments.uga100.uga import UGA100
+
+    if args.simulate:
+        from srsinst.uga.instruments.uga100.simulator import create_simulated_uga
+        names = args.inst or ['uga']
+        ugas = {}
+        for name in names:
+            ugas[name] = create_simulated_uga()
+            ugas[name].set_name(name)
+        return ugas
+
+    parameters = {}
+    classes = {}
+    for name, module_name, class_name, parameter_string in read_instrument_lines(args.config):
+        inst_class = getattr(import_module(module_name), class_name)
+        if issubclass(inst_class, UGA100):
+            classes[name] = inst_class
+            parameters[name] = parameter_string
+    for item in args.connect:
+        name, _, parameter_string = item.partition('=')
+        classes.setdefault(name, UGA100)
+        parameters[name] = parameter_string
+
+    names = args.inst or [name for name in classes if parameters[name]]
+    ugas = {}
+    for name in names:
+        if name not in classes:
+            raise KeyError('No UGA named {} in {}'.format(name, args.config))
+        if not parameters[name]:
+            raise ValueError('No connection parameters for {}. Use --connect {}=...'
+                             .format(name, name))
+        uga = classes[name]()
+        uga.set_name(name)
+        uga.connect_with_parameter_string(parameters[name])  # checks the ID
+        ugas[name] = uga
+    return ugas
+
+
+class SnapshotWriter:
+    """Write snapshots of UGAs as text, CSV or JSON lines"""
+
+    def __init__(self, stream, output_format='text'):
+        if output_format not in OutputFormats:
+            raise ValueError('Invalid output format: {}'.format(output_format))
+        self.stream = stream
+        self.output_format = output_format
+        self.header_written = False
+
+    def write(self, name, snapshot, errors=()):
+        if self.output_format == 'jsonl':
+            record = dict(snapshot._asdict(), name=name, errors=[e.message for e in errors])
+            line = json.dumps(record)
+        elif self.output_format == 'csv':
+            if not self.header_written:
+                self.stream.write(','.join(('name',) + snapshot._fields + ('errors',)) + '\n')
+                self.header_written = True
+            line = ','.join([name] + [str(v) for v in snapshot] +
+                            [';'.join(str(e.code) for e in errors)])
+        else:
+            line = '{} {:<8} IG {:.2e} Pirani {:.2e} CM {:.2e} Torr, ' \
+                   'TP {} Elbow {} Chamber {} Inlet {} Capillary {} °C, states 0x{:04x}'.format(
+                       time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot.timestamp)),
+                       name, snapshot.ig_pressure, snapshot.pirani_pressure,
+                       snapshot.cm_pressure, snapshot.turbo_pump, snapshot.elbow,
+                       snapshot.chamber, snapshot.sample_inlet, snapshot.capillary,
+                       snapshot.states)
+            for error in errors:
+                line += '\n{} {:<8} error {}: {}'.format(
+                    time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(error.timestamp)),
+                    name, error.code, error.message)
+        self.stream.write(line + '\n')
+        self.stream.flush()
+
+
+def make_reader(uga):
+    """Return a function reading a snapshot of uga with errors drained if the error bit is set"""
+    from srsinst.uga.instruments.uga100.components import Status
+
+    def read():
+        snapshot = uga.read_snapshot()
+        errors = uga.status.drain_errors() if snapshot.states & Status.ErrorMask else []
+        return uga.get_name(), snapshot, errors
+    return read
+
+
+def run(args):
+    from srsinst.uga.data.acquisition import AcquisitionWorker
+    from srsinst.uga.data.datalog import DataLogger
+
+    ugas = connect_ugas(args)
+    if not ugas:
+        logger.error('No UGA to monitor')
+        return 1
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'a')
+    writer = SnapshotWriter(output, args.format)
+    data_loggers = {}
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+        for name in ugas:
+            path = os.path.join(args.log_dir, '{}-{}.ugalog'.format(
+                name, time.strftime('%Y%m%d-%H%M%S')))
+            data_loggers[name] = DataLogger(path)
+            logger.info('Logging {} to {}'.format(name, path))
+
+    results = queue.Queue(maxsize=1000)
+    workers = [AcquisitionWorker('uga-monitor-{}'.format(name), make_reader(uga),
+                                 results, args.period)
+               for name, uga in ugas.items()]
+    for worker in workers:
+        worker.start()
+
+    counts = dict.fromkeys(ugas, 0)
+    try:
+        while args.count == 0 or min(counts.values()) < args.count:
+            try:
+                name, snapshot, errors = results.get(timeout=0.5)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    break
+                continue
+            if args.count and counts[name] >= args.count:
+                continue
+            writer.write(name, snapshot, errors)
+            if name in data_loggers:
+                data_loggers[name].log(snapshot, errors[0].code if errors else 0)
+            counts[name] += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.join()
+        for data_logger in data_loggers.values():
+            data_logger.close()
+        for uga in ugas.values():
+            uga.disconnect()
+        if output is not sys.stdout:
+            output.close()
+    return 1 if any(worker.error is not None for worker in workers) else 0
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog='uga-monitor', description='Monitor UGA pressures, temperatures and states '
+                                        'without a GUI')
+    parser.add_argument('config', nargs='?', default=DefaultConfigFile,
+                        help='.taskconfig file with inst: lines (default: %(default)s)')
+    parser.add_argument('--inst', action='append', default=[], metavar='NAME',
+                        help='instrument to monitor, repeatable. '
+                             'All UGAs with connection parameters by default')
+    parser.add_argument('--connect', action='append', default=[], metavar='NAME=PARAMS',
+                        help='connection parameters as in a .taskconfig file, such as '
+                             'uga=tcpip:192.168.1.10:srsuga:srsuga:818')
+    parser.add_argument('--period', type=float, default=2.0,
+                        help='seconds between readings (default: %(default)s)')
+    parser.add_argument('--count', type=int, default=0,
+                        help='readings per UGA before exiting, 0 to run until interrupted')
+    parser.add_argument('--format', choices=OutputFormats, default='text')
+    parser.add_argument('--output', default='-', help="output file, '-' for stdout")
+    parser.add_argument('--log-dir', help='directory to write .ugalog files with DataLogger')
+    parser.add_argument('--simulate', action='store_true',
+                        help='monitor simulated UGAs instead of connecting')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s',
+                        stream=sys.stderr)
+    block_gui_modules()
+    from srsgui.inst.exceptions import InstException
+    try:
+        return run(args)
+    except (InstException, OSError, KeyError, ValueError) as e:
+        logger.error('{}: {}'.format(type(e).__name__, e))
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import time
+import numpy as np
+from datetime import datetime
+from matplotlib.axes import Axes
+from srsgui import Task
+
+from srsinst.rga.plots.timeplot import TimePlot
+from srsinst.uga.data.ringbuffer import SnapshotBuffer
+from srsinst.uga.plots.decimation import get_minmax_indices
+
+
+def get_utc_offset(timestamp):
+    """Offset of local time from UTC in seconds at a timestamp"""
+    return datetime.fromtimestamp(timestamp).astimezone().utcoffset().total_seconds()
+
+
+def get_utc_offsets(timestamps):
+    """
+    Offsets of local time from UTC at timestamps, a single value if the same
+    at the first and the last timestamps, or an array if daylight saving time
+    started or ended in between
+    """
+    if len(timestamps) == 0:
+        return 0.0
+    first = get_utc_offset(float(timestamps[0]))
+    if get_utc_offset(float(timestamps[-1])) == first:
+        return first
+    return np.array([get_utc_offset(t) for t in timestamps.tolist()])
+
+
+def to_utc(local_time):
+    """Convert seconds in local time to a UTC timestamp"""
+    return local_time - get_utc_offset(local_time - get_utc_offset(local_time))
+
+
+class BufferedTimePlot(TimePlot):
+    """
+    TimePlot drawing from columns of a SnapshotBuffer instead of its own arrays
+
+    The acquisition code appends snapshots to the buffer and calls add_data()
+    to save the latest values to the data file and update the plot.
+    Memory use is fixed by the buffer capacity, however long the task runs.
+
+    Each line is decimated to the minimum and maximum values in bins as wide as
+    a pixel of the axes, so the number of points drawn does not grow with
+    the history. The buffer and the data file keep the full resolution.
+
+    parameters
+    -----------
+
+        parent: Task
+            It uses resources from the parent task
+
+        ax: Axes
+            Matplotlib Axes on which it makes a plot
+
+        buffer: SnapshotBuffer
+            buffer holding the data to plot
+
+        columns: dict
+            {data name: column name in the buffer}, such as {'Ion Gauge': 'ig_pressure'}
+    """
+
+    def __init__(self, parent: Task, ax: Axes, plot_name='', buffer: SnapshotBuffer = None,
+                 columns=None, save_to_file=True, plot_options=None):
+        if buffer is None or not columns:
+            raise ValueError('BufferedTimePlot requires a buffer and columns')
+        # Set before TimePlot.__init__(), which sets the x axis limits to update the plot
+        self.buffer = buffer
+        self.columns = dict(columns)
+        # Buffer timestamps are in UTC, and TimePlot axes in local time.
+        # The UTC offset is found for each point plotted, as it changes with DST.
+
+        super().__init__(parent, ax, plot_name, list(columns), save_to_file,
+                         use_datetime=True, plot_options=plot_options)
+        self.set_buffer_size(0)  # release the arrays of TimePlot
+
+    def add_data(self, data_list=None, update_figure=False):
+        """
+        Save the latest sample in the buffer to the data file and update the plot.
+
+        data_list is ignored, the values are taken from the buffer.
+        """
+        latest = self.buffer.get_latest()
+        if latest is None:
+            return
+        values = [getattr(latest, self.columns[key]) for key in self.data_keys]
+        self.data_points = len(self.buffer)
+        if self.data_points == 1:
+            min_value = min(values) * self.conversion_factor
+            max_value = max(values) * self.conversion_factor
+            if min_value == 0 and max_value == 0:
+                min_value, max_value = -1.0, 1.0
+            self.ax.set_ylim(min_value - abs(min_value) / 2, max_value + abs(max_value) / 2)
+        if update_figure:
+            self.update_plot()
+        local_time = latest.timestamp + get_utc_offset(latest.timestamp)
+        timestamp = np.datetime64(int(local_time * 1000), 'ms')
+        self.save_data(timestamp, values)
+
+    def get_plot_slice(self, timestamps):
+        """Slice of timestamps to plot for the current x axis limits"""
+        r_min, r_max = (to_utc(limit * 86400) for limit in self.ax.get_xlim())
+        index = np.searchsorted(timestamps, [r_min, r_max])
+        start = 0 if index[0] <= 0 else index[0] - 1
+        stop = len(timestamps) if index[1] >= len(timestamps) else index[1] + 1
+        return slice(start, stop)
+
+    def get_bin_count(self):
+        """Number of decimation bins, the width of the axes in pixels"""
+        width = self.ax.get_window_extent().width
+        return min(self.max_points_in_plot, max(1, int(width)))
+
+    def update_plot(self):
+        current_time = time.time()
+        if current_time - self.figure_updated_time < self.figure_update_period:
+            return
+
+        timestamps = self.buffer.get_timestamps()
+        s = self.get_plot_slice(timestamps)
+        timestamps = timestamps[s]
+        bins = self.get_bin_count()
+        for key in self.data_keys:
+            y = self.buffer.get_column(self.columns[key])[s]
+            index = get_minmax_indices(y, bins)
+            x = timestamps[index]
+            x = ((x + get_utc_offsets(x)) * 1000).astype('datetime64[ms]')
+            self.lines[key].set_xdata(x)
+            self.lines[key].set_ydata(y[index] * self.conversion_factor)
+
+        self.parent.request_figure_update(self.ax.figure)
+        self.figure_updated_time = current_time
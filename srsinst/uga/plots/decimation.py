@@ -0,0 +1,32 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import numpy as np
+
+
+def get_minmax_indices(y, bins):
+    """
+    Indices of the minimum and maximum of y in each of about bins equal bins,
+    along with the first and last indices, in increasing order.
+
+    Drawing only these points of a line looks the same as drawing all of them
+    when a bin is not wider than a pixel, because spikes and dips are kept.
+    If y has no more than 2 x bins points, all indices are returned.
+    """
+    n = len(y)
+    bins = max(1, int(bins))
+    if n <= 2 * bins:
+        return np.arange(n)
+
+    bin_size = -(-n // bins)  # ceiling division
+    m = n - n % bin_size
+    blocks = y[:m].reshape(-1, bin_size)
+    offsets = np.arange(0, m, bin_size)
+    parts = [blocks.argmin(axis=1) + offsets,
+             blocks.argmax(axis=1) + offsets,
+             [0, n - 1]]
+    if m < n:
+        parts.append([m + np.argmin(y[m:]), m + np.argmax(y[m:])])
+    return np.unique(np.concatenate(parts))
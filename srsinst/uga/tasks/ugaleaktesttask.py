@@ -0,0 +1,108 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import time
+from datetime import datetime
+from srsgui import Task
+from srsgui.task.inputs import InstrumentInput, IntegerInput, FloatInput
+
+from srsinst.uga import get_uga, Keys
+from srsinst.uga.data.leaktest import LeakTestStream
+from srsinst.uga.plots.decimation import get_minmax_indices
+
+
+class UGALeakTestTask(Task):
+    """
+    Stream the leak test mass at the full rate of the RGA, and
+    report the rise time and the peak of responses,
+    after spraying helium on a suspected leak, for example.
+
+    Put the UGA in leak test mode with the UGA Mode Control task first.
+    The leak test mass set on the UGA is streamed, unless the mass for leak test
+    is set to other than 0.
+    Readings are taken as fast as the RGA measures, independent of
+    the update period, which sets how often the plot and results are updated.
+    """
+    InstrumentName = 'uga to test'
+    LeakTestMass = 'mass for leak test'
+    Threshold = 'response threshold'
+    TimeWindow = 'time window'
+    UpdatePeriod = 'update period'
+    BufferSize = 'buffer size'
+
+    input_parameters = {
+        InstrumentName: InstrumentInput(),
+        LeakTestMass: IntegerInput(0, ' AMU', 0, 100),
+        Threshold: FloatInput(1000.0, ' x 0.1 fA', 0.0, 1e9, 100.0),
+        TimeWindow: IntegerInput(30, ' s', 1, 3600, 1),
+        UpdatePeriod: FloatInput(0.5, ' s', 0.1, 10.0, 0.1),
+        BufferSize: IntegerInput(1000000, ' points', 1000, 10000000, 1000),
+    }
+
+    def setup(self):
+        self.logger = self.get_logger(__name__)
+        self.params = self.get_all_input_parameters()
+        self.uga = get_uga(self, self.params[self.InstrumentName])
+
+        if self.uga.mode.state != Keys.LeakTest:
+            self.logger.warning('UGA is not in leak test mode')
+
+        # 0 for the leak test mass set on the UGA, read by the stream
+        mass = self.params[self.LeakTestMass] or None
+        self.stream = LeakTestStream(self.uga, mass, self.params[self.BufferSize])
+        self.ax = self.figure.subplots()
+        self.ax.set_xlabel('Time (s)')
+        self.ax.set_ylabel('Ion current (0.1 fA)')
+        self.line, = self.ax.plot([], [])
+
+    def update_plot(self, timestamps, intensities):
+        if len(timestamps) < 2:
+            return
+        x = timestamps - timestamps[-1]
+        width = max(1, int(self.ax.bbox.width))
+        indices = get_minmax_indices(intensities, width)
+        self.line.set_data(x[indices], intensities[indices])
+        self.ax.set_xlim(-self.params[self.TimeWindow], 0)
+        low, high = float(intensities.min()), float(intensities.max())
+        margin = (high - low) * 0.05 or 1.0
+        self.ax.set_ylim(low - margin, high + margin)
+        self.request_figure_update()
+
+    def display_response(self, response, rate):
+        self.display_result('Reading rate: {:.1f} /s'.format(rate), True)
+        if response is None:
+            self.display_result('No response above {} x 0.1 fA'
+                                .format(self.params[self.Threshold]))
+            return
+        self.display_result('Onset: {}'.format(
+            datetime.fromtimestamp(response.onset_time).strftime('%H:%M:%S.%f')[:-3]))
+        self.display_result('Rise time (10-90 %): {:.3f} s'.format(response.rise_time))
+        self.display_result('Peak: {:.0f} x 0.1 fA, {:.0f} above baseline'
+                            .format(response.peak, response.amplitude))
+
+    def test(self):
+        self.stream.start()
+        self.ax.set_title('Leak test mass {} AMU'.format(self.stream.mass))
+        self.logger.info('Streaming mass {} AMU'.format(self.stream.mass))
+        last_response = None
+        while self.is_running():
+            time.sleep(self.params[self.UpdatePeriod])
+            if self.stream.error is not None:
+                raise self.stream.error
+
+            start_time = time.time() - self.params[self.TimeWindow]
+            timestamps, intensities = self.stream.get_signal(start_time)
+            self.update_plot(timestamps, intensities)
+
+            response = self.stream.detect(self.params[self.Threshold], start_time)
+            self.display_response(response, self.stream.get_rate())
+            if response is not None and (last_response is None or
+                                         response.onset_time != last_response.onset_time):
+                self.logger.info('Leak response: rise time {:.3f} s, peak {:.0f}'
+                                 .format(response.rise_time, response.peak))
+            last_response = response
+
+    def cleanup(self):
+        self.stream.stop()
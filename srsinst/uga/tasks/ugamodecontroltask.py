@@ -3,8 +3,9 @@
 ##! Subject to the MIT License
 ##! 
 
-import time
+import threading
 from srsinst.uga import Keys
+from srsinst.uga.instruments.uga100.watcher import ModeItem
 
 from srsgui import Task
 from srsgui.task.inputs import InstrumentInput, ListInput, IntegerInput
@@ -35,80 +36,91 @@ class UGAModeControlTask(Task):
 
         self.uga = get_uga(self, self.params[self.InstrumentName])
         print(self.uga.status.id_string)
-        while self.uga.status.error != Keys.OK:
-            pass
+        for error in self.uga.status.drain_errors():
+            self.logger.warning('Error before changing mode: {}'.format(error.message))
 
         self.immediate_state = self.uga.mode.state
         self.final_state = self.immediate_state
         self.logger.info('Current mode before changing: {}'.format(self.immediate_state))
 
+        self.mode_settled = threading.Event()
+        self.watcher = self.uga.subscribe(self.on_mode_change, [ModeItem])
+
+    def on_mode_change(self, change):
+        self.logger.info('Mode changed from {} to {}'.format(change.old, change.new))
+        if change.new == self.final_state or change.new != self.immediate_state:
+            self.mode_settled.set()
+
     def test(self):
+        # The states are set before each command, since the watcher
+        # may report the change before the command returns.
         if self.params[self.ModeName] == Keys.Start:
-            self.uga.mode.start()
             self.immediate_state = Keys.Start
             self.final_state = Keys.Ready
+            self.uga.mode.start()
 
         elif self.params[self.ModeName] == Keys.Stop:
-            self.uga.mode.stop()
             self.immediate_state = Keys.Stop
             self.final_state = Keys.Off
+            self.uga.mode.stop()
 
         elif self.params[self.ModeName] == Keys.Sleep:
-            self.uga.mode.sleep()
             self.immediate_state = Keys.Sleep
             self.final_state = Keys.Idle
+            self.uga.mode.sleep()
 
         elif self.params[self.ModeName] == Keys.LeakTestOn:
             if self.uga.mode.state != Keys.Ready:
                 raise ValueError('Leak test mode is available only from READY state')
             self.uga.mode.leak_test_mass = self.params[self.LeakTestMass]
-            self.uga.mode.leak_test = True
             self.immediate_state = Keys.Ready
             self.final_state = Keys.LeakTest
+            self.uga.mode.leak_test = True
 
         elif self.params[self.ModeName] == Keys.LeakTestOff:
             if self.uga.mode.state != Keys.LeakTest:
                 raise ValueError('Leak test mode is not on')
-
-            self.uga.mode.leak_test = False
             self.immediate_state = Keys.LeakTest
             self.final_state = Keys.Ready
+            self.uga.mode.leak_test = False
 
         elif self.params[self.ModeName] == Keys.SystemBakeOn:
             self.immediate_state = self.uga.mode.state
-            self.uga.mode.bake = True
             self.final_state = Keys.SystemBake
+            self.uga.mode.bake = True
 
         elif self.params[self.ModeName] == Keys.SystemBakeOff:
             if self.uga.mode.state != Keys.SystemBake:
                 raise ValueError('SYSTEM BAKE is not on')
-            self.uga.mode.bake = False
             self.immediate_state = Keys.Start
             self.final_state = Keys.Ready
+            self.uga.mode.bake = False
 
-        error_code = self.uga.status.error_number
-        if error_code > 10:
+        errors = [error for error in self.uga.status.drain_errors() if error.code > 10]
+        if errors:
             raise ValueError('Error "{}" when trying to change to  {}'
-                             .format(self.uga.status.error_message[error_code], self.final_state))
+                             .format(errors[0].message, self.final_state))
         else:
             self.logger.info('UGA mode changing to {}'.format(self.final_state))
 
         self.display_device_info(device_name=self.params[self.InstrumentName], update=True)
 
-        time.sleep(self.params[self.UpdatePeriod])
-        current_state = self.uga.mode.state
-        while current_state in [self.immediate_state, self.final_state]:
+        # The watcher polls fast during the transition, and sets mode_settled
+        # when the mode reaches the final state or leaves the expected states.
+        self.uga.wake_state_watcher()
+        while not self.mode_settled.wait(self.params[self.UpdatePeriod]):
             if not self.is_running():
                 break
             self.display_device_info(device_name=self.params[self.InstrumentName], update=True)
-            current_state = self.uga.mode.state
-            if current_state == self.final_state:
-                self.logger.info('Mode successfully changed to {}'.format(self.final_state))
+            latest = self.watcher.latest
+            if latest is not None and latest.mode == self.final_state:
                 break
-            time.sleep(self.params[self.UpdatePeriod])
 
+        latest = self.watcher.latest
+        if latest is not None and latest.mode == self.final_state:
+            self.logger.info('Mode successfully changed to {}'.format(self.final_state))
         self.display_device_info(device_name=self.params[self.InstrumentName], update=True)
         self.set_task_passed(True)
 
     def cleanup(self):
-        pass
+        self.uga.unsubscribe(self.on_mode_change)
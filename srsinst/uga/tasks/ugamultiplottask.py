@@ -4,25 +4,47 @@
 ##! 
 
 import time
+import queue
+import threading
 import numpy as np
 from srsgui import Task
-from srsgui.task.inputs import InstrumentInput, IntegerInput
+from srsgui.task.inputs import InstrumentInput, IntegerInput, StringInput
 
-from srsinst.rga.plots.timeplot import TimePlot
 from srsinst.rga.plots.analogscanplot import AnalogScanPlot
 from srsinst.rga.plots.histogramscanplot import HistogramScanPlot
 
 from srsinst.uga import Keys, get_uga, get_rga
+from srsinst.uga.data.ringbuffer import SnapshotBuffer
+from srsinst.uga.data.acquisition import AcquisitionWorker
+from srsinst.uga.plots.buffertimeplot import BufferedTimePlot
+from srsinst.uga.analysis import CompositionAnalyzer, ScanData
+from srsinst.uga.instruments.uga100.serializer import Priority
 
 
 class UGAMultiplotTask(Task):
     """
     Run multiple plots for UGA
+
+    UGA gauges, the UGA RGA and the standalone RGA are read by
+    separate acquisition workers, so that a scan of one instrument
+    overlaps a scan of the other, and the pressure plot is updated
+    at the update period instead of once after all scans.
+    The UGA gauges and the UGA RGA share the UGA connection,
+    so gauge readings wait while a UGA RGA scan is running.
+
+    Composition of UGA RGA analog scans is analyzed in worker processes
+    with gases in the gas list. Leave the gas list empty to skip the analysis.
     """
     InstrumentName = 'uga to monitor'
+    UpdatePeriod = 'update period'
+    BufferSize = 'buffer size'
+    GasList = 'gas list'
 
     input_parameters = {
         InstrumentName: InstrumentInput(),
+        UpdatePeriod: IntegerInput(2, ' s', 1, 60, 1),
+        BufferSize: IntegerInput(500000, ' points', 1000, 10000000, 1000),
+        GasList: StringInput('water, nitrogen, oxygen, argon, carbon dioxide'),
     }
 
     additional_figure_names = ['analog_scan', 'histogram_scan', 'rga_analog_scan']
@@ -34,7 +56,9 @@ class UGAMultiplotTask(Task):
         self.uga = get_uga(self, self.instrument_name_value)
         if self.uga.rga.state != Keys.On:
             raise ValueError('UGA RGA is off')
-        self.uga.rga.scan.set_parameters(1, 50, 5, 10)
+        self.uga.rga.add_scan_profile('analog', 1, 50, 5, 10)
+        self.uga.rga.add_scan_profile('histogram', 10, 45, 3, 10)
+        self.uga.rga.use_scan_profile('analog')
 
         self.rga = get_rga(self, 'rga')
 
@@ -43,53 +67,137 @@ class UGAMultiplotTask(Task):
         self.ax_histogram = self.get_figure('histogram_scan').add_subplot(111)
         self.ax_rga_analog = self.get_figure('rga_analog_scan').add_subplot(111)
 
-        self.pressure_plot = TimePlot(self, self.ax[0], 'Pressure',
-            ['IG pressure', 'PG pressure', 'CM pressure'])
+        self.buffer = SnapshotBuffer(self.get_input_parameter(self.BufferSize))
+
+        self.pressure_plot = BufferedTimePlot(self, self.ax[0], 'Pressure', self.buffer,
+            {'IG pressure': 'ig_pressure', 'PG pressure': 'pirani_pressure',
+             'CM pressure': 'cm_pressure'})
         self.pressure_plot.ax.set_yscale('log')
 
-        self.temperature_plot = TimePlot(self, self.ax[1], 'Temperature',
-            ['Chamber Temperature', 'Elbow Temperature', 'Sample Inlet Temperature',
-             'Capillary Temperature', 'Turbo Pump Temperature'])
+        self.temperature_plot = BufferedTimePlot(self, self.ax[1], 'Temperature', self.buffer,
+            {'Chamber Temperature': 'chamber', 'Elbow Temperature': 'elbow',
+             'Sample Inlet Temperature': 'sample_inlet',
+             'Capillary Temperature': 'capillary', 'Turbo Pump Temperature': 'turbo_pump'})
 
-        self.uga.rga.scan.set_parameters(1, 50, 5, 10)
         self.analog_scan_plot = AnalogScanPlot(self, self.ax_analog, self.uga.rga.scan, 'Analog Scan')
         self.analog_scan_plot.set_conversion_factor(
             self.uga.rga.pressure.get_partial_pressure_sensitivity_in_torr(), 'Torr')
 
-        self.uga.rga.scan.set_parameters(10, 45, 3, 10)
+        self.uga.rga.use_scan_profile('histogram')
         self.histogram_scan_plot = HistogramScanPlot(self, self.ax_histogram, self.uga.rga.scan, 'Histogram Scan')
 
         self.rga.scan.set_parameters(1, 50, 3, 10)
         self.rga_analog_scan_plot = AnalogScanPlot(self, self.ax_rga_analog,
                                                    self.rga.scan, 'RGA analog')
 
-    def test(self):
-        while True:
-            if not self.is_running():
-                break
-
-            self.display_device_info(device_name=self.instrument_name_value, update=True)
-
-            self.pressure_plot.add_data([self.uga.ig.get_pressure(), self.uga.rp.get_pressure(),
-                         self.uga.bp.get_pressure()])
-
-            self.temperature_plot.add_data([self.uga.temperature.chamber, self.uga.temperature.elbow,
-                 self.uga.temperature.sample_inlet, self.uga.temperature.capillary,
-                 self.uga.temperature.turbo_pump], True)
-
-            self.rga.scan.set_parameters(1, 50, 3, 10)
-            self.rga_analog_scan_plot.reset()
-            self.rga.scan.get_analog_scan()
-
-            self.uga.rga.scan.set_parameters(10, 45, 3, 10)
-            self.histogram_scan_plot.reset()
+        gas_names = [gas.strip() for gas in self.get_input_parameter(self.GasList).split(',')
+                     if gas.strip()]
+        self.composition_queue = queue.Queue()
+        self.analyzer = None
+        if gas_names:
+            start_mass, stop_mass, _, _ = self.uga.rga.scan_profiles['analog']
+            self.analyzer = CompositionAnalyzer(gas_names, start_mass, stop_mass,
+                                                callback=self.composition_queue.put)
+
+    def set_scan_callbacks(self, plot):
+        """
+        Reset a scan plot for a new scan. The scan finished callback installed
+        by the plot, which saves scan data, is serialized with other data saving
+        because it runs in an acquisition worker. The other callbacks are kept.
+        """
+        plot.reset()
+        scan = plot.scan
+        scan_finished_callback = scan._scan_finished_callback
+
+        def scan_finished():
+            with self.data_lock:
+                scan_finished_callback()
+
+        scan.set_callbacks(scan._data_available_callback, scan._scan_started_callback,
+                           scan_finished if scan_finished_callback else None)
+
+    def acquire_uga_rga_scans(self):
+        # Let pressure and status readings of other tasks go ahead of the scans
+        with self.uga.command_queue.priority(Priority.Low):
+            self.uga.rga.use_scan_profile('histogram')
+            self.set_scan_callbacks(self.histogram_scan_plot)
             self.uga.rga.scan.get_histogram_scan()
 
-            self.uga.rga.scan.set_parameters(1, 50, 5, 10)
-            self.analog_scan_plot.reset()
-            self.uga.rga.scan.get_analog_scan()
+            self.uga.rga.use_scan_profile('analog')
+            self.set_scan_callbacks(self.analog_scan_plot)
+            spectrum = self.uga.rga.scan.get_analog_scan()
+        if self.analyzer is not None:
+            self.analyzer.submit(ScanData.from_scan(
+                self.instrument_name_value, self.uga.rga.scan,
+                self.analog_scan_plot.conversion_factor, time.time(),
+                self.analog_scan_plot.x_axis))
+        return spectrum
+
+    def acquire_rga_scan(self):
+        # Scan parameters of the standalone RGA are set once in setup()
+        self.set_scan_callbacks(self.rga_analog_scan_plot)
+        return self.rga.scan.get_analog_scan()
+
+    def display_composition(self):
+        """Display the latest composition analysis result"""
+        result = None
+        while not self.composition_queue.empty():
+            result = self.composition_queue.get_nowait()
+        if result is None:
+            return
+        self.display_result('', True)
+        for gas, partial_pressure in zip(result.gas_names, result.partial_pressures):
+            self.display_result('{}: {:.2e} Torr'.format(gas, partial_pressure))
+        self.display_result('Residual: {:.2e}'.format(result.residual))
+
+    def test(self):
+        self.data_lock = threading.Lock()
+        self.snapshot_queue = queue.Queue()
+        update_period = self.get_input_parameter(self.UpdatePeriod)
+        self.workers = [
+            AcquisitionWorker('uga gauges', self.uga.read_snapshot,
+                              self.snapshot_queue, update_period),
+            AcquisitionWorker('uga rga', self.acquire_uga_rga_scans),
+            AcquisitionWorker('rga', self.acquire_rga_scan),
+        ]
+        for worker in self.workers:
+            worker.start()
+
+        try:
+            info_updated_time = 0.0
+            while self.is_running():
+                for worker in self.workers:
+                    if worker.error is not None:
+                        raise worker.error
+
+                current_time = time.time()
+                if current_time - info_updated_time >= update_period:
+                    self.display_device_info(device_name=self.instrument_name_value, update=True)
+                    info_updated_time = current_time
+                self.display_composition()
+
+                try:
+                    snapshots = [self.snapshot_queue.get(timeout=0.5)]
+                except queue.Empty:
+                    continue
+                while not self.snapshot_queue.empty():
+                    snapshots.append(self.snapshot_queue.get_nowait())
+
+                with self.data_lock:
+                    for i, snapshot in enumerate(snapshots):
+                        last = i == len(snapshots) - 1
+                        self.buffer.append(snapshot)
+                        self.pressure_plot.add_data(update_figure=last)
+                        self.temperature_plot.add_data(update_figure=last)
+        finally:
+            for worker in self.workers:
+                worker.stop()
+            for worker in self.workers:
+                worker.join()
 
     def cleanup(self):
+        if self.analyzer is not None:
+            self.analyzer.close(wait=False)
         self.analog_scan_plot.cleanup()
         self.histogram_scan_plot.cleanup()
         self.rga_analog_scan_plot.cleanup()
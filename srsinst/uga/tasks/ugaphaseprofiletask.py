@@ -0,0 +1,111 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import os
+import time
+from srsgui import Task
+from srsgui.task.inputs import InstrumentInput, ListInput, IntegerInput, StringInput
+
+from srsinst.uga import get_uga, Keys
+from srsinst.uga.instruments.uga100.watcher import ModeItem
+from srsinst.uga.data.profiler import PhaseProfiler
+
+
+class UGAPhaseProfileTask(Task):
+    """
+    Change the mode of the UGA and time every phase of the transition,
+    such as the sub-states of the turbo pump during pump-down,
+    with pressures and turbo pump speed at the end of each phase.
+
+    The phases are appended to the history file, to compare
+    units and runs over time. System bake runs until the UGA is Ready after baking.
+    """
+    InstrumentName = 'uga to profile'
+    ModeName = 'mode to profile'
+    Timeout = 'timeout'
+    HistoryFile = 'history file'
+
+    # {mode control: (label, mode to wait for)}
+    ModeTargets = {
+        Keys.Start: ('start', Keys.Ready),
+        Keys.Stop: ('stop', Keys.Off),
+        Keys.Sleep: ('sleep', Keys.Idle),
+        Keys.SystemBakeOn: ('bake', Keys.Ready),
+    }
+
+    input_parameters = {
+        InstrumentName: InstrumentInput(),
+        ModeName: ListInput(list(ModeTargets)),
+        Timeout: IntegerInput(30, ' min', 1, 3000, 1),
+        HistoryFile: StringInput('~/uga-phase-history.csv'),
+    }
+
+    def setup(self):
+        self.logger = self.get_logger(__name__)
+        self.params = self.get_all_input_parameters()
+        self.uga = get_uga(self, self.params[self.InstrumentName])
+        self.profiler = PhaseProfiler(self.uga)
+
+    def start_mode_change(self):
+        mode = self.params[self.ModeName]
+        if mode == Keys.Start:
+            self.uga.mode.start()
+        elif mode == Keys.Stop:
+            self.uga.mode.stop()
+        elif mode == Keys.Sleep:
+            self.uga.mode.sleep()
+        elif mode == Keys.SystemBakeOn:
+            self.uga.mode.bake = True
+
+    def display_sample(self, sample):
+        self.display_result('Mode: {}'.format(sample.get_state(ModeItem)), True)
+        self.display_result('Turbo pump: {}, {} Hz, {:.1f} mA'.format(
+            sample.get_state('Turbo Pump'), sample.turbo_speed, sample.turbo_current))
+        self.display_result('Pirani: {:.2e} Torr, IG: {:.2e} Torr'.format(
+            sample.pirani_pressure, sample.ig_pressure))
+
+    def test(self):
+        label, target_mode = self.ModeTargets[self.params[self.ModeName]]
+        self.profiler.start(label)
+        self.start_mode_change()
+
+        deadline = time.monotonic() + self.params[self.Timeout] * 60
+        transition_count = 0
+        while self.is_running():
+            time.sleep(0.5)
+            if self.profiler.error is not None:
+                raise self.profiler.error
+            for t in self.profiler.get_transitions(transition_count):
+                self.logger.info('{}: {} -> {}'.format(t.item, t.old, t.new))
+                transition_count += 1
+            self.display_sample(self.profiler.get_latest())
+            if self.profiler.is_done(target_mode):
+                break
+            if time.monotonic() > deadline:
+                self.logger.warning('{} not reached in {} min'
+                                    .format(target_mode, self.params[self.Timeout]))
+                break
+        self.profiler.stop()
+
+        report = self.profiler.get_report()
+        self.display_result(report.get_text(), True)
+        self.create_table('Phases', 'start (s)', 'item', 'state', 'duration (s)',
+                          'Pirani (Torr)', 'IG (Torr)', 'turbo pump (Hz)')
+        for row in report.get_history_rows():
+            self.add_data_to_table('Phases', row['start'], row['item'], row['state'],
+                                   row['duration'], row['pirani_pressure'],
+                                   row['ig_pressure'], row['turbo_speed'])
+
+        time_to_target = report.get_time_to(ModeItem, target_mode)
+        if time_to_target is not None:
+            self.logger.info('{} reached in {:.1f} s'.format(target_mode, time_to_target))
+
+        history_file = os.path.expanduser(self.params[self.HistoryFile])
+        if history_file:
+            report.append_to_history(history_file)
+            self.logger.info('Phases appended to {}'.format(history_file))
+
+    def cleanup(self):
+        self.profiler.stop()
@@ -3,13 +3,17 @@
 ##! Subject to the MIT License
 ##! 
 
+import os
 import time
 import numpy as np
 from srsgui import Task
-from srsgui import InstrumentInput, IntegerInput
-from srsinst.rga.plots.timeplot import TimePlot
+from srsgui import InstrumentInput, IntegerInput, BoolInput
 
 from srsinst.uga import get_uga
+from srsinst.uga.instruments.uga100.components import Status
+from srsinst.uga.data.ringbuffer import SnapshotBuffer
+from srsinst.uga.data.datalog import DataLogger
+from srsinst.uga.plots.buffertimeplot import BufferedTimePlot
 
 
 class UGAStateMonitorTask(Task):
@@ -17,9 +21,13 @@ class UGAStateMonitorTask(Task):
     """
     InstrumentName = 'uga to monitor'
     UpdatePeriod = 'update period'
+    BufferSize = 'buffer size'
+    LogToFile = 'log to file'
     input_parameters = {
         InstrumentName: InstrumentInput(),
-        UpdatePeriod: IntegerInput(2, ' s', 1, 60, 1)
+        UpdatePeriod: IntegerInput(2, ' s', 1, 60, 1),
+        BufferSize: IntegerInput(500000, ' points', 1000, 10000000, 1000),
+        LogToFile: BoolInput(),
     }
 
     def setup(self):
@@ -29,13 +37,39 @@ class UGAStateMonitorTask(Task):
 
         self.ax = self.figure.subplots(nrows=1, ncols=2, sharex=True)
 
-        self.pressure_plot = TimePlot(self, self.ax[0], 'Pressure',
-            ['Ion Gauge', 'Pirani Gauge', 'CM Gauge'])
+        self.buffer = SnapshotBuffer(self.params[self.BufferSize])
+
+        self.pressure_plot = BufferedTimePlot(self, self.ax[0], 'Pressure', self.buffer,
+            {'Ion Gauge': 'ig_pressure', 'Pirani Gauge': 'pirani_pressure',
+             'CM Gauge': 'cm_pressure'})
         self.pressure_plot.ax.set_yscale('log')
 
-        self.temperature_plot = TimePlot(self, self.ax[1], 'Temperature',
-            ['Chamber', 'Elbow', 'Sample Inlet',
-             'Capillary', 'Turbo Pump'])
+        self.temperature_plot = BufferedTimePlot(self, self.ax[1], 'Temperature', self.buffer,
+            {'Chamber': 'chamber', 'Elbow': 'elbow', 'Sample Inlet': 'sample_inlet',
+             'Capillary': 'capillary', 'Turbo Pump': 'turbo_pump'})
+
+        self.data_logger = None
+        if self.params[self.LogToFile]:
+            self.data_logger = DataLogger(self.get_log_file_path())
+            self.logger.info('Logging to {}'.format(self.data_logger.path))
+
+    def get_log_file_path(self):
+        """Log file in the session data directory, or the current directory without a session"""
+        directory = '.'
+        if self.session_handler is not None and self.session_handler.data_dir:
+            directory = str(self.session_handler.data_dir)
+        file_name = '{}-{}.ugalog'.format(self.params[self.InstrumentName],
+                                         time.strftime('%Y%m%d-%H%M%S'))
+        return os.path.join(directory, file_name)
+
+    def read_error_number(self, snapshot):
+        """Drain the error queue if the error bit is set, and return the first error number"""
+        if not snapshot.states & Status.ErrorMask:
+            return 0
+        errors = self.uga.status.drain_errors()
+        for error in errors:
+            self.logger.error(error.message)
+        return errors[0].code if errors else 0
 
     def test(self):
         while True:
@@ -44,14 +78,16 @@ class UGAStateMonitorTask(Task):
 
             self.display_device_info(device_name=self.params[self.InstrumentName], update=True)
 
-            self.pressure_plot.add_data([self.uga.ig.get_pressure(), self.uga.rp.get_pressure(),
-                         self.uga.bp.get_pressure()], True)
-
-            self.temperature_plot.add_data([self.uga.temperature.chamber, self.uga.temperature.elbow,
-                         self.uga.temperature.sample_inlet, self.uga.temperature.capillary,
-                         self.uga.temperature.turbo_pump], True)
+            snapshot = self.uga.read_snapshot()
+            self.buffer.append(snapshot)
+            if self.data_logger is not None:
+                self.data_logger.log(snapshot, self.read_error_number(snapshot))
+            self.pressure_plot.add_data(update_figure=True)
+            self.temperature_plot.add_data(update_figure=True)
 
             time.sleep(self.params[self.UpdatePeriod])
 
     def cleanup(self):
-        pass
+        if self.data_logger is not None:
+            self.data_logger.close()
+            self.data_logger = None
@@ -0,0 +1,20 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import pytest
+
+from srsinst.uga.instruments.uga100.simulator import SimulatedUGA, create_simulated_uga
+
+
+@pytest.fixture
+def simulator():
+    return SimulatedUGA(transition_time=0.02)
+
+
+@pytest.fixture
+def uga(simulator):
+    uga = create_simulated_uga(simulator)
+    yield uga
+    uga.disconnect()
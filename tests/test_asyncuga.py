@@ -0,0 +1,90 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import asyncio
+
+import pytest
+from srsgui.inst.exceptions import InstCommunicationError, InstLoginFailureError
+
+from srsinst.uga import Keys
+from srsinst.uga.instruments.uga100.asyncuga import AsyncUGA100
+from srsinst.uga.instruments.uga100.components import Mode
+from srsinst.uga.instruments.uga100.records import Snapshot
+from srsinst.uga.instruments.uga100.simulator import SimulatedUGA, SimulatedUGAServer
+
+
+@pytest.fixture
+def server():
+    server = SimulatedUGAServer(SimulatedUGA(transition_time=0.02), port=0).start()
+    yield server
+    server.stop()
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_connect(server):
+    async def connect():
+        async with AsyncUGA100('127.0.0.1', port=server.port, timeout=2.0) as uga:
+            return await uga.check_id(), uga.is_connected(), hasattr(uga, 'bp')
+    assert run(connect()) == (('SRS_UGA', '94224', '1.018'), True, True)
+
+
+def test_login_failure(server):
+    uga = AsyncUGA100('127.0.0.1', password='wrong', port=server.port, timeout=0.5)
+    with pytest.raises(InstLoginFailureError):
+        run(uga.connect())
+
+
+def test_get_set(server):
+    async def get_set():
+        async with AsyncUGA100('127.0.0.1', port=server.port, timeout=2.0) as uga:
+            mode = await uga.mode.get('state')
+            await uga.ht.set('bake_temperature', 140, 0)
+            bake_temperature = await uga.ht.get('bake_temperature', 0)
+            await uga.ig.set('state', Keys.On)
+            ig_state = await uga.ig.get('state')
+            with pytest.raises(AttributeError):
+                await uga.mode.get('unknown')
+            return mode, bake_temperature, ig_state
+    assert run(get_set()) == (Keys.Off, 140, Keys.On)
+    assert server.simulator.index_parameters['ZPTB'][0] == '140'
+
+
+def test_batch_and_snapshot(server):
+    async def batch():
+        async with AsyncUGA100('127.0.0.1', port=server.port, timeout=2.0) as uga:
+            replies = await uga.query_batch(['ZQSN?', 'ZMOD?', 'ZQFV?'])
+            snapshot = await uga.read_snapshot()
+            state = await uga.status.get_state()
+            return replies, snapshot, state
+    writes = server.simulator.write_count
+    replies, snapshot, state = run(batch())
+    assert replies == ['94224', str(Mode.ModeDict[Keys.Off]), '1.018']
+    assert isinstance(snapshot, Snapshot) and snapshot.elbow == 25
+    assert state.mode == Keys.Off
+    assert server.simulator.write_count - writes == 4  # check_id, batch, snapshot, state
+
+
+def test_timeout_disconnects(server):
+    server.simulator.command_latency = {'ZQSN': 1.0}
+
+    async def query_after_timeout():
+        uga = AsyncUGA100('127.0.0.1', port=server.port, timeout=0.5)
+        await uga.connect()
+        with pytest.raises(InstCommunicationError):
+            await uga.query_text('ZQSN?')
+        assert not uga.is_connected()
+        with pytest.raises(InstCommunicationError):
+            await uga.query_text('ZMOD?')
+
+        server.simulator.command_latency = 0.0
+        await uga.connect()
+        try:
+            return await uga.query_batch(['ZMOD?', 'ZQFV?'])
+        finally:
+            await uga.disconnect()
+    assert run(query_after_timeout()) == [str(Mode.ModeDict[Keys.Off]), '1.018']
@@ -0,0 +1,46 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import time
+
+import numpy as np
+import pytest
+
+from srsinst.uga.plots.buffertimeplot import get_utc_offset, get_utc_offsets, to_utc
+
+DstStart = 1678604400  # 2023-03-12 07:00 UTC, 2 AM EST becomes 3 AM EDT in New York
+EST = -5 * 3600
+EDT = -4 * 3600
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_utc_offset(new_york):
+    assert get_utc_offset(DstStart - 1) == EST
+    assert get_utc_offset(DstStart) == EDT
+
+
+def test_utc_offsets_across_dst(new_york):
+    timestamps = np.arange(DstStart - 7200, DstStart + 7200, 1800.0)
+    offsets = get_utc_offsets(timestamps)
+    np.testing.assert_array_equal(offsets, np.where(timestamps < DstStart, EST, EDT))
+    # Local times keep increasing with the hour skipped
+    local_times = timestamps + offsets
+    assert local_times[4] - local_times[3] == 1800 + 3600
+
+    assert get_utc_offsets(timestamps[:4]) == EST
+    assert get_utc_offsets(np.zeros(0)) == 0.0
+
+
+def test_to_utc(new_york):
+    for timestamp in (DstStart - 3600, DstStart + 3600, DstStart - 100 * 86400):
+        assert to_utc(timestamp + get_utc_offset(timestamp)) == timestamp
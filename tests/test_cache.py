@@ -0,0 +1,112 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import time
+
+from srsinst.uga.instruments.uga100.cache import CommandCache, get_command_name
+
+
+def test_get_command_name():
+    assert get_command_name('ZPTB? 1') == 'ZPTB'
+    assert get_command_name('  zqsn?') == 'ZQSN'
+    assert get_command_name('') == ''
+
+
+def test_cacheable():
+    cache = CommandCache()
+    assert cache.is_cacheable('ZQSN?')
+    assert cache.is_cacheable('ZPTB? 0')
+    assert not cache.is_cacheable('ZPTB 0, 100')  # not a query
+    assert not cache.is_cacheable('ZQAD? 3')  # measurements are not cached
+
+
+def test_get_put_with_normalized_key():
+    cache = CommandCache()
+    assert cache.get('ZPTB? 0') is None
+    cache.put('ZPTB? 0', '120')
+    assert cache.get('zptb?   0') == '120'
+    assert cache.get('ZPTB? 1') is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_expiration():
+    cache = CommandCache({'ZPTB': 0.05})
+    cache.put('ZPTB? 0', '120')
+    cache.put('ZQSN?', '94224')
+    assert cache.get('ZPTB? 0') == '120'
+    time.sleep(0.1)
+    assert cache.get('ZPTB? 0') is None
+    assert cache.get('ZQSN?') == '94224'  # never expires
+
+
+def test_set_invalidates_same_command():
+    cache = CommandCache()
+    cache.put('ZPTB? 0', '120')
+    cache.put('ZPTB? 1', '100')
+    cache.put('ZPTH? 0', '50')
+    cache.notify_sent('ZPTB 0, 130')
+    assert cache.get('ZPTB? 0') is None
+    assert cache.get('ZPTB? 1') is None
+    assert cache.get('ZPTH? 0') == '50'
+
+    cache.notify_sent('ZPTH? 0')  # a query does not invalidate
+    assert cache.get('ZPTH? 0') == '50'
+
+
+def test_put_skipped_after_invalidation():
+    cache = CommandCache()
+    generation = cache.get_generation('ZPTB? 0')
+    cache.notify_sent('ZPTB 0, 130')
+    cache.put('ZPTB? 0', '120', generation)
+    assert cache.get('ZPTB? 0') is None
+
+    generation = cache.get_generation('ZPTB? 0')
+    cache.notify_sent('ZPTH 0, 50')  # another command
+    cache.put('ZPTB? 0', '130', generation)
+    assert cache.get('ZPTB? 0') == '130'
+
+    generation = cache.get_generation('ZQSN?')
+    cache.notify_sent('ZRST')
+    cache.put('ZQSN?', '94224', generation)
+    assert cache.get('ZQSN?') is None
+
+
+def test_reset_invalidates_all():
+    cache = CommandCache()
+    cache.put('ZQSN?', '94224')
+    cache.put('ZPTB? 0', '120')
+    cache.notify_sent('ZMOD?;ZRST')
+    assert cache.get('ZQSN?') is None
+    assert cache.get('ZPTB? 0') is None
+
+
+def test_caching_interface(uga, simulator):
+    uga.enable_cache()
+    serial_number = uga.status.serial_number
+    count = simulator.command_count
+    assert uga.status.serial_number == serial_number
+    assert simulator.command_count == count
+
+    uga.comm.query_text('ZPTB? 0')
+    uga.comm.send('ZPTB 0, 130')
+    assert uga.comm.query_text('ZPTB? 0') == '130'
+
+    # A set command sent by another thread while a query is on the link
+    query_text = uga.comm.interface.query_text
+
+    def query_with_set(cmd):
+        reply = query_text(cmd)
+        uga.comm.send('ZPTB 0, 140')
+        return reply
+    uga.comm.cache.invalidate()
+    uga.comm.interface.query_text = query_with_set
+    assert uga.comm.query_text('ZPTB? 0') == '130'
+    uga.comm.interface.query_text = query_text
+    assert uga.comm.query_text('ZPTB? 0') == '140'
+
+    uga.disable_cache()
+    count = simulator.command_count
+    uga.status.serial_number
+    assert simulator.command_count == count + 1
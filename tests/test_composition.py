@@ -0,0 +1,74 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import numpy as np
+import pytest
+from scipy.optimize import nnls
+
+from srsinst.uga.analysis.composition import solve_batch, get_histogram_peaks
+
+
+def make_case(n_scans, n_masses, n_gases, noise=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = np.abs(rng.normal(size=(n_masses, n_gases))) \
+        * (rng.random((n_masses, n_gases)) < 0.3)
+    matrix[np.arange(n_gases), np.arange(n_gases)] += 0.5
+    pressures = np.abs(rng.normal(size=(n_scans, n_gases))) \
+        * (rng.random((n_scans, n_gases)) < 0.6)
+    intensities = pressures @ matrix.T + rng.normal(scale=noise, size=(n_scans, n_masses))
+    return matrix, intensities
+
+
+def solve_rows(matrix, intensities):
+    results = [nnls(matrix, row) for row in intensities]
+    return np.array([r[0] for r in results]), np.array([r[1] for r in results])
+
+
+@pytest.mark.parametrize('n_gases, noise', [(1, 0.05), (4, 0.05), (8, 0.05), (14, 0.05),
+                                            (20, 0.05), (20, 0.5), (30, 0.2)])
+def test_solve_batch_matches_nnls(n_gases, noise):
+    matrix, intensities = make_case(500, 65, n_gases, noise)
+    pressures, residuals = solve_batch(matrix, intensities)
+    expected_pressures, expected_residuals = solve_rows(matrix, intensities)
+    assert (pressures >= 0.0).all()
+    np.testing.assert_allclose(pressures, expected_pressures, rtol=0, atol=1e-10)
+    np.testing.assert_allclose(residuals, expected_residuals, rtol=1e-10, atol=1e-12)
+
+
+def test_solve_batch_with_gram():
+    matrix, intensities = make_case(50, 20, 5)
+    pressures, _ = solve_batch(matrix, intensities, matrix.T @ matrix)
+    np.testing.assert_allclose(pressures, solve_rows(matrix, intensities)[0], atol=1e-10)
+
+
+def test_solve_batch_single_row():
+    matrix, intensities = make_case(1, 20, 5, noise=1.0)
+    pressures, residuals = solve_batch(matrix, intensities[0])
+    expected, residual = nnls(matrix, intensities[0])
+    assert pressures.shape == (1, 5)
+    np.testing.assert_allclose(pressures[0], expected, atol=1e-10)
+    assert residuals[0] == pytest.approx(residual)
+
+
+def test_solve_batch_zero_and_empty():
+    matrix, _ = make_case(1, 20, 5)
+    pressures, residuals = solve_batch(matrix, np.zeros((3, 20)))
+    assert not pressures.any() and not residuals.any()
+    pressures, residuals = solve_batch(matrix, np.zeros((0, 20)))
+    assert pressures.shape == (0, 5) and residuals.shape == (0,)
+
+
+def test_solve_batch_dependent_spectra():
+    matrix, intensities = make_case(10, 20, 4, noise=1.0)
+    matrix = np.hstack([matrix, matrix[:, :1]])  # the same spectrum twice
+    _, residuals = solve_batch(matrix, intensities)
+    np.testing.assert_allclose(residuals, solve_rows(matrix, intensities)[1], rtol=1e-9)
+
+
+def test_histogram_peaks():
+    x = np.arange(1.0, 11.0)
+    y = np.vstack([x * 10, x * 20])
+    peaks = get_histogram_peaks(x, y, np.arange(8, 14))
+    np.testing.assert_array_equal(peaks, [[80, 90, 100, 0, 0, 0], [160, 180, 200, 0, 0, 0]])
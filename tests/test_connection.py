@@ -0,0 +1,57 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import threading
+
+import pytest
+from srsgui.inst.exceptions import InstException, InstCommunicationError
+
+from srsinst.uga import UGA100
+from srsinst.uga.instruments.uga100.simulator import SimulatedUGA, SimulatedUGAServer
+
+
+@pytest.fixture
+def server():
+    server = SimulatedUGAServer(SimulatedUGA(transition_time=0.02), port=0).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def tcp_uga(server):
+    uga = UGA100('tcpip', '127.0.0.1', 'srsuga', 'srsuga', server.port)
+    yield uga
+    uga.disconnect()
+
+
+def test_reconnect_after_dropped_connection(tcp_uga, server):
+    assert tcp_uga.status.serial_number == '94224'
+    server.drop_connections()
+    assert tcp_uga.status.serial_number == '94224'
+    assert tcp_uga.comm.get_innermost().reconnect_count == 1
+
+
+def test_disconnect_during_query(tcp_uga, server):
+    comm = tcp_uga.comm.get_innermost()
+    server.simulator.command_latency = {'ZQSN': 0.3}
+    errors = []
+
+    def query():
+        try:
+            tcp_uga.status.serial_number
+        except InstException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=query)
+    thread.start()
+    threading.Timer(0.1, tcp_uga.disconnect).start()
+    thread.join()
+
+    assert len(errors) == 1  # the query in progress fails
+
+    assert comm._login_args is None
+    assert comm._keepalive_thread is None
+    with pytest.raises(InstCommunicationError):
+        comm.query_text('ZMOD?')
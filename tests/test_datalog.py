@@ -0,0 +1,93 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import numpy as np
+import pytest
+
+from srsinst.uga.instruments.uga100.records import Snapshot
+from srsinst.uga.data.datalog import DataLogger, DataLogWriter, DataLogReader, \
+    RecordDtype, get_index_path
+
+
+def make_snapshot(timestamp):
+    return Snapshot(float(timestamp), 1e-7 * (timestamp + 1), 1e-3, 0.5,
+                    30, 80, 80, 100, 120, 0x01)
+
+
+def make_records(timestamps):
+    records = np.zeros(len(timestamps), RecordDtype)
+    records['timestamp'] = timestamps
+    return records
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / 'test.ugalog')
+
+
+def write_log(path, timestamps, chunk_size=4):
+    writer = DataLogWriter(path, chunk_size)
+    writer.write(make_records(timestamps))
+    writer.close()
+
+
+def test_round_trip(log_path):
+    with DataLogger(log_path, chunk_size=4, flush_period=0.1) as data_logger:
+        for t in range(10):
+            data_logger.log(make_snapshot(t), error=t % 3)
+    reader = DataLogReader(log_path)
+    assert len(reader) == 10
+    records = reader.get_range()
+    for t, record in enumerate(records):
+        snapshot = make_snapshot(t)
+        for name in Snapshot._fields:
+            assert record[name] == pytest.approx(getattr(snapshot, name))
+        assert record['error'] == t % 3
+
+
+@pytest.mark.parametrize('start_time, end_time, expected', [
+    (0, 9, range(0, 10)),  # end time on the last record in the partial chunk
+    (None, 9.5, range(0, 10)),  # end time past the last record
+    (None, 7, range(0, 8)),  # end time on the last indexed record
+    (7.5, 8.5, range(8, 9)),  # only in the partial chunk
+    (2.5, 5.5, range(3, 6)),  # across indexed chunks
+    (3, None, range(3, 10)),
+    (-5, -1, range(0)),
+    (10, 20, range(0)),
+])
+def test_range_with_partial_last_chunk(log_path, start_time, end_time, expected):
+    write_log(log_path, np.arange(10.0), chunk_size=4)
+    reader = DataLogReader(log_path)
+    assert len(reader.index) == 2
+    timestamps = reader.get_range(start_time, end_time)['timestamp']
+    assert list(timestamps) == [float(t) for t in expected]
+
+
+def test_range_without_index(log_path):
+    write_log(log_path, np.arange(3.0), chunk_size=4)
+    reader = DataLogReader(log_path)
+    assert len(reader.index) == 0
+    assert list(reader.get_range(1, 5)['timestamp']) == [1.0, 2.0]
+
+
+def test_append_rebuilds_index(log_path):
+    write_log(log_path, np.arange(6.0), chunk_size=4)
+    with open(get_index_path(log_path), 'wb'):
+        pass  # lose the index
+    write_log(log_path, np.arange(6.0, 10.0))
+    reader = DataLogReader(log_path)
+    assert list(reader.index['first']) == [0.0, 4.0]
+    assert list(reader.index['last']) == [3.0, 7.0]
+    assert list(reader.get_range(5, 9)['timestamp']) == [5.0, 6.0, 7.0, 8.0, 9.0]
+
+
+def test_refresh(log_path):
+    write_log(log_path, np.arange(5.0), chunk_size=4)
+    reader = DataLogReader(log_path)
+    write_log(log_path, np.arange(5.0, 9.0))
+    assert len(reader) == 5
+    reader.refresh()
+    assert len(reader) == 9
+    assert list(reader.get_range(8, None)['timestamp']) == [8.0]
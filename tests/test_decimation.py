@@ -0,0 +1,41 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import numpy as np
+import pytest
+
+from srsinst.uga.plots.decimation import get_minmax_indices
+
+
+def test_short_line_kept():
+    y = np.arange(10.0)
+    np.testing.assert_array_equal(get_minmax_indices(y, 5), np.arange(10))
+    assert len(get_minmax_indices(np.zeros(0), 5)) == 0
+
+
+@pytest.mark.parametrize('n, bins', [(1000, 10), (1001, 10), (999, 7), (100000, 640)])
+def test_min_max_kept_per_bin(n, bins):
+    rng = np.random.default_rng(n)
+    y = rng.normal(size=n)
+    indices = get_minmax_indices(y, bins)
+    assert np.all(np.diff(indices) > 0)
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert len(indices) <= 2 * bins + 4
+
+    # Every bin keeps its extremes, so the envelope is the same
+    bin_size = -(-n // bins)
+    for start in range(0, n, bin_size):
+        block = slice(start, min(start + bin_size, n))
+        kept = indices[(indices >= block.start) & (indices < block.stop)]
+        assert y[kept].min() == y[block].min()
+        assert y[kept].max() == y[block].max()
+
+
+def test_spike_kept():
+    y = np.zeros(100000)
+    y[12345] = 1.0
+    y[54321] = -1.0
+    indices = get_minmax_indices(y, 100)
+    assert 12345 in indices and 54321 in indices
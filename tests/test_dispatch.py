@@ -0,0 +1,57 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import pytest
+
+from srsinst.uga.instruments.uga100.dispatch import CommandKind
+from srsinst.uga.instruments.uga100.simulator import SimulatedUGA, create_simulated_uga, On
+
+
+@pytest.fixture
+def rga_uga():
+    simulator = SimulatedUGA()
+    simulator.parameters['ZCRG'] = str(On)
+    uga = create_simulated_uga(simulator)
+    yield uga
+    uga.disconnect()
+
+
+@pytest.mark.parametrize('cmd, kind, attribute', [
+    ('ZQAD? 1', CommandKind.Query, 'pressure.values'),
+    ('ZPTB 1, 100', CommandKind.Set, 'ht.bake_temperature'),
+    ('ZPTB? 1', CommandKind.Query, 'ht.bake_temperature'),
+    ('ZPTH? 1', CommandKind.Query, 'ht.sample_temperature'),
+    ('ZEDS? 1', CommandKind.Query, 'status.error_message'),
+    ('ZMOD?', CommandKind.Query, 'mode.state'),
+    ('MR 28', CommandKind.SingleMass, None),
+    ('ZZZZ?', CommandKind.Query, None),
+])
+def test_classify(uga, cmd, kind, attribute):
+    spec = uga.get_dispatcher().classify(cmd)
+    assert spec.kind == kind
+    assert spec.attribute == attribute
+
+
+@pytest.mark.parametrize('cmd', ['ZEDS 1', 'ZQID'])
+def test_invalid_form_not_sent(uga, simulator, cmd):
+    count = simulator.command_count
+    reply = uga.get_dispatcher().execute(cmd)
+    assert reply.kind == CommandKind.Invalid
+    assert not reply.ok
+    assert simulator.command_count == count
+
+
+def test_execute_batch_in_one_write(uga, simulator):
+    count = simulator.write_count
+    replies = uga.get_dispatcher().execute_batch(['ZPTB 1, 100', 'ZPTB? 1', 'ZQTA?'])
+    assert simulator.write_count == count + 1
+    assert [r.reply for r in replies] == ['', '100', simulator.process('ZQTA?')]
+    assert all(r.ok for r in replies)
+
+
+def test_mg_set_does_not_shift_replies(rga_uga):
+    simulator = rga_uga.comm.simulator
+    replies = rga_uga.get_dispatcher().execute_batch(['MG 10', 'ZMOD?', 'ZQID?'])
+    assert [r.reply for r in replies] == ['', simulator.process('ZMOD?'), simulator.process('ZQID?')]
@@ -0,0 +1,93 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+from srsgui.inst.exceptions import InstCommunicationError
+
+from srsinst.uga import Keys
+from srsinst.uga.instruments.uga100.components import Status
+
+InvalidCommand = 9
+NotAQuery = 12
+
+
+def make_errors(uga, count):
+    """Send count invalid commands, each adding an error to the error queue"""
+    for _ in range(count):
+        uga.comm.send('ZXYZ')
+
+
+def count_commands(simulator, name):
+    """Wrap simulator.process() to count commands starting with name"""
+    counts = {name: 0}
+    process = simulator.process
+
+    def counting_process(line):
+        if line.upper().startswith(name):
+            counts[name] += 1
+        return process(line)
+    simulator.process = counting_process
+    return counts
+
+
+def test_get_state_drains_errors(uga):
+    make_errors(uga, 6)
+    uga.comm.send('ZERR')  # not a query
+    state = uga.status.get_state()
+    assert state.error_codes == (InvalidCommand,) * 6 + (NotAQuery,)
+    assert state.errors[0] == 'Invalid Command (9)'
+    assert state.errors[-1] == 'Not a query (12)'
+    assert uga.status.get_state().error_codes == ()
+
+
+def test_drain_errors_history(uga):
+    make_errors(uga, 3)
+    records = uga.status.drain_errors()
+    assert [r.code for r in records] == [InvalidCommand] * 3
+    assert uga.status.drain_errors() == ()
+    assert len(uga.status.error_history) == 3
+    assert uga.status.error_history.get_latest().code == InvalidCommand
+
+
+def test_read_error_codes_stops_at_queue_size(uga, simulator):
+    for _ in range(Status.MaxErrorCode + 10):
+        simulator.errors.append(InvalidCommand)
+    codes = uga.status.read_error_codes()
+    assert len(codes) >= Status.MaxErrorCode + 1
+    assert len(codes) < Status.MaxErrorCode + 1 + Status.ErrorReadSize
+
+
+def test_error_messages_read_per_code(uga, simulator):
+    zeds = count_commands(simulator, 'ZEDS')
+    make_errors(uga, 3)
+    uga.status.drain_errors()
+    assert zeds['ZEDS'] == 1  # one message for three errors with the same code
+
+    make_errors(uga, 1)
+    uga.comm.send('ZERR')
+    records = uga.status.drain_errors()
+    assert [r.message for r in records] == ['Invalid Command (9)', 'Not a query (12)']
+    assert zeds['ZEDS'] == 2  # only the new code is read
+
+
+def test_error_messages_kept_on_failure(uga, simulator, monkeypatch):
+    status = uga.status
+    status.get_error_messages([InvalidCommand])
+    query_batch = uga.query_batch
+
+    def failing_query_batch(commands):
+        if commands[0].startswith('ZEDS'):
+            raise InstCommunicationError('Simulated failure')
+        return query_batch(commands)
+    monkeypatch.setattr(uga, 'query_batch', failing_query_batch)
+
+    messages = status.get_error_messages([InvalidCommand, NotAQuery, 200])
+    assert messages[InvalidCommand] == 'Invalid Command (9)'  # cached before the failure
+    assert messages[NotAQuery] == 'Not a query (12)'  # from the local table
+    assert messages[200] == 'Unknown error (200)'
+
+    monkeypatch.setattr(uga, 'query_batch', query_batch)
+    zeds = count_commands(simulator, 'ZEDS')
+    status.get_error_messages([InvalidCommand, NotAQuery])
+    assert zeds['ZEDS'] == 1  # read again only for the code that failed
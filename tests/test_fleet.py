@@ -0,0 +1,72 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import time
+
+import pytest
+
+from srsinst.uga import Keys
+from srsinst.uga.instruments.fleet import FleetPoller, FleetStore
+from srsinst.uga.instruments.uga100.simulator import SimulatedUGA, create_simulated_uga
+
+UnitCount = 3
+
+
+@pytest.fixture
+def fleet():
+    simulators = {'uga{}'.format(i): SimulatedUGA(serial_number=str(94220 + i))
+                  for i in range(UnitCount)}
+    ugas = {name: create_simulated_uga(simulator) for name, simulator in simulators.items()}
+    yield simulators, ugas
+    for uga in ugas.values():
+        uga.disconnect()
+
+
+def wait_for_polls(store, names, count, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not all(store.get(name) is not None and store.get(name).poll_count >= count
+                  for name in names):
+        assert time.monotonic() < deadline, 'Polls did not complete'
+        store.wait_for_update(0.05)
+
+
+def test_poll_all_units(fleet):
+    simulators, ugas = fleet
+    store = FleetStore()
+    writes = {name: simulator.write_count for name, simulator in simulators.items()}
+    with FleetPoller(ugas, interval=0.05, store=store):
+        wait_for_polls(store, ugas, 2)
+    for name, simulator in simulators.items():
+        record = store.get(name)
+        assert record.error is None
+        assert record.state.mode == Keys.Off
+        assert record.snapshot.elbow == 25
+        # One write per poll
+        assert simulator.write_count - writes[name] == record.poll_count
+
+
+def test_poll_drains_errors(fleet):
+    simulators, ugas = fleet
+    store = FleetStore()
+    simulators['uga1']._push_error(9)
+    with FleetPoller(ugas, interval=0.05, store=store):
+        wait_for_polls(store, ugas, 1)
+    assert store.get('uga1').state.error_codes[0] == 9
+    assert store.get('uga0').state.error_codes == ()
+
+
+def test_poll_error_keeps_last_readings(fleet):
+    simulators, ugas = fleet
+    store = FleetStore()
+    poller = FleetPoller(ugas, interval=0.05, store=store)
+    with poller:
+        wait_for_polls(store, ugas, 1)
+        ugas['uga2'].comm.get_innermost().disconnect()
+        count = store.get('uga2').poll_count
+        wait_for_polls(store, ['uga2'], count + 1)
+    record = store.get('uga2')
+    assert record.error is not None
+    assert record.snapshot is not None and record.state.mode == Keys.Off
+    assert not poller.is_running()
@@ -0,0 +1,77 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from srsinst.uga.analysis import gaslibrary
+from srsinst.uga.analysis.gaslibrary import GasLibrary, read_gas_library, build_coeff_matrix
+
+
+@pytest.fixture
+def library_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(GasLibrary, '_loaded', {})
+    file_name = str(tmp_path / 'gaslib.dat')
+    shutil.copy(gaslibrary.DefaultGasLibraryFile, file_name)
+    return file_name
+
+
+def test_select_matches_build_coeff_matrix():
+    gas_library = read_gas_library()
+    library = GasLibrary.from_dict(gas_library)
+    names = list(gas_library)[:5]
+    for start_mass, stop_mass in [(1, 50), (10, 100), (0, 300)]:
+        np.testing.assert_array_equal(library.select(names, start_mass, stop_mass),
+                                      build_coeff_matrix(gas_library, start_mass, stop_mass, names))
+
+
+def test_load_from_memory(library_file, tmp_path):
+    library = GasLibrary.load(library_file, str(tmp_path / 'cache'))
+    assert GasLibrary.load(library_file, str(tmp_path / 'cache')) is library
+
+
+def test_load_from_cache_file(library_file, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    library = GasLibrary.load(library_file, cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    def fail(*args):
+        raise AssertionError('parsed the library file')
+
+    monkeypatch.setattr(GasLibrary, '_loaded', {})
+    monkeypatch.setattr(gaslibrary, 'read_gas_library', fail)
+    cached = GasLibrary.load(library_file, cache_dir)
+    assert cached is not library
+    assert cached.names == library.names
+    np.testing.assert_array_equal(cached.coefficients, library.coefficients)
+
+
+def test_corrupted_cache_file_rebuilt(library_file, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    library = GasLibrary.load(library_file, cache_dir)
+    cache_file = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+    with open(cache_file, 'wb') as f:
+        f.write(b'not a numpy file')
+
+    monkeypatch.setattr(GasLibrary, '_loaded', {})
+    rebuilt = GasLibrary.load(library_file, cache_dir)
+    np.testing.assert_array_equal(rebuilt.coefficients, library.coefficients)
+    np.load(cache_file, allow_pickle=False)  # written again
+
+
+def test_edited_library_not_loaded_from_cache(library_file, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    library = GasLibrary.load(library_file, cache_dir)
+    with open(library_file, 'at') as f:
+        f.write('\n"Testgas" 1.0 1.0\n1 2\n100 50\n')
+
+    edited = GasLibrary.load(library_file, cache_dir)
+    assert edited.file_hash != library.file_hash
+    assert 'testgas' in edited
+    assert 'testgas' not in library
+    assert len(os.listdir(cache_dir)) == 2
@@ -0,0 +1,53 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+from srsinst.uga.instruments.uga100.simulator import SimulatedUGA, create_simulated_uga, On
+from srsinst.uga.instruments.uga100.uga import UGA100
+
+
+def test_check_id(uga):
+    assert uga.check_id() == ('SRS_UGA', '94224', '1.018')
+    assert uga.identity_profile.serial_number == '94224'
+    assert uga.identity_profile.rga_id_string is None
+
+
+def test_check_id_once_per_connection(uga, simulator):
+    count = simulator.command_count
+    assert uga.check_id() == ('SRS_UGA', '94224', '1.018')
+    assert simulator.command_count == count
+
+    uga.check_id(force=True)
+    assert simulator.command_count == count + 2
+
+
+def test_check_id_again_after_reconnect(uga, simulator):
+    uga._on_reconnect()
+    count = simulator.command_count
+    uga.check_id()
+    assert simulator.command_count == count + 2
+
+
+def test_rga_id_reused_from_profile():
+    UGA100.IdentityProfiles.clear()
+    simulator = SimulatedUGA(serial_number='94301')
+    simulator.parameters['ZCRG'] = str(On)
+    uga = create_simulated_uga(simulator)
+    assert uga.identity_profile.rga_id_string
+    uga.disconnect()
+
+    count = simulator.command_count
+    uga = create_simulated_uga(simulator)
+    # Only ZQID? and ZCRG?, without ID? to the RGA
+    assert simulator.command_count == count + 2
+    assert uga.rga._id_string == UGA100.IdentityProfiles['94301'].rga_id_string
+    uga.disconnect()
+
+
+def test_components_configured_by_model():
+    uga = create_simulated_uga(SimulatedUGA(model_name='SRS_UGA_HT', serial_number='94302'))
+    assert hasattr(uga, 'bp')
+    assert not hasattr(uga, 'sv')
+    assert not hasattr(uga, 'mi')
+    uga.disconnect()
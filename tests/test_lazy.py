@@ -0,0 +1,59 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import sys
+import json
+import subprocess
+
+import pytest
+
+import srsinst.uga
+
+
+def run_python(code):
+    """Run code in a fresh interpreter and return the JSON it prints"""
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            check=True)
+    return json.loads(result.stdout)
+
+
+def test_import_loads_no_driver():
+    loaded = run_python(
+        'import sys, json\n'
+        'from srsinst.uga import Keys\n'
+        'print(json.dumps(sorted(m for m in sys.modules if m.startswith(("srsgui", "numpy"))'
+        ' or m == "srsinst.uga.instruments.uga100.uga")))\n')
+    assert loaded == []
+
+
+def test_lazy_names():
+    assert 'block_gui_modules' not in srsinst.uga.__all__
+    for name in srsinst.uga.__all__:
+        assert name in dir(srsinst.uga)
+        assert getattr(srsinst.uga, name) is not None
+    from srsinst.uga.instruments.uga100.uga import UGA100
+    assert srsinst.uga.UGA100 is UGA100
+
+
+def test_unknown_name():
+    with pytest.raises(AttributeError):
+        srsinst.uga.block_gui_modules
+
+
+def test_block_gui_modules():
+    imported = run_python(
+        'import json\n'
+        'from srsinst.uga.gui import block_gui_modules, GuiModules\n'
+        'block_gui_modules()\n'
+        'from srsinst.uga import UGA100\n'
+        'imported = []\n'
+        'for name in GuiModules:\n'
+        '    try:\n'
+        '        __import__(name)\n'
+        '        imported.append(name)\n'
+        '    except ImportError:\n'
+        '        pass\n'
+        'print(json.dumps(imported))\n')
+    assert imported == []
@@ -0,0 +1,68 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import numpy as np
+import pytest
+
+from srsinst.uga.data.leaktest import detect_leak_response, LeakSignalBuffer
+
+Baseline = 100.0
+Amplitude = 5000.0
+Onset = 2.0
+RiseTime = 1.0
+
+
+def make_signal(noise=0.0, seed=0):
+    """Linear rise from Onset for RiseTime / 0.8 s, then flat, sampled at 100 Hz"""
+    t = np.arange(0.0, 6.0, 0.01)
+    ramp = np.clip((t - Onset) / (RiseTime / 0.8), 0.0, 1.0)
+    y = Baseline + Amplitude * ramp
+    if noise:
+        y += np.random.default_rng(seed).normal(0.0, noise, len(t))
+    return t, y
+
+
+def test_step_response():
+    t, y = make_signal()
+    response = detect_leak_response(t, y, threshold=1000)
+    assert response.baseline == pytest.approx(Baseline)
+    assert response.peak == pytest.approx(Baseline + Amplitude)
+    assert response.amplitude == pytest.approx(Amplitude)
+    # 10 % of a linear ramp of RiseTime / 0.8 s is reached after RiseTime / 8 s
+    assert response.onset_time == pytest.approx(Onset + RiseTime / 8, abs=0.01)
+    assert response.rise_time == pytest.approx(RiseTime, abs=0.02)
+    assert response.peak_time >= Onset + RiseTime / 0.8 - 0.01
+
+
+def test_noisy_response_with_smoothing():
+    t, y = make_signal(noise=50.0)
+    response = detect_leak_response(t, y, threshold=1000, smoothing=5)
+    assert response.rise_time == pytest.approx(RiseTime, abs=0.1)
+    assert response.amplitude == pytest.approx(Amplitude, rel=0.1)
+
+
+def test_no_response_below_threshold():
+    t, y = make_signal()
+    assert detect_leak_response(t, y, threshold=2 * Amplitude) is None
+    flat = np.full(len(t), Baseline)
+    assert detect_leak_response(t, flat, threshold=1) is None
+    assert detect_leak_response(t[:1], y[:1], threshold=1) is None
+
+
+def test_given_baseline():
+    t, y = make_signal()
+    response = detect_leak_response(t, y, threshold=1000, baseline=0.0)
+    assert response.baseline == 0.0
+    assert response.amplitude == pytest.approx(Baseline + Amplitude)
+
+
+def test_leak_signal_buffer():
+    buffer = LeakSignalBuffer(3)
+    assert buffer.get_latest() is None
+    for i in range(5):
+        buffer.append(10.0 + i, 100.0 * i)
+    np.testing.assert_array_equal(buffer.get_intensities(), [200.0, 300.0, 400.0])
+    np.testing.assert_array_equal(buffer.get_column('intensity', 1), [400.0])
+    assert buffer.get_latest() == (14.0, 400.0)
@@ -0,0 +1,76 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import io
+import json
+
+import pytest
+
+from srsinst.uga.monitor import read_instrument_lines, connect_ugas, make_reader, run, \
+                                get_parser, SnapshotWriter
+from srsinst.uga.instruments.uga100.simulator import SimulatedUGA, SimulatedUGAServer, ErrorBit
+
+
+def test_read_instrument_lines(tmp_path):
+    config = tmp_path / 'test.taskconfig'
+    config.write_text('# comment\n'
+                      'name: test\n'
+                      'inst: uga, srsinst.uga, UGA100\n'
+                      'inst: uga2, srsinst.uga, UGA100, tcpip:127.0.0.1:srsuga:srsuga:818\n'
+                      'task: Test, srsinst.uga.tasks.ugastatemonitortask, UGAStateMonitorTask\n')
+    assert read_instrument_lines(str(config)) == [
+        ('uga', 'srsinst.uga', 'UGA100', None),
+        ('uga2', 'srsinst.uga', 'UGA100', 'tcpip:127.0.0.1:srsuga:srsuga:818')]
+
+
+def test_connect_checks_id_once():
+    simulator = SimulatedUGA()
+    with SimulatedUGAServer(simulator, port=0) as server:
+        args = get_parser().parse_args(
+            ['--connect', 'uga=tcpip:127.0.0.1:srsuga:srsuga:{}'.format(server.port)])
+        ugas = connect_ugas(args)
+        try:
+            assert list(ugas) == ['uga']
+            count = simulator.command_count
+            assert ugas['uga'].check_id() == ('SRS_UGA', '94224', '1.018')
+            assert simulator.command_count == count
+        finally:
+            ugas['uga'].disconnect()
+
+
+def test_reader_drains_errors_with_error_bit(uga, simulator):
+    read = make_reader(uga)
+    assert read()[2] == []
+
+    simulator._push_error(9)
+    name, snapshot, errors = read()
+    assert snapshot.states & (1 << ErrorBit)
+    assert [e.code for e in errors] == [9]
+
+
+def test_csv_header_written_once(uga):
+    stream = io.StringIO()
+    writer = SnapshotWriter(stream, 'csv')
+    snapshot = uga.read_snapshot()
+    writer.write('uga', snapshot)
+    writer.write('uga', snapshot)
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 3
+    assert lines[0].split(',') == ['name'] + list(snapshot._fields) + ['errors']
+
+
+@pytest.mark.parametrize('output_format', ['text', 'jsonl'])
+def test_run_simulated(tmp_path, output_format):
+    output = tmp_path / 'out.txt'
+    args = get_parser().parse_args(['--simulate', '--inst', 'a', '--inst', 'b',
+                                    '--count', '2', '--period', '0.01',
+                                    '--format', output_format, '--output', str(output)])
+    assert run(args) == 0
+    lines = output.read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 4
+    if output_format == 'jsonl':
+        records = [json.loads(line) for line in lines]
+        assert sorted(r['name'] for r in records) == ['a', 'a', 'b', 'b']
+        assert all(r['errors'] == [] for r in records)
@@ -0,0 +1,80 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import threading
+
+import pytest
+from matplotlib.figure import Figure
+from srsinst.rga.plots.analogscanplot import AnalogScanPlot
+from srsinst.rga.plots.histogramscanplot import HistogramScanPlot
+
+from srsinst.uga.data.acquisition import AcquisitionWorker
+from srsinst.uga.tasks.ugamultiplottask import UGAMultiplotTask
+
+
+class CountingLock:
+    """Lock counting how many times it was taken"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.count += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.lock.release()
+
+
+@pytest.fixture
+def task(uga):
+    """UGAMultiplotTask with the scan plots of the UGA RGA, without the GUI"""
+    task = UGAMultiplotTask()
+    task.uga = uga
+    task.instrument_name_value = 'uga'
+    task.analyzer = None
+    task.data_lock = CountingLock()
+    uga.rga.add_scan_profile('analog', 1, 20, 5, 10)
+    uga.rga.add_scan_profile('histogram', 10, 25, 3, 10)
+
+    uga.rga.use_scan_profile('analog')
+    task.analog_scan_plot = AnalogScanPlot(task, Figure().add_subplot(111),
+                                           uga.rga.scan, 'Analog Scan')
+    uga.rga.use_scan_profile('histogram')
+    task.histogram_scan_plot = HistogramScanPlot(task, Figure().add_subplot(111),
+                                                 uga.rga.scan, 'Histogram Scan')
+    return task
+
+
+@pytest.mark.parametrize('plot_name', ['analog_scan_plot', 'histogram_scan_plot'])
+def test_set_scan_callbacks_keeps_plot_callbacks(task, plot_name):
+    plot = getattr(task, plot_name)
+    plot.reset()
+    scan = plot.scan
+    installed = (scan._data_available_callback, scan._scan_started_callback)
+    task.set_scan_callbacks(plot)
+    assert (scan._data_available_callback, scan._scan_started_callback) == installed
+    assert scan._scan_finished_callback is not None
+
+
+def test_scans_in_worker(task):
+    worker = AcquisitionWorker('uga rga', task.acquire_uga_rga_scans)
+    worker.start()
+    try:
+        while task.data_lock.count < 4 and worker.is_alive():
+            worker.join(0.01)
+    finally:
+        worker.stop()
+        worker.join()
+    assert worker.error is None
+    assert task.data_lock.count >= 4  # finished callbacks of both scans, twice
+
+    histogram = task.histogram_scan_plot
+    # Set by scan_started_callback of the histogram plot
+    assert histogram.last_index == 0 and histogram.data['y'] == []
+    analog = task.analog_scan_plot
+    assert len(analog.data['y']) == 19 * 10 + 1
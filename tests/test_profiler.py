@@ -0,0 +1,61 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import threading
+
+from srsinst.uga import Keys
+from srsinst.uga.data.profiler import PhaseProfiler
+from srsinst.uga.instruments.uga100.watcher import ModeItem
+
+Timeout = 5.0
+
+
+def make_profiler(uga):
+    return PhaseProfiler(uga, fast_period=0.01, slow_period=0.05, hold_time=0.2)
+
+
+def test_start_run(uga):
+    report = make_profiler(uga).run(uga.mode.start, Keys.Ready, timeout=Timeout)
+    assert report.samples[0].get_state(ModeItem) == Keys.Off
+    assert report.samples[-1].get_state(ModeItem) == Keys.Ready
+    assert report.get_time_to(ModeItem, Keys.Start) is not None
+    assert report.get_time_to(ModeItem, Keys.Ready) > report.get_time_to(ModeItem, Keys.Start)
+    modes = [p.state for p in report.get_phases(ModeItem)]
+    assert modes[0] == Keys.Off and modes[-1] == Keys.Ready
+    assert report.get_text().count('\n') >= 2
+
+
+def test_not_done_before_mode_changes(uga):
+    profiler = make_profiler(uga)
+    profiler.run(uga.mode.start, Keys.Ready, timeout=Timeout)
+    profiler.start()
+    try:
+        # Already in Ready, but the mode has not changed since start()
+        assert not profiler.is_done(Keys.Ready)
+        assert not profiler.wait_for_mode(Keys.Ready, 0.1)
+    finally:
+        profiler.stop()
+
+
+def test_bake_run(uga):
+    profiler = make_profiler(uga)
+    profiler.run(uga.mode.start, Keys.Ready, timeout=Timeout)
+
+    def bake_on():
+        uga.mode.bake = True
+
+    def bake_off():
+        uga.mode.bake = False
+
+    timer = threading.Timer(0.3, bake_off)
+    timer.start()
+    try:
+        report = profiler.run(bake_on, Keys.Ready, timeout=Timeout)
+    finally:
+        timer.cancel()
+    assert report.get_time_to(ModeItem, Keys.SystemBake) is not None
+    assert report.duration >= 0.3  # did not end while still in Ready before the bake
+    modes = [p.state for p in report.get_phases(ModeItem)]
+    assert modes[0] == Keys.Ready and Keys.SystemBake in modes and modes[-1] == Keys.Ready
@@ -0,0 +1,68 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import numpy as np
+import pytest
+
+from srsinst.uga.data.ringbuffer import SnapshotBuffer
+from srsinst.uga.instruments.uga100.records import Snapshot
+
+
+def make_snapshot(i):
+    return Snapshot(1000.0 + i, 1e-9 * i, 1e-3 * i, 0.0, 35, 25 + i, 26, 27, 28, i)
+
+
+def test_empty():
+    buffer = SnapshotBuffer(4)
+    assert len(buffer) == 0
+    assert buffer.get_latest() is None
+    assert len(buffer.get_timestamps()) == 0
+    with pytest.raises(ValueError):
+        SnapshotBuffer(0)
+
+
+def test_wraparound():
+    buffer = SnapshotBuffer(4)
+    for i in range(10):
+        buffer.append(make_snapshot(i))
+    assert len(buffer) == 4
+    assert buffer.total_count == 10
+    np.testing.assert_array_equal(buffer.get_timestamps(), [1006.0, 1007.0, 1008.0, 1009.0])
+    np.testing.assert_array_equal(buffer.get_column('elbow', 2), [33, 34])
+    np.testing.assert_allclose(buffer.get_column('ig_pressure'), [6e-9, 7e-9, 8e-9, 9e-9])
+    np.testing.assert_array_equal(buffer.get_states(100), [6, 7, 8, 9])
+    assert buffer.get_latest() == make_snapshot(9)
+    assert buffer.get_timestamps().base is not None  # a view, not a copy
+    with pytest.raises(KeyError):
+        buffer.get_column('unknown')
+
+
+def test_every_position():
+    buffer = SnapshotBuffer(3)
+    for i in range(7):
+        buffer.append(make_snapshot(i))
+        expected = [1000.0 + j for j in range(max(0, i - 2), i + 1)]
+        np.testing.assert_array_equal(buffer.get_timestamps(), expected)
+
+
+def test_time_range():
+    buffer = SnapshotBuffer(5)
+    for i in range(8):
+        buffer.append(make_snapshot(i))
+    timestamps = buffer.get_timestamps()
+    np.testing.assert_array_equal(timestamps[buffer.get_time_range(1004.0, 1006.0)],
+                                  [1004.0, 1005.0, 1006.0])
+    np.testing.assert_array_equal(timestamps[buffer.get_time_range(1005.5)], [1006.0, 1007.0])
+    assert len(timestamps[buffer.get_time_range(end_time=1000.0)]) == 0
+
+
+def test_clear():
+    buffer = SnapshotBuffer(3)
+    for i in range(5):
+        buffer.append(make_snapshot(i))
+    buffer.clear()
+    assert len(buffer) == 0 and buffer.total_count == 0
+    buffer.append(make_snapshot(7))
+    assert buffer.get_latest() == make_snapshot(7)
@@ -0,0 +1,67 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import pytest
+
+from srsinst.uga.instruments.uga100.records import ScanParameters
+
+
+def count_rga_commands(simulator):
+    """Wrap simulator.process() to record RGA scan parameter commands"""
+    commands = []
+    process = simulator.process
+
+    def recording_process(line):
+        if line.strip().upper()[:2] in simulator.rga_parameters:
+            commands.append(line.strip().upper())
+        return process(line)
+    simulator.process = recording_process
+    return commands
+
+
+def test_only_changed_parameters_sent(uga, simulator):
+    rga = uga.rga
+    assert rga.set_scan_parameters(1, 50, 4, 10) == 4
+    commands = count_rga_commands(simulator)
+    assert rga.set_scan_parameters(1, 50, 4, 10) == 0
+    assert commands == []
+
+    assert rga.set_scan_parameters(1, 50, 7, 10) == 1
+    assert commands == ['NF7']
+    assert rga.get_scan_parameters() == ScanParameters(1, 50, 7, 10)
+    assert simulator.rga_parameters == {'MI': 1, 'MF': 50, 'NF': 7, 'SA': 10}
+
+
+def test_final_mass_set_first_when_moving_up(uga, simulator):
+    rga = uga.rga
+    rga.set_scan_parameters(1, 10, 4, 10)
+    commands = count_rga_commands(simulator)
+    rga.set_scan_parameters(20, 40, 4, 10)
+    assert [c[:2] for c in commands] == ['MF', 'MI']
+    assert simulator.rga_parameters['MI'] == 20 and simulator.rga_parameters['MF'] == 40
+
+
+def test_profiles(uga, simulator):
+    rga = uga.rga
+    rga.add_scan_profile('survey', 1, 100, 4, 10)
+    rga.add_scan_profile('histogram', 1, 100, 3, 10)
+    assert rga.use_scan_profile('survey') == 4
+    assert rga.use_scan_profile('histogram') == 1
+    assert rga.use_scan_profile('histogram') == 0
+    with pytest.raises(KeyError):
+        rga.use_scan_profile('unknown')
+    rga.remove_scan_profile('survey')
+    assert list(rga.scan_profiles) == ['histogram']
+
+
+def test_invalidate_reads_again(uga, simulator):
+    rga = uga.rga
+    rga.set_scan_parameters(1, 50, 4, 10)
+    simulator.process('NF2')  # changed without the shadow copy
+    assert rga.set_scan_parameters(1, 50, 4, 10) == 0
+    rga.invalidate_scan_parameters()
+    assert rga.get_scan_parameters() == ScanParameters(1, 50, 2, 10)
+    assert rga.set_scan_parameters(1, 50, 4, 10) == 1
+    assert simulator.rga_parameters['NF'] == 4
@@ -0,0 +1,88 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import threading
+
+import pytest
+
+from srsinst.uga.instruments.uga100.serializer import CommandQueue, Priority
+from srsinst.uga.instruments.uga100.simulator import SimulatedUGA, create_simulated_uga
+
+ThreadCount = 8
+
+
+@pytest.fixture
+def slow_uga():
+    uga = create_simulated_uga(SimulatedUGA(transition_time=0.02, link_latency=0.02))
+    yield uga
+    uga.disconnect()
+
+
+def query_in_threads(uga, cmd, count=ThreadCount):
+    """Query cmd from count threads at once while the link is busy, and return the replies"""
+    replies = [None] * count
+    barrier = threading.Barrier(count + 1)
+
+    def query(i):
+        barrier.wait()
+        replies[i] = uga.comm.query_text(cmd)
+
+    threads = [threading.Thread(target=query, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    with uga.comm.get_lock():  # hold the link until all threads are waiting
+        barrier.wait()
+        queue = uga.command_queue
+        while queue.get_waiting_count() + queue.coalesced_count < count:
+            pass
+    for thread in threads:
+        thread.join()
+    return replies
+
+
+def test_identical_queries_coalesced(slow_uga):
+    simulator = slow_uga.comm.get_innermost().simulator
+    count = simulator.command_count
+    replies = query_in_threads(slow_uga, 'ZQSN?')
+    assert replies == ['94224'] * ThreadCount
+    assert slow_uga.command_queue.coalesced_count > 0
+    assert simulator.command_count - count == \
+        ThreadCount - slow_uga.command_queue.coalesced_count
+
+
+@pytest.mark.parametrize('cmd', ['ZERR?', 'ZBCT?'])
+def test_destructive_queries_not_coalesced(slow_uga, cmd):
+    simulator = slow_uga.comm.get_innermost().simulator
+    for code in range(1, ThreadCount + 1):
+        simulator._push_error(code)
+    count = simulator.command_count
+    replies = query_in_threads(slow_uga, cmd)
+    assert slow_uga.command_queue.coalesced_count == 0
+    assert simulator.command_count - count == ThreadCount
+    if cmd == 'ZERR?':
+        assert sorted(int(reply) for reply in replies) == list(range(1, ThreadCount + 1))
+
+
+def test_priority_order():
+    queue = CommandQueue()
+    order = []
+    queue.acquire(Priority.Normal)
+
+    def use(priority):
+        queue.acquire(priority)
+        order.append(priority)
+        queue.release()
+
+    threads = []
+    for priority in (Priority.Low, Priority.Normal, Priority.High):
+        thread = threading.Thread(target=use, args=(priority,))
+        thread.start()
+        threads.append(thread)
+        while queue.get_waiting_count() < len(threads):
+            pass
+    queue.release()
+    for thread in threads:
+        thread.join()
+    assert order == [Priority.High, Priority.Normal, Priority.Low]
@@ -0,0 +1,79 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import time
+import socket
+
+from srsinst.uga import Keys
+from srsinst.uga.instruments.uga100.components import Mode
+from srsinst.uga.instruments.uga100.simulator import SimulatedUGA, SimulatedUGAServer, ErrorBit
+
+InvalidCommand = 9
+
+
+def wait_for_mode(simulator, mode, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while simulator.process('ZMOD?') != str(Mode.ModeDict[mode]):
+        assert time.monotonic() < deadline, 'Simulator did not reach {}'.format(mode)
+        time.sleep(0.01)
+
+
+def test_identification(simulator):
+    assert simulator.process('ZQID?') == 'SRS_UGA,S/N 94224,V 1.018'
+    assert simulator.process('ID?').startswith('SRSRGA')
+
+
+def test_batch_write(simulator):
+    replies = simulator.handle_write(b'ZQSN?\rZMOD?\rZPTB 0,130\rZPTB? 0\r')
+    assert replies == '94224\r{}\r130\r'.format(Mode.ModeDict[Keys.Off]).encode()
+    assert simulator.write_count == 1
+    assert simulator.command_count == 4
+
+
+def test_error_queue(simulator):
+    assert simulator.process('ZXYZ') is None
+    assert int(simulator.process('ZBST?')) & (1 << ErrorBit)
+    assert simulator.process('ZERR?') == str(InvalidCommand)
+    assert simulator.process('ZERR?') == '0'
+    assert simulator.process('ZEDS? 9') == 'Invalid Command (9)'
+
+
+def test_start_and_bake(simulator):
+    simulator.process('ZMST')
+    assert simulator.process('ZMOD?') == str(Mode.ModeDict[Keys.Start])
+    wait_for_mode(simulator, Keys.Ready)
+    assert simulator.process('ZQHZ?') == '1500'
+
+    simulator.process('ZMBK 1')
+    time.sleep(0.1)
+    assert simulator.process('ZMOD?') == str(Mode.ModeDict[Keys.SystemBake])
+    simulator.process('ZMBK 0')
+    wait_for_mode(simulator, Keys.Ready)
+
+
+def test_changed_bits_clear_on_read(simulator):
+    simulator.process('ZCRP 1')
+    time.sleep(0.05)
+    assert int(simulator.process('ZBCT?')) != 0
+    assert simulator.process('ZBCT?') == '0'
+
+
+def test_rga_signal():
+    simulator = SimulatedUGA(rga_signal=lambda mass, t: mass * 100)
+    assert simulator.process('MR4') == (400).to_bytes(4, 'little', signed=True)
+
+
+def test_server_login():
+    with SimulatedUGAServer(SimulatedUGA(), port=0) as server:
+        with socket.create_connection(('127.0.0.1', server.port), timeout=2) as s:
+            s.sendall(b' \r')
+            assert b'Name:' in s.recv(1024)
+            s.sendall(b'srsuga\r')
+            assert b'Password' in s.recv(1024)
+            s.sendall(b'srsuga\r')
+            assert b'Welcome' in s.recv(1024)
+            s.sendall(b'ZQSN?\r')
+            assert s.recv(1024) == b'94224\r'
+        assert server.session_count == 1
@@ -0,0 +1,35 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import pytest
+from srsgui.inst.exceptions import InstQueryError
+
+from srsinst.uga import Keys
+from srsinst.uga.instruments.uga100.components import Status
+
+
+def test_get_state_without_errors(uga, simulator):
+    writes = simulator.write_count
+    state = uga.status.get_state()
+    assert simulator.write_count == writes + 1
+    assert state.mode == Keys.Off
+    assert state.errors == () and state.error_codes == ()
+    assert state.get_item_states()['Turbo Pump'] == 'Off'
+    assert 'Errors: None' in state.get_text()
+
+
+def test_get_state_keeps_changed_bits(uga, simulator):
+    simulator.process('ZCIG 1')
+    uga.status.get_status_text()
+    uga.status.get_state()
+    assert int(simulator.process('ZBCT?')) != 0  # left for StateWatcher
+
+
+def test_make_state():
+    state = Status.make_state(['1', str(1 << 3), '0'])
+    assert (state.mode, state.states, state.changed, state.changing) == (Keys.Off, 8, 0, 0)
+    assert Status.make_state(['1', '8', '0', '4']).changed == 4
+    with pytest.raises(InstQueryError):
+        Status.make_state(['1', '8'])
@@ -0,0 +1,53 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import time
+
+import pytest
+from srsgui.inst.exceptions import InstQueryError
+
+from srsinst.uga import UGA100, Keys
+from srsinst.uga.instruments.uga100.components import Status
+from srsinst.uga.instruments.uga100.records import Snapshot
+
+
+def wait_for_mode(uga, mode, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while uga.mode.state != mode:
+        assert time.monotonic() < deadline, 'UGA did not reach {}'.format(mode)
+        time.sleep(0.01)
+
+
+def test_query_batch_in_one_write(uga, simulator):
+    writes = simulator.write_count
+    replies = uga.query_batch(['ZQSN?', 'ZMOD?', 'ZPTB? 0', 'ZQTA?'])
+    assert replies == ['94224', str(uga.mode.ModeDict[Keys.Off]), '120', '25']
+    assert simulator.write_count == writes + 1
+    assert uga.query_batch([]) == []
+
+
+def test_read_snapshot_off(uga, simulator):
+    writes = simulator.write_count
+    snapshot = uga.read_snapshot()
+    assert simulator.write_count == writes + 1
+    assert isinstance(snapshot, Snapshot)
+    assert snapshot.ig_pressure == 0.0
+    assert snapshot.pirani_pressure == pytest.approx(760.0, rel=0.1)
+    assert (snapshot.elbow, snapshot.chamber) == (25, 25)
+    assert not snapshot.states & Status.ErrorMask
+
+
+def test_read_snapshot_ready(uga):
+    uga.mode.start()
+    wait_for_mode(uga, Keys.Ready)
+    snapshot = uga.read_snapshot()
+    assert snapshot.pirani_pressure == pytest.approx(5e-3, rel=0.1)
+    assert snapshot.turbo_pump == 35
+    assert snapshot.states & (1 << 3)  # turbo pump on
+
+
+def test_make_snapshot_error():
+    with pytest.raises(InstQueryError):
+        UGA100.make_snapshot(['1', 'x'] + ['0'] * 7)
@@ -0,0 +1,72 @@
+##!
+##! Copyright(c) 2023 Stanford Research Systems, All rights reserved
+##! Subject to the MIT License
+##!
+
+import time
+import queue
+
+import pytest
+
+from srsinst.uga import Keys
+from srsinst.uga.instruments.uga100.watcher import StateWatcher, ModeItem
+
+
+def test_poll_reports_changes(uga, simulator):
+    watcher = StateWatcher(uga)
+    changes = []
+    watcher.subscribe(changes.append, ['Ion Gauge'])
+    assert watcher.poll() == []  # first poll, nothing to compare with
+
+    simulator.process('ZCIG 1')
+    found = watcher.poll()
+    assert [(c.item, c.old, c.new) for c in found] == [('Ion Gauge', 'Off', 'On')]
+    assert changes == found
+    assert watcher.poll() == []
+
+
+def test_changed_and_changed_back(uga, simulator):
+    watcher = StateWatcher(uga)
+    watcher.poll()
+    simulator.process('ZCIG 1')
+    simulator.process('ZCIG 0')
+    changes = watcher.poll()
+    assert [(c.item, c.old, c.new) for c in changes] == [('Ion Gauge', 'Off', 'Off')]
+
+
+def test_subscribe_filters_items(uga):
+    watcher = StateWatcher(uga)
+    with pytest.raises(KeyError):
+        watcher.subscribe(print, ['Unknown'])
+    watcher.subscribe(print, [ModeItem])
+    assert watcher.has_subscribers()
+    watcher.unsubscribe(print)
+    assert not watcher.has_subscribers()
+
+
+def test_adaptive_period(uga, simulator):
+    watcher = StateWatcher(uga, fast_period=0.01, slow_period=5.0, hold_time=0.1)
+    watcher.poll()
+    assert watcher.get_period() == 5.0
+    simulator.process('ZMST')
+    watcher.poll()
+    assert watcher.get_period() == 0.01
+    watcher.wake()
+    assert watcher.get_period() == 0.01
+
+
+def test_subscription_follows_start(uga):
+    changes = queue.Queue()
+    uga.subscribe(changes.put, [ModeItem])
+    try:
+        assert uga.state_watcher.is_running()
+        uga.mode.start()
+        uga.wake_state_watcher()
+        modes = []
+        deadline = time.monotonic() + 3.0
+        while Keys.Ready not in modes:
+            modes.append(changes.get(timeout=max(0.01, deadline - time.monotonic())).new)
+        assert modes[0] == Keys.Start
+    finally:
+        uga.unsubscribe(changes.put)
+    assert not uga.state_watcher.is_running()